@@ -1,26 +1,52 @@
 # app.py
-from flask import Flask, request, jsonify, Response, g, render_template,send_from_directory
+from flask import Flask, request, jsonify, Response, g, render_template,send_from_directory, stream_with_context
+import csv
+import io
 import json
 import database
+import maintenance
+import task_import
+from repository import UnsupportedByBackend, get_repository
+from task_import import task_fields_from_payload
 from utils.validators import validate_email, validate_username, validate_task_data
+from utils.pagination import encode_cursor, decode_cursor
+from utils.search import build_match_query, render_snippet
+from utils.conditional import (
+    local_to_datetime,
+    task_etag,
+    is_not_modified,
+    set_validators,
+    not_modified_response,
+)
+from storage_profiles import describe_profile
+from json_provider import create_json_provider
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-import sqlite3
 from cache import (
     make_task_list_cache_key,
     get_cached_task_list,
     set_cached_task_list,
     get_cached_task_detail,
     set_cached_task_detail,
+    get_cached_task_detail_body,
+    set_cached_task_detail_body,
+    make_cached_body,
+    gzip_body,
     invalidate_task_list_cache,
     invalidate_task_detail,
 )
 from flask_socketio import SocketIO
 import os
+import threading
 import uuid
+from werkzeug.serving import is_running_from_reloader
 from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
+# JSON: orjson или stdlib (TM_JSON_PROVIDER), оба умеют записи records.py
+app.json = create_json_provider(app)
+# Хранилище данных: SQLite (database.py) или PostgreSQL — см. repository.py, TM_STORAGE_BACKEND
+storage = get_repository()
 socketio = SocketIO(app, cors_allowed_origins="*")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
@@ -39,6 +65,28 @@ def allowed_file(filename: str) -> bool:
 app.config["SECRET_KEY"] = "very-secret-key-change-me" 
 app.config["JSON_AS_ASCII"] = False  # чтобы JSON отдавался с нормальной кириллицей
 
+# ===== СЕССИЯ БД НА ЗАПРОС =====
+# Все функции database.py внутри запроса работают через одно соединение
+# и одну транзакцию: commit — один раз в конце, при ошибке — rollback.
+# Запрос с записями — единица работы потока-писателя: его commit входит
+# в общий COMMIT пачки вместе с записями других запросов (db_writer.py).
+@app.before_request
+def open_db_session():
+    database.begin_request_session()
+
+
+@app.after_request
+def commit_db_session(response):
+    database.end_request_session(commit=response.status_code < 500)
+    return response
+
+
+@app.teardown_request
+def close_db_session(exc):
+    # сюда доходим с открытой сессией, только если обработчик упал
+    database.end_request_session(commit=False)
+
+
 # ===== ОБРАБОТЧИКИ ОШИБОК =====
 @app.errorhandler(404)
 def not_found(error):
@@ -54,6 +102,12 @@ def bad_request(error):
 def internal_error(error):
     return jsonify({"error": "Внутренняя ошибка сервера"}), 500
 
+
+@app.errorhandler(UnsupportedByBackend)
+def unsupported_by_backend(error):
+    # возможность есть не у всех хранилищ (например, FTS5-поиск — только в SQLite)
+    return jsonify({"error": f"{error.feature}: не поддерживается хранилищем {error.backend}"}), 501
+
 # ========== ТОКЕНЫ =================
 def token_required(f):
     @wraps(f)
@@ -66,7 +120,7 @@ def token_required(f):
 
         token = parts[1]
 
-        user = database.get_user_by_token(token)
+        user = storage.get_user_by_token(token)
         if not user:
             return jsonify({"error": "Недействительный или истёкший токен"}), 401
 
@@ -99,11 +153,18 @@ def home():
                 "PUT /users/me": "Обновление текущего пользователя (без пароля)"
             },
             "tasks": {
-                "GET /api/tasks": "Список задач (фильтры: status, priority, author_id, executor_id, limit, offset)",
-                "GET /api/tasks/<id>": "Детали задачи",
+                "GET /api/tasks": "Список задач (фильтры: status, priority, author_id, executor_id; пагинация: limit + page или cursor → next_cursor; include_archived=1 — вместе с архивом; fields=id,title,... — только эти поля)",
+                "GET /api/tasks/changes?since=<seq>": "Изменения задач после seq (upsert / delete; reset — перезагрузить список)",
+                "GET /api/tasks/<id>": "Детали задачи (в том числе архивной — archived: true; include=comments,files,users — сразу со связанными данными)",
+                "GET /api/tasks/export?format=ndjson|csv": "Потоковая выгрузка задач (нужен токен; фильтры как у списка)",
                 "POST /api/tasks": "Создание задачи (роль admin или super_admin)",
+                "POST /api/tasks/bulk": "Массовое создание задач одной транзакцией (admin / super_admin)",
+                "POST /api/tasks/import": "Потоковый импорт задач из NDJSON пачками по chunk_size (admin / super_admin)",
+                "PATCH /api/tasks/bulk": "Массовое обновление по ids или filters (admin — только свои, super_admin — любые)",
+                "DELETE /api/tasks/bulk": "Массовое удаление по ids или filters (admin — только свои, super_admin — любые)",
                 "PUT /api/tasks/<id>": "Обновление задачи (admin — только свои, super_admin — любые)",
-                "DELETE /api/tasks/<id>": "Удаление задачи (admin — только свои, super_admin — любые)"
+                "DELETE /api/tasks/<id>": "Удаление задачи (admin — только свои, super_admin — любые)",
+                "GET /api/search?q=...": "Полнотекстовый поиск по задачам и комментариям (bm25, подсветка, фильтры как у списка)"
             },
             "comments": {
                 "GET /api/tasks/<id>/comments": "Комментарии к задаче",
@@ -113,7 +174,7 @@ def home():
             },
             "admin_panel": {
                 "GET /admin": "HTML админ-панель (логин, задачи, пользователи, статистика)",
-                "GET /admin/stats": "JSON статистика (задачи по статусам, активность пользователей)",
+                "GET /admin/stats": "JSON статистика (задачи по статусам, активность пользователей, метрики обслуживания БД)",
                 "PUT /admin/users/<id>/role": "Изменение роли пользователя (только super_admin)",
                 "DELETE /admin/users/<id>": "Удаление пользователя (только super_admin)"
             }
@@ -131,7 +192,7 @@ def home():
 @app.route('/api/users', methods=['GET'])
 def get_users():
     """Получить всех пользователей"""
-    users = database.get_all_users()
+    users = storage.get_all_users()
     return jsonify({
         "success": True,
         "count": len(users),
@@ -142,7 +203,7 @@ def get_users():
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """Получить пользователя по ID"""
-    user = database.get_user_by_id(user_id)
+    user = storage.get_user_by_id(user_id)
     if not user:
         return jsonify({"error": "Пользователь не найден"}), 404
 
@@ -153,27 +214,155 @@ def get_user(user_id):
 
 
 # ===== ЗАДАЧИ =====
-@app.route('/api/tasks', methods=['GET'])
-def get_tasks():
-    """Получить все задачи с фильтрацией"""
+def task_filters_from_args(args):
+    """Фильтры списка задач из query-параметров (общие для списка и поиска)."""
     filters = {}
 
     # Простые фильтры
     for param in ['status', 'priority', 'author_id', 'executor_id']:
-        value = request.args.get(param)
+        value = args.get(param)
         if value:
             filters[param] = value
 
     # Фильтры по дате
-    due_date_before = request.args.get('due_date_before')
-    due_date_after = request.args.get('due_date_after')
+    due_date_before = args.get('due_date_before')
+    due_date_after = args.get('due_date_after')
 
     if due_date_before:
         filters['due_date_before'] = due_date_before
     if due_date_after:
         filters['due_date_after'] = due_date_after
+    return filters
+
+
+def flag_from_args(args, name: str) -> bool:
+    """Булев query-параметр: ?name=1 / true / yes."""
+    return (args.get(name) or '').lower() in ('1', 'true', 'yes')
+
 
-    # Пагинация
+ARCHIVED_TASK_ERROR = "Задача в архиве и доступна только для чтения"
+
+# Что можно встроить в ответ с задачами: ?include=comments,files,users
+TASK_INCLUDES = ("comments", "files", "users")
+# По этим полям задач include=users собирает пользователей
+TASK_USER_FIELDS = ("author_id", "executor_id")
+
+
+def includes_from_args(args) -> set:
+    """?include=a,b → {"a", "b"}. ValueError — если есть что-то не из TASK_INCLUDES."""
+    includes = {part.strip() for part in (args.get('include') or '').split(',') if part.strip()}
+    unknown = includes.difference(TASK_INCLUDES)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные значения include: {', '.join(sorted(unknown))} "
+            f"(можно: {', '.join(TASK_INCLUDES)})"
+        )
+    return includes
+
+
+def fields_from_args(args):
+    """
+    ?fields=id,title,status → кортеж полей в каноническом порядке
+    (database.TASK_LIST_FIELDS) или None — все поля.
+    ValueError — если есть поле не из списка.
+    """
+    raw = args.get('fields')
+    if raw is None:
+        return None
+    fields = {part.strip() for part in raw.split(',') if part.strip()}
+    unknown = fields.difference(database.TASK_LIST_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные поля: {', '.join(sorted(unknown))} "
+            f"(можно: {', '.join(database.TASK_LIST_FIELDS)})"
+        )
+    return tuple(name for name in database.TASK_LIST_FIELDS if name in fields)
+
+
+def embed_related(tasks, includes):
+    """
+    Встроить в задачи комментарии / файлы и собрать связанных пользователей.
+    Один запрос на вид данных (IN по всем id), сколько бы задач ни было.
+    Возвращает (новые словари задач, список пользователей или None).
+    """
+    task_ids = [task["id"] for task in tasks]
+    comments = storage.get_comments_for_tasks(task_ids) if "comments" in includes else None
+    files = storage.get_task_files_for_tasks(task_ids) if "files" in includes else None
+
+    result = []
+    for task in tasks:
+        task = dict(task)  # кэшированные задачи не трогаем
+        if comments is not None:
+            task["comments"] = comments[task["id"]]
+        if files is not None:
+            task["files"] = files[task["id"]]
+        result.append(task)
+
+    if "users" not in includes:
+        return result, None
+    user_ids = set()
+    for task in result:
+        user_ids.update((task.get("author_id"), task.get("executor_id")))
+        user_ids.update(comment["author_id"] for comment in task.get("comments", ()))
+        user_ids.update(file["uploader_id"] for file in task.get("files", ()))
+    users = storage.get_users_by_ids(user_ids)
+    return result, [users[user_id] for user_id in sorted(users)]
+
+
+def find_task(task_id):
+    """Задача по ID: из кэша деталей, иначе из хранилища (и кладём в кэш)."""
+    task = get_cached_task_detail(task_id)
+    if task is None:
+        task = storage.get_task_by_id(task_id)
+        if task:
+            set_cached_task_detail(task_id, task)
+    return task
+
+
+def encode_for_cache(payload):
+    """Тело ответа для кэша — ровно те байты, что отдал бы jsonify(payload)."""
+    return make_cached_body(jsonify(payload).get_data())
+
+
+def cached_json_response(entry) -> Response:
+    """
+    Ответ из готовых байтов (make_cached_body) — без сериализации.
+    Клиенту, принимающему gzip, — сжатая версия (сжимается один раз на запись кэша).
+    """
+    response = app.response_class(mimetype=app.json.mimetype)
+    response.vary.add("Accept-Encoding")
+    compressed = gzip_body(entry) if request.accept_encodings["gzip"] else None
+    if compressed is not None:
+        response.set_data(compressed)
+        response.content_encoding = "gzip"
+    else:
+        response.set_data(entry["body"])
+    return response
+
+
+@app.route('/api/tasks', methods=['GET'])
+def get_tasks():
+    """
+    Получить все задачи с фильтрацией (?include_archived=1 — вместе с архивом).
+    ?fields=id,title,status — только эти поля (id и created_at есть всегда).
+    ?include=comments,files,users — со связанными данными (без ETag / 304:
+    комментарии и файлы в версию списка не входят).
+    """
+    filters = task_filters_from_args(request.args)
+    include_archived = flag_from_args(request.args, 'include_archived')
+    try:
+        fields = fields_from_args(request.args)
+        includes = includes_from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if fields is not None and "users" in includes:
+        # без author_id / executor_id авторы и исполнители не попали бы в users
+        fields = tuple(
+            name for name in database.TASK_LIST_FIELDS
+            if name in fields or name in TASK_USER_FIELDS
+        )
+
+    # Пагинация: старый вариант page/limit или keyset-курсор (?cursor=...)
     try:
         limit = int(request.args.get('limit', 100))
         page = int(request.args.get('page', 1))
@@ -181,50 +370,224 @@ def get_tasks():
     except ValueError:
         return jsonify({"error": "Параметры limit и page должны быть числами"}), 400
 
+    cursor = request.args.get('cursor') or None
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Некорректный параметр cursor"}), 400
+        page = None
+        offset = 0
+
+    # ----- ETAG: НОМЕР ПОСЛЕДНЕГО ИЗМЕНЕНИЯ TASKS -----
+    # Читаем до выборки: изменение между ними даст лишний 200, но не ложный 304
+    change = storage.get_task_change_seq()
+    etag = f"tasks-{change['seq']}"
+    last_modified = local_to_datetime(change["changed_at"])
+    if not includes and is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
     # ----- КЭШ СПИСКА ЗАДАЧ -----
-    cache_key = make_task_list_cache_key(filters, page, limit)
-    cached = get_cached_task_list(cache_key)
-    if cached is not None:
-        # Возвращаем из кэша, структура ответа такая же
-        return jsonify({
-            "success": True,
-            "count": cached["count"],
-            "page": page,
-            "limit": limit,
-            "tasks": cached["tasks"],
-        })
+    # В кэше — готовые байты ответа: попадание отдаёт их без сериализации.
+    # Ответы с include не кэшируются: связанные данные всегда свежие.
+    cache_key = make_task_list_cache_key(
+        filters, page, limit, cursor, include_archived, version=change["seq"], fields=fields,
+    )
+    if not includes:
+        cached = get_cached_task_list(cache_key)
+        if cached is not None:
+            return set_validators(cached_json_response(cached), etag, last_modified)
+
+    # Если в кэше нет — идём в БД. Берём на одну строку больше,
+    # чтобы понять, есть ли следующая страница.
+    tasks = storage.get_all_tasks(
+        filters, limit + 1 if limit > 0 else limit, offset,
+        after=after, include_archived=include_archived, fields=fields,
+    )
+    next_cursor = None
+    if limit > 0 and len(tasks) > limit:
+        tasks = tasks[:limit]
+        last = tasks[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
 
-    # Если в кэше нет — идём в БД
-    tasks = database.get_all_tasks(filters, limit, offset)
-    data_for_cache = {
+    body = {
+        "success": True,
         "count": len(tasks),
+        "page": page,
+        "limit": limit,
+        # всего задач под фильтры — из счётчиков, без выборки всех строк
+        "total": storage.count_tasks(filters, include_archived=include_archived),
         "tasks": tasks,
+        "next_cursor": next_cursor,
     }
-    set_cached_task_list(cache_key, data_for_cache)
+    if includes:
+        body["tasks"], users = embed_related(tasks, includes)
+        if users is not None:
+            body["users"] = users
+        return jsonify(body)
 
+    entry = encode_for_cache(body)
+    set_cached_task_list(cache_key, entry)
+    return set_validators(cached_json_response(entry), etag, last_modified)
+
+
+TASK_CHANGES_LIMIT = 500
+TASK_CHANGES_MAX_LIMIT = 5000
+
+
+@app.route('/api/tasks/changes', methods=['GET'])
+def get_task_changes():
+    """
+    Изменения задач после ?since=<seq> — для синхронизации локальной копии.
+    changes: {"op": "upsert", "task": {...}} или {"op": "delete", "task_id"}.
+    Следующий запрос — с since = seq из ответа (has_more — сразу же).
+    reset: true — журнал since уже не покрывает: перезагрузить список
+    (GET /api/tasks) и продолжить с seq из этого ответа.
+    """
+    try:
+        since = int(request.args['since'])
+        limit = int(request.args.get('limit', TASK_CHANGES_LIMIT))
+    except KeyError:
+        return jsonify({"error": "Нужен параметр since"}), 400
+    except ValueError:
+        return jsonify({"error": "Параметры since и limit должны быть числами"}), 400
+    if not 1 <= limit <= TASK_CHANGES_MAX_LIMIT:
+        return jsonify({"error": f"limit должен быть от 1 до {TASK_CHANGES_MAX_LIMIT}"}), 400
+
+    result = storage.get_task_changes(since, limit)
     return jsonify({
         "success": True,
-        "count": data_for_cache["count"],
+        "since": since,
+        "count": len(result["changes"]),
+        **result,
+    })
+
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_ndjson(batches, columns):
+    """Пачки кортежей -> строки NDJSON (одна задача — одна строка)."""
+    for rows in batches:
+        chunk = []
+        for row in rows:
+            task = dict(zip(columns, row))
+            if "archived" in task:
+                task["archived"] = bool(task["archived"])
+            chunk.append(json.dumps(task, ensure_ascii=False))
+        yield "\n".join(chunk) + "\n"
+
+
+def export_csv(batches, columns):
+    """Пачки кортежей -> CSV с заголовком; буфер переиспользуется между пачками."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # только заголовок, строк не было
+        yield buffer.getvalue()
+
+
+@app.route('/api/tasks/export', methods=['GET'])
+@token_required
+def export_tasks():
+    """
+    Потоковая выгрузка задач: ?format=ndjson (по умолчанию) или csv.
+    Фильтры — как у GET /api/tasks (+ include_archived). Строки читаются
+    из БД пачками и сразу уходят клиенту, память не зависит от числа задач.
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Формат должен быть одним из: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    filters = task_filters_from_args(request.args)
+    include_archived = flag_from_args(request.args, 'include_archived')
+    columns = database.EXPORT_COLUMNS + (("archived",) if include_archived else ())
+    batches = storage.iter_tasks(filters, include_archived=include_archived)
+    body = export_ndjson(batches, columns) if fmt == "ndjson" else export_csv(batches, columns)
+
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=tasks.{fmt}"},
+    )
+
+
+SEARCH_MAX_LIMIT = 100
+
+
+@app.route('/api/search', methods=['GET'])
+def search_tasks():
+    """
+    Полнотекстовый поиск задач по названию, описанию и комментариям.
+    ?q=... обязателен; фильтры — как у GET /api/tasks; page/limit — пагинация.
+    Результаты отсортированы по релевантности (bm25), в snippet найденные
+    слова обёрнуты в <mark> (остальной текст HTML-экранирован).
+    """
+    try:
+        match_query = build_match_query(request.args.get('q', ''))
+    except ValueError:
+        return jsonify({"error": "Параметр q обязателен"}), 400
+
+    try:
+        limit = int(request.args.get('limit', 20))
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        return jsonify({"error": "Параметры limit и page должны быть числами"}), 400
+    if limit < 1 or page < 1:
+        return jsonify({"error": "Параметры limit и page должны быть положительными"}), 400
+    limit = min(limit, SEARCH_MAX_LIMIT)
+
+    filters = task_filters_from_args(request.args)
+    results = storage.search_tasks(match_query, filters, limit, (page - 1) * limit)
+    for result in results:
+        comment_text = result.pop("comment_text")
+        if comment_text is not None:
+            result["snippet"] = render_snippet(result["snippet"], comment_text)
+        else:
+            result["snippet"] = render_snippet(result["snippet"], result["title"], result["description"])
+
+    return jsonify({
+        "success": True,
+        "query": request.args.get('q'),
+        "count": len(results),
         "page": page,
         "limit": limit,
-        "tasks": data_for_cache["tasks"],
+        "results": results,
     })
 
 # ==== WebSocket / Socket.IO уведомления ====
 
-def broadcast_task_event(event_type: str, task: dict | None = None, task_id: int | None = None):
+def broadcast_task_event(
+    event_type: str,
+    task: dict | None = None,
+    task_id: int | None = None,
+    task_ids: list[int] | None = None,
+):
     """
     Рассылаем событие про задачу всем подключённым клиентам.
-    event_type: 'created' | 'updated' | 'deleted'
+    event_type: 'created' | 'updated' | 'deleted' | 'bulk_created' | 'bulk_updated' | 'bulk_deleted'
+    Для массовых операций — одно событие со списком task_ids.
     """
     payload = {"type": event_type}
     if task is not None:
         payload["task"] = task
     if task_id is not None:
         payload["task_id"] = task_id
+    if task_ids is not None:
+        payload["task_ids"] = task_ids
 
     # БЕЗ broadcast=...
-    socketio.emit("task_event", payload)
+    # шлём после commit, чтобы клиенты, перечитавшие задачу, увидели изменения
+    database.after_commit(lambda: socketio.emit("task_event", payload))
 
 
 def broadcast_comment_event(
@@ -245,27 +608,48 @@ def broadcast_comment_event(
     if comment_id is not None:
         payload["comment_id"] = comment_id
 
-    socketio.emit("comment_event", payload)
+    database.after_commit(lambda: socketio.emit("comment_event", payload))
 
 
 
 @app.route('/api/tasks/<int:task_id>', methods=['GET'])
 def get_task(task_id):
-    """Получить задачу по ID (с кэшированием деталей)"""
-    # Пробуем взять из кэша
-    task = get_cached_task_detail(task_id)
-    if task is None:
-        # Если в кэше нет — идём в БД
-        task = database.get_task_by_id(task_id)
-        if not task:
-            return jsonify({"error": "Задача не найден"}), 404
-        # Кладём в кэш
-        set_cached_task_detail(task_id, task)
+    """
+    Получить задачу по ID (с кэшированием деталей).
+    ETag / Last-Modified по версии задачи: совпали с If-None-Match /
+    If-Modified-Since — 304 без тела (из кэша — и без запроса к БД).
+    ?include=comments,files,users — сразу со связанными данными (без ETag).
+    """
+    try:
+        includes = includes_from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({
-        "success": True,
-        "task": task
-    })
+    task = find_task(task_id)
+    if not task:
+        return jsonify({"error": "Задача не найден"}), 404
+
+    if includes:
+        (task,), users = embed_related([task], includes)
+        body = {"success": True, "task": task}
+        if users is not None:
+            body["users"] = users
+        return jsonify(body)
+
+    etag = task_etag(task)
+    last_modified = local_to_datetime(task.get("updated_at"))
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    # готовое тело живёт рядом с деталями в кэше и сбрасывается вместе с ними
+    entry = get_cached_task_detail_body(task_id)
+    if entry is None:
+        entry = encode_for_cache({
+            "success": True,
+            "task": task
+        })
+        set_cached_task_detail_body(task_id, entry)
+    return set_validators(cached_json_response(entry), etag, last_modified)
 
 
 
@@ -288,27 +672,11 @@ def create_task():
         if errors:
             return jsonify({"error": "Ошибки валидации", "details": errors}), 400
 
-        title = data.get('title', '').strip()
-        description = (data.get('description') or '').strip()
-        author_id = data.get('author_id')
-        executor_id = data.get('executor_id') or author_id  # по умолчанию автор
-        status = data.get('status') or 'к выполнению'
-        priority = data.get('priority') or 'средний'
-        due_date = data.get('due_date')
-
         # Создаём задачу через модуль database
-        task_id = database.create_task(
-            title=title,
-            description=description,
-            author_id=author_id,
-            executor_id=executor_id,
-            status=status,
-            priority=priority,
-            due_date=due_date
-        )
+        task_id = storage.create_task(**task_fields_from_payload(data))
 
         # Получаем её в "расширенном" виде (c author_name, executor_name)
-        task = database.get_task_by_id(task_id)
+        task = storage.get_task_by_id(task_id)
         broadcast_task_event("created", task=task)  
         if not task:
             return jsonify({"error": "Не удалось получить задачу после создания"}), 500
@@ -323,13 +691,240 @@ def create_task():
             "task": task
         }), 201
     
-    except sqlite3.IntegrityError as e:
+    except storage.IntegrityError as e:
         return jsonify({"error": f"Ошибка базы данных: {str(e)}"}), 400
     except Exception as e:
         print(f"Ошибка в create_task: {e}")
         return jsonify({"error": f"Внутренняя ошибка: {str(e)}"}), 500
 
 
+# Сколько задач можно прислать в одном POST /api/tasks/bulk
+BULK_MAX_TASKS = 5000
+
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+@token_required
+def create_tasks_bulk():
+    """
+    Массовое создание задач (admin / super_admin).
+    Тело: {"tasks": [{...}, ...]} — поля как у POST /api/tasks.
+    Корректные задачи вставляются одной транзакцией, по каждой
+    позиции возвращается результат: id или список ошибок.
+    """
+    user = g.current_user
+    if user.get("role") not in ("admin", "super_admin"):
+        return jsonify({"error": "Недостаточно прав для создания задач"}), 403
+
+    data = request.get_json(silent=True)
+    items = data.get("tasks") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Нужен JSON вида {\"tasks\": [...]} с непустым списком"}), 400
+    if len(items) > BULK_MAX_TASKS:
+        return jsonify({"error": f"Не больше {BULK_MAX_TASKS} задач за один запрос"}), 400
+
+    results = []
+    valid = []  # (индекс, поля задачи)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "success": False, "errors": ["Ожидается JSON-объект"]})
+            continue
+        errors = validate_task_data(item, require_all=True)
+        if errors:
+            results.append({"index": index, "success": False, "errors": errors})
+            continue
+        valid.append((index, task_fields_from_payload(item)))
+        results.append(None)  # заполним после вставки
+
+    try:
+        task_ids = storage.create_tasks_bulk([fields for _, fields in valid])
+    except storage.IntegrityError as e:
+        return jsonify({"error": f"Ошибка базы данных: {str(e)}"}), 400
+
+    for (index, _), task_id in zip(valid, task_ids):
+        results[index] = {"index": index, "success": True, "id": task_id}
+
+    if task_ids:
+        # один сброс кэша и одно событие на всю пачку
+        invalidate_task_list_cache()
+        broadcast_task_event("bulk_created", task_ids=task_ids)
+
+    return jsonify({
+        "success": bool(task_ids),
+        "created": len(task_ids),
+        "failed": len(items) - len(task_ids),
+        "results": results,
+    }), 201 if task_ids else 400
+
+
+@app.route('/api/tasks/import', methods=['POST'])
+@token_required
+def import_tasks():
+    """
+    Потоковый импорт задач (admin / super_admin).
+    Тело — NDJSON: по задаче (поля как у POST /api/tasks) на строку.
+    Тело разбирается по мере чтения, задачи вставляются пачками по
+    ?chunk_size= строк (одна транзакция на пачку). В ответе — отчёт
+    с ошибками по номерам строк.
+    """
+    user = g.current_user
+    if user.get("role") not in ("admin", "super_admin"):
+        return jsonify({"error": "Недостаточно прав для создания задач"}), 403
+
+    try:
+        chunk_size = int(request.args.get('chunk_size', task_import.IMPORT_CHUNK_SIZE))
+    except ValueError:
+        return jsonify({"error": "Параметр chunk_size должен быть числом"}), 400
+    if not 1 <= chunk_size <= task_import.IMPORT_MAX_CHUNK_SIZE:
+        return jsonify({"error": f"chunk_size — от 1 до {task_import.IMPORT_MAX_CHUNK_SIZE}"}), 400
+
+    # тело читаем потоком, целиком в памяти оно не бывает — поэтому
+    # лимит здесь свой, намного больше общего MAX_CONTENT_LENGTH
+    request.max_content_length = task_import.IMPORT_MAX_CONTENT_LENGTH
+
+    def on_chunk(task_ids):
+        # один сброс кэша и одно событие на пачку
+        invalidate_task_list_cache()
+        broadcast_task_event("bulk_created", task_ids=task_ids)
+
+    report = task_import.import_ndjson(
+        task_import.iter_lines(request.stream), chunk_size, on_chunk=on_chunk,
+    )
+    if report["created"] == 0 and report["failed"] == 0:
+        return jsonify({"error": "Пустое тело: нужен NDJSON, задача на строку"}), 400
+
+    return jsonify({"success": report["created"] > 0, **report}), 201 if report["created"] else 400
+
+
+def parse_bulk_target(data: dict):
+    """
+    Какие задачи затрагивает массовая операция: {"ids": [...]} или {"filters": {...}}
+    (те же фильтры, что у GET /api/tasks). Возвращает (ids, filters, error).
+    """
+    ids = data.get("ids")
+    filters = data.get("filters")
+
+    if ids is None and not filters:
+        return None, None, "Нужно поле 'ids' (список id) или непустое 'filters'"
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in ids
+        ):
+            return None, None, "Поле 'ids' должно быть непустым списком целых чисел"
+        if len(ids) > BULK_MAX_TASKS:
+            return None, None, f"Не больше {BULK_MAX_TASKS} id за один запрос"
+
+    if filters is not None:
+        if not isinstance(filters, dict):
+            return None, None, "Поле 'filters' должно быть объектом"
+        unknown = set(filters) - set(database.TASK_FILTERS)
+        if unknown:
+            return None, None, f"Неизвестные фильтры: {', '.join(sorted(unknown))}"
+
+    return ids, filters, None
+
+
+def bulk_author_restriction(user: dict):
+    """
+    Права массовых операций — как у PUT/DELETE одной задачи:
+    super_admin — любые задачи, admin — только свои, user — ничего.
+    Возвращает (author_id для ограничения или None, error).
+    """
+    role = user.get("role")
+    if role == "super_admin":
+        return None, None
+    if role == "admin":
+        return user["id"], None
+    return None, "Недостаточно прав"
+
+
+def finish_bulk_change(event_type: str, task_ids: list[int]):
+    """Один сброс кэшей и одно событие на всю массовую операцию."""
+    if not task_ids:
+        return
+    invalidate_task_list_cache()
+    for task_id in task_ids:
+        invalidate_task_detail(task_id)
+    broadcast_task_event(event_type, task_ids=task_ids)
+
+
+@app.route('/api/tasks/bulk', methods=['PATCH'])
+@token_required
+def update_tasks_bulk():
+    """
+    Массовое обновление задач одним UPDATE.
+    Тело: {"ids": [...]} или {"filters": {...}} + {"set": {поля}}.
+    """
+    author_id, error = bulk_author_restriction(g.current_user)
+    if error:
+        return jsonify({"error": error}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Нужен JSON в теле запроса"}), 400
+
+    ids, filters, error = parse_bulk_target(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    allowed_fields = ['title', 'description', 'status', 'priority', 'due_date', 'executor_id']
+    changes = data.get("set")
+    if not isinstance(changes, dict):
+        return jsonify({"error": "Нужно поле 'set' с изменяемыми полями"}), 400
+    changes = {k: v for k, v in changes.items() if k in allowed_fields and v is not None}
+    if not changes:
+        return jsonify({
+            "error": "Нет допустимых полей для обновления",
+            "allowed_fields": allowed_fields
+        }), 400
+
+    errors = validate_task_data(changes, require_all=False)
+    if errors:
+        return jsonify({"error": "Ошибки валидации", "details": errors}), 400
+
+    updated_ids = storage.update_tasks_bulk(changes, ids=ids, filters=filters, author_id=author_id)
+    finish_bulk_change("bulk_updated", updated_ids)
+
+    payload = {
+        "success": True,
+        "updated": len(updated_ids),
+        "ids": updated_ids,
+    }
+    if ids is not None:
+        # не найдены или (для admin) чужие
+        payload["skipped_ids"] = sorted(set(ids) - set(updated_ids))
+    return jsonify(payload), 200
+
+
+@app.route('/api/tasks/bulk', methods=['DELETE'])
+@token_required
+def delete_tasks_bulk():
+    """Массовое удаление задач одним DELETE. Тело: {"ids": [...]} или {"filters": {...}}."""
+    author_id, error = bulk_author_restriction(g.current_user)
+    if error:
+        return jsonify({"error": error}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Нужен JSON в теле запроса"}), 400
+
+    ids, filters, error = parse_bulk_target(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    deleted_ids = storage.delete_tasks_bulk(ids=ids, filters=filters, author_id=author_id)
+    finish_bulk_change("bulk_deleted", deleted_ids)
+
+    payload = {
+        "success": True,
+        "deleted": len(deleted_ids),
+        "ids": deleted_ids,
+    }
+    if ids is not None:
+        payload["skipped_ids"] = sorted(set(ids) - set(deleted_ids))
+    return jsonify(payload), 200
+
+
 @app.route('/api/tasks/<int:task_id>', methods=['PUT'])
 @token_required
 def update_task(task_id):
@@ -346,9 +941,11 @@ def update_task(task_id):
         return jsonify({"error": "Необходимы данные для обновления"}), 400
 
     # Проверяем, что задача существует
-    task = database.get_task_by_id(task_id)
+    task = storage.get_task_by_id(task_id)
     if not task:
         return jsonify({"error": "Задача не найдена"}), 404
+    if task.get("archived"):
+        return jsonify({"error": ARCHIVED_TASK_ERROR}), 409
 
     # --- ПРОВЕРКА ПРАВ СООТВЕТСТВУЕТ ТЗ ---
     # Обычный юзер вообще не может обновлять задачи
@@ -383,7 +980,7 @@ def update_task(task_id):
         return jsonify({"error": "Ошибки валидации", "details": errors}), 400
 
     # ВАЖНО: в базу отправляем только отфильтрованные поля
-    success = database.update_task(task_id, **filtered_data)
+    success = storage.update_task(task_id, **filtered_data)
     if not success:
         return jsonify({"error": "Не удалось обновить задачу"}), 400
 
@@ -391,7 +988,7 @@ def update_task(task_id):
     invalidate_task_list_cache()
     invalidate_task_detail(task_id)
 
-    updated_task = database.get_task_by_id(task_id)
+    updated_task = storage.get_task_by_id(task_id)
     broadcast_task_event("updated", task=updated_task)
 
     return jsonify({
@@ -413,9 +1010,11 @@ def delete_task(task_id):
     role = current_user["role"]
 
     # Сначала найдём задачу через твой database-слой
-    task = database.get_task_by_id(task_id)
+    task = storage.get_task_by_id(task_id)
     if not task:
         return jsonify({"error": "Задача не найдена"}), 404
+    if task.get("archived"):
+        return jsonify({"error": ARCHIVED_TASK_ERROR}), 409
 
     # --- ПРОВЕРКА ПРАВ ---
     if role == "user":
@@ -427,16 +1026,8 @@ def delete_task(task_id):
         }), 403
     # super_admin снова проходит дальше
 
-    # Дальше можно оставить твой старый sqlite-код
     try:
-        import sqlite3
-        conn = sqlite3.connect('task_manager.db')
-        cursor = conn.cursor()
-
-        cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
+        affected = int(storage.delete_task(task_id))
 
         if affected:
             invalidate_task_list_cache()
@@ -458,11 +1049,11 @@ def delete_task(task_id):
 def get_task_comments(task_id):
     """Получить комментарии к задаче"""
     # Проверяем существует ли задача
-    task = database.get_task_by_id(task_id)
+    task = find_task(task_id)
     if not task:
         return jsonify({"error": "Задача не найдена"}), 404
 
-    comments = database.get_comments_by_task(task_id)
+    comments = storage.get_comments_by_task(task_id)
 
     return jsonify({
         "success": True,
@@ -493,13 +1084,15 @@ def add_comment_to_task(task_id):
             return jsonify({"error": "Текст комментария не может быть пустым"}), 400
 
         # Проверяем, что задача существует
-        task = database.get_task_by_id(task_id)
+        task = storage.get_task_by_id(task_id)
         if not task:
             return jsonify({"error": "Задача не найдена"}), 404
+        if task.get("archived"):
+            return jsonify({"error": ARCHIVED_TASK_ERROR}), 409
 
         # Добавляем комментарий в БД
-        comment_id = database.add_comment(task_id=task_id, author_id=author_id, text=text)
-        new_comment = database.get_comment_by_id(comment_id)
+        comment_id = storage.add_comment(task_id=task_id, author_id=author_id, text=text)
+        new_comment = storage.get_comment_by_id(comment_id)
         broadcast_comment_event("created", comment=new_comment, task_id=task_id)    
 
         return jsonify({
@@ -522,22 +1115,14 @@ def add_comment_to_task(task_id):
 def delete_comment(comment_id):
     """Удалить комментарий"""
     try:
-        conn = sqlite3.connect('task_manager.db')
-        cursor = conn.cursor()
-
         # Проверяем существует ли комментарий
-        cursor.execute("SELECT id FROM comments WHERE id = ?", (comment_id,))
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
+        comment = storage.get_comment_by_id(comment_id)
+        if not comment:
             return jsonify({"error": "Комментарий не найден"}), 404
 
-        task_id = row[0]
+        task_id = comment["task_id"]
 
-        cursor.execute("DELETE FROM comments WHERE id = ?", (comment_id,))
-        conn.commit()
-        affected = cursor.rowcount
-        conn.close()
+        affected = int(storage.delete_comment(comment_id))
         if affected:
             # уведомляем фронт
             broadcast_comment_event(
@@ -584,7 +1169,7 @@ def update_comment_route(comment_id):
         return jsonify({"error": "Нужно непустое поле 'text'"}), 400
 
     # Проверяем, что комментарий существует
-    comment = database.get_comment_by_id(comment_id)
+    comment = storage.get_comment_by_id(comment_id)
     if not comment:
         return jsonify({"error": "Комментарий не найден"}), 404
 
@@ -594,11 +1179,11 @@ def update_comment_route(comment_id):
     if not is_admin and comment["author_id"] != user["id"]:
         return jsonify({"error": "Недостаточно прав для редактирования комментария"}), 403
 
-    ok = database.update_comment(comment_id, new_text)
+    ok = storage.update_comment(comment_id, new_text)
     if not ok:
         return jsonify({"error": "Не удалось обновить комментарий"}), 500
 
-    updated = database.get_comment_by_id(comment_id)
+    updated = storage.get_comment_by_id(comment_id)
     broadcast_comment_event("updated", comment=updated, task_id=updated["task_id"])
 
     return jsonify({
@@ -625,7 +1210,7 @@ def login():
             "error": "Нужны email и password"
         }), 400
 
-    user = database.get_user_by_email(email)
+    user = storage.get_user_by_email(email)
     if not user:
         return jsonify({
             "success": False,
@@ -645,7 +1230,7 @@ def login():
         "role": user["role"],
     }
 
-    access_token = database.create_auth_token(user["id"])
+    access_token = storage.create_auth_token(user["id"])
 
     return jsonify({
         "success": True,
@@ -661,7 +1246,7 @@ def logout():
     if not token:
         return jsonify({"success": True, "message": "Уже разлогинен"}), 200
 
-    database.delete_access_token(token)
+    storage.delete_access_token(token)
     return jsonify({"success": True, "message": "Выход выполнен"}), 200
     
 
@@ -700,7 +1285,7 @@ def register():
         }), 400
 
     # Проверяем, нет ли уже такого email
-    existing = database.get_user_by_email(email)
+    existing = storage.get_user_by_email(email)
     if existing:
         return jsonify({
             "error": "Пользователь с таким email уже существует"
@@ -710,7 +1295,7 @@ def register():
     password_hash = generate_password_hash(password)
 
     # Пишем в БД
-    user_id = database.create_user(email, username, password_hash, role=role)
+    user_id = storage.create_user(email, username, password_hash, role=role)
     if not user_id:
         return jsonify({"error": "Не удалось создать пользователя"}), 500
 
@@ -748,7 +1333,7 @@ def resolve_current_user():
     if not token:
         return None, (jsonify({"error": "Некорректный токен"}), 401)
 
-    user = database.get_user_by_access_token(token)
+    user = storage.get_user_by_access_token(token)
     if not user:
         return None, (jsonify({"error": "Требуется авторизация"}), 401)
 
@@ -859,11 +1444,11 @@ def update_current_user():
 @app.route("/api/tasks/<int:task_id>/files", methods=["GET"])
 def list_task_files(task_id):
     """Список вложений для задачи"""
-    task = database.get_task_by_id(task_id)
+    task = find_task(task_id)
     if not task:
         return jsonify({"error": "Задача не найдена"}), 404
 
-    attachments = database.get_attachments_for_task(task_id)
+    attachments = storage.get_attachments_for_task(task_id)
     return jsonify({
         "success": True,
         "files": attachments
@@ -877,9 +1462,11 @@ def upload_task_files(task_id):
     Поле формы: files (может быть несколько).
     """
     current_user = g.current_user  
-    task = database.get_task_by_id(task_id)
+    task = storage.get_task_by_id(task_id)
     if not task:
         return jsonify({"error": "Задача не найдена"}), 404
+    if task.get("archived"):
+        return jsonify({"error": ARCHIVED_TASK_ERROR}), 409
     if current_user["role"] not in ("admin", "super_admin"):
         return jsonify({"error": "Недостаточно прав для загрузки файлов"}), 403
     if "files" not in request.files:
@@ -888,7 +1475,7 @@ def upload_task_files(task_id):
     files = request.files.getlist("files")
     if not files:
         return jsonify({"error": "Файлы не переданы"}), 400
-    upload_dir = os.path.join(app.root_path, "uploads")
+    upload_dir = app.config["UPLOAD_FOLDER"]
     os.makedirs(upload_dir, exist_ok=True)
 
     saved_files = []
@@ -911,7 +1498,7 @@ def upload_task_files(task_id):
 
         file_storage.save(disk_path)
 
-        file_id = database.save_task_file(
+        saved = storage.save_task_file(
             task_id=task_id,
             original_name=original_name,
             stored_name=stored_name,
@@ -922,7 +1509,7 @@ def upload_task_files(task_id):
 
         saved_files.append(
             {
-                "id": file_id,
+                "id": saved["id"],
                 "task_id": task_id,
                 "original_name": original_name,
                 "stored_name": stored_name,
@@ -946,12 +1533,12 @@ def upload_task_files(task_id):
 @app.route("/api/files/<int:attachment_id>/download", methods=["GET"])
 def download_attachment(attachment_id):
     """Скачать файл-вложение"""
-    attachment = database.get_attachment_by_id(attachment_id)
+    attachment = storage.get_attachment_by_id(attachment_id)  # в т.ч. файлы архивных задач
     if not attachment:
         return jsonify({"error": "Файл не найден"}), 404
 
-    stored_name = attachment["filename_stored"]
-    original_name = attachment["filename_orig"]
+    stored_name = attachment["stored_name"]
+    original_name = attachment["original_name"]
     directory = app.config["UPLOAD_FOLDER"]
 
     file_path = os.path.join(directory, stored_name)
@@ -970,9 +1557,11 @@ def download_attachment(attachment_id):
 def delete_attachment(attachment_id):
     user = g.current_user
     """Удалить вложение"""
-    attachment = database.get_attachment_by_id(attachment_id)
+    attachment = storage.get_attachment_by_id(attachment_id)
     if not attachment:
         return jsonify({"error": "Файл не найден"}), 404
+    if attachment.get("archived"):
+        return jsonify({"error": ARCHIVED_TASK_ERROR}), 409
 
     # Проверка прав
     role = user.get("role")
@@ -982,10 +1571,10 @@ def delete_attachment(attachment_id):
     if not (is_owner or is_admin):
         return jsonify({"error": "Недостаточно прав для удаления файла"}), 403
 
-    stored_name = attachment["filename_stored"]
+    stored_name = attachment["stored_name"]
     file_path = os.path.join(app.config["UPLOAD_FOLDER"], stored_name)
 
-    ok = database.delete_attachment(attachment_id)
+    ok = storage.delete_attachment(attachment_id)
     if not ok:
         return jsonify({"error": "Не удалось удалить запись о файле"}), 400
 
@@ -1012,13 +1601,15 @@ def admin_stats():
     if user.get("role") not in ("admin", "super_admin"):
         return jsonify({"error": "Недостаточно прав"}), 403
 
-    stats = database.get_task_stats()
-    active_users = database.get_active_users(limit=10)
+    stats = storage.get_task_stats()
+    active_users = storage.get_active_users(limit=10)
 
     return jsonify({
         "success": True,
         "stats": stats,
         "active_users": active_users,
+        # фоновое обслуживание: размер auth_tokens во времени и т.п.
+        "maintenance": maintenance.get_maintenance_stats(),
     })
 
 @app.route('/admin')
@@ -1038,7 +1629,7 @@ def admin_change_user_role(user_id):
     if new_role not in ("user", "admin", "super_admin"):
         return jsonify({"error": "Недопустимая роль"}), 400
 
-    user = database.get_user_by_id(user_id)
+    user = storage.get_user_by_id(user_id)
     if not user:
         return jsonify({"error": "Пользователь не найден"}), 404
 
@@ -1046,13 +1637,8 @@ def admin_change_user_role(user_id):
     if g.current_user["id"] == user_id and new_role != "super_admin":
         return jsonify({"error": "Нельзя понизить самого себя"}), 400
 
-    with database.get_db() as cursor:
-        cursor.execute(
-            "UPDATE users SET role = ? WHERE id = ?",
-            (new_role, user_id)
-        )
-        if cursor.rowcount == 0:
-            return jsonify({"error": "Не удалось обновить роль"}), 500
+    if not storage.update_user_role(user_id, new_role):
+        return jsonify({"error": "Не удалось обновить роль"}), 500
 
     return jsonify({
         "success": True,
@@ -1067,12 +1653,12 @@ def admin_delete_user(user_id):
     if g.current_user["id"] == user_id:
         return jsonify({"error": "Нельзя удалить самого себя"}), 400
 
-    user = database.get_user_by_id(user_id)
+    user = storage.get_user_by_id(user_id)
     if not user:
         return jsonify({"error": "Пользователь не найден"}), 404
 
     try:
-        deleted = database.delete_user(user_id)
+        deleted = storage.delete_user(user_id)
     except Exception as e:
         # сюда может прилететь FOREIGN KEY constraint failed
         return jsonify({
@@ -1109,7 +1695,7 @@ def refresh_token():
     if not old_token:
         return jsonify({"error": "Нужен токен для обновления"}), 400
 
-    new_token = database.refresh_token(old_token)
+    new_token = storage.refresh_token(old_token)
     if not new_token:
         return jsonify({"error": "Токен недействителен или истёк"}), 401
 
@@ -1126,6 +1712,11 @@ def print_banner():
     print("TASK MANAGER API".center(80))
     print(line)
     print("Базовый URL: http://localhost:5000")
+    if storage.name == "sqlite":
+        print(f"Хранилище: {database.DB_NAME}, профиль {describe_profile(database.STORAGE_PROFILE)}")
+    else:
+        print(f"Хранилище: {storage.name} (TM_POSTGRES_DSN)")
+    print(f"JSON: {app.json.name} (TM_JSON_PROVIDER)")
     print()
 
     print("Аутентификация:")
@@ -1143,11 +1734,18 @@ def print_banner():
     print()
 
     print("Задачи:")
-    print("  GET    /api/tasks            - список задач (фильтры: status, priority, author_id, executor_id)")
+    print("  GET    /api/tasks            - список задач (фильтры: status, priority, author_id, executor_id, include_archived)")
+    print("  GET    /api/tasks/changes    - изменения задач после ?since=<seq> (синхронизация)")
     print("  GET    /api/tasks/<id>       - детали задачи")
+    print("  GET    /api/tasks/export     - потоковая выгрузка задач (format=ndjson|csv, нужен токен)")
     print("  POST   /api/tasks            - создать задачу (admin / super_admin)")
+    print("  POST   /api/tasks/bulk       - массовое создание задач (admin / super_admin)")
+    print("  POST   /api/tasks/import     - потоковый импорт задач из NDJSON")
+    print("  PATCH  /api/tasks/bulk       - массовое обновление по ids / filters")
+    print("  DELETE /api/tasks/bulk       - массовое удаление по ids / filters")
     print("  PUT    /api/tasks/<id>       - обновить задачу (admin свои, super_admin любые)")
     print("  DELETE /api/tasks/<id>       - удалить задачу (admin свои, super_admin любые)")
+    print("  GET    /api/search?q=...     - полнотекстовый поиск по задачам и комментариям")
     print()
 
     print("Комментарии:")
@@ -1166,7 +1764,38 @@ def print_banner():
 
 
 
+# ===== ФОНОВЫЕ ЗАДАЧИ =====
+_background_jobs_lock = threading.Lock()
+_background_jobs_started = False
+
+
+def start_background_jobs():
+    """
+    Запустить фоновое обслуживание БД (maintenance) в этом процессе: чистку
+    токенов, журнала изменений и архивацию задач. Повторный вызов ничего не
+    делает. Вызывается в процессе, который обслуживает запросы: при
+    python app.py — ниже, под WSGI-сервером — после импорта app.
+    Возвращает True, если задачи запустил этот вызов.
+    """
+    global _background_jobs_started
+    with _background_jobs_lock:
+        if _background_jobs_started:
+            return False
+        _background_jobs_started = True
+    socketio.start_background_task(maintenance.token_sweeper_loop, sleep=socketio.sleep)
+    socketio.start_background_task(maintenance.task_changes_compactor_loop, sleep=socketio.sleep)
+    if storage.name == "sqlite":  # архивные таблицы есть только в схеме SQLite
+        socketio.start_background_task(maintenance.archiver_loop, sleep=socketio.sleep)
+    return True
+
+
 # ===== ЗАПУСК СЕРВЕРА =====
 if __name__ == '__main__':
     print_banner()
-    socketio.run(app, host="0.0.0.0", port=5000, debug=True)
+    debug = os.environ.get("TM_DEBUG", "1") != "0"
+    # debug запускает werkzeug reloader: родительский процесс только следит
+    # за файлами, а запросы обслуживает дочерний — фоновые задачи нужны в нём.
+    # Без reloader'а процесс один, и задачи стартуют в нём же
+    if not debug or is_running_from_reloader():
+        start_background_jobs()
+    socketio.run(app, host="0.0.0.0", port=5000, debug=debug)
@@ -1,30 +1,51 @@
 # cache.py
+import gzip
 import time
 from typing import Any, Dict, Optional, Tuple
 
 # Кэш списка задач (одна "выборка" по ключу)
 TASK_LIST_CACHE: Dict[str, Any] = {
     "key": None,
-    "data": None,        # сюда кладём словарь вида {"count": int, "tasks": [...]}
+    "data": None,        # готовое тело ответа — см. make_cached_body
     "expires_at": 0.0,
 }
 
-# Кэш деталей задач: task_id -> {"data": {...}, "expires_at": ts}
+# Кэш деталей задач: task_id -> {"data": {...}, "body": готовое тело или None, "expires_at": ts}
 TASK_DETAIL_CACHE: Dict[int, Dict[str, Any]] = {}
 
 # TTL в секундах (5 минут)
 TASK_CACHE_TTL = 300
 
+# Тела меньше этого размера не сжимаем: gzip их почти не уменьшит
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
 
 def _now() -> float:
     return time.time()
 
 
-def make_task_list_cache_key(filters: Dict[str, Any], page: int, limit: int) -> str:
-    """Делаем детерминированный ключ для кэша списка задач."""
+def make_task_list_cache_key(
+    filters: Dict[str, Any],
+    page: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    version: Optional[int] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> str:
+    """
+    Делаем детерминированный ключ для кэша списка задач.
+    version — номер изменения tasks (ETag списка): любая запись в БД,
+    в том числе из другого процесса, даёт новый ключ.
+    fields — набор полей (?fields=) в каноническом порядке, None — все.
+    """
     # Сортируем фильтры, чтобы при одинаковых параметрах ключ был тем же
     items = sorted(filters.items())
-    return f"{items}|page={page}|limit={limit}"
+    return (
+        f"{items}|page={page}|limit={limit}|cursor={cursor}|archived={include_archived}"
+        f"|v={version}|fields={','.join(fields) if fields is not None else '*'}"
+    )
 
 
 def get_cached_task_list(key: str) -> Optional[Dict[str, Any]]:
@@ -49,6 +70,25 @@ def set_cached_task_list(key: str, data: Dict[str, Any]) -> None:
     TASK_LIST_CACHE["expires_at"] = _now() + TASK_CACHE_TTL
 
 
+def make_cached_body(body: bytes) -> Dict[str, Any]:
+    """
+    Готовое тело ответа для кэша: JSON-байты как есть. Попадание в кэш —
+    отдача этих байтов, без повторной сериализации. gzip-версия считается
+    один раз, при первом запросе, который её принимает (gzip_body).
+    """
+    return {"body": body, "gzip": None}
+
+
+def gzip_body(entry: Dict[str, Any]) -> Optional[bytes]:
+    """Сжатое тело (None — слишком маленькое, отдаём как есть)."""
+    if len(entry["body"]) < GZIP_MIN_SIZE:
+        return None
+    if entry["gzip"] is None:
+        # mtime=0 — одинаковые байты при каждом сжатии одного и того же тела
+        entry["gzip"] = gzip.compress(entry["body"], compresslevel=GZIP_LEVEL, mtime=0)
+    return entry["gzip"]
+
+
 def invalidate_task_list_cache() -> None:
     """Полностью сбросить кэш списка задач."""
     TASK_LIST_CACHE["key"] = None
@@ -73,15 +113,37 @@ def set_cached_task_detail(task_id: int, data: Dict[str, Any]) -> None:
     """Положить детали задачи в кэш."""
     TASK_DETAIL_CACHE[task_id] = {
         "data": data,
+        "body": None,
         "expires_at": _now() + TASK_CACHE_TTL,
     }
 
 
+def get_cached_task_detail_body(task_id: int) -> Optional[Dict[str, Any]]:
+    """Готовое тело ответа GET /api/tasks/<id> (make_cached_body) или None."""
+    entry = TASK_DETAIL_CACHE.get(task_id)
+    if not entry or entry["expires_at"] < _now():
+        return None
+    return entry["body"]
+
+
+def set_cached_task_detail_body(task_id: int, body: Dict[str, Any]) -> None:
+    """Запомнить готовое тело рядом с уже закэшированными деталями задачи."""
+    entry = TASK_DETAIL_CACHE.get(task_id)
+    if entry is not None:
+        entry["body"] = body
+
+
 def invalidate_task_detail(task_id: int) -> None:
     """Сбросить кэш конкретной задачи."""
     TASK_DETAIL_CACHE.pop(task_id, None)
 
 
+def invalidate_task_details(task_ids) -> None:
+    """Сбросить кэш нескольких задач (например, всех задач переименованного пользователя)."""
+    for task_id in task_ids:
+        TASK_DETAIL_CACHE.pop(task_id, None)
+
+
 def invalidate_all_task_details() -> None:
     """Сбросить кэш всех задач (на всякий случай, если пригодится)."""
     TASK_DETAIL_CACHE.clear()
@@ -2,16 +2,36 @@
 import sqlite3
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+import json
+import os
+import pathlib
 import secrets
+import threading
 from werkzeug.security import generate_password_hash # для тестовых пользователей
 from typing import List, Optional, Dict, Any  
+from flask import g, has_app_context
+from db_pool import ConnectionPool
+from cache import invalidate_task_details
+from db_writer import SingleWriter
+from migrations import TASK_INSERT_BATCH, TASK_INSERT_TRIGGERS, run_migrations, task_insert_statements
+from records import CommentRecord, TaskRecord
+from storage_profiles import DEFAULT_PROFILE, apply_profile
 TOKEN_TTL_MINUTES = 120
-DB_NAME = 'task_manager.db'
+# файл БД; при импорте модуля он создаётся и заполняется тестовыми данными (внизу)
+DB_NAME = os.environ.get('TM_DB_NAME', 'task_manager.db')
+DB_POOL_SIZE = 8  # максимум соединений в пуле; 0 — без пула (новое соединение на каждый вызов)
+DB_WRITER_ENABLED = True  # частые записи идут через один поток-писатель с group commit
+DB_READ_POOL_SIZE = 8  # пул read-only соединений для чтений; 0 — читаем через обычный пул
+# Профиль PRAGMA для всех соединений (см. storage_profiles.py).
+# Меняется до первого обращения к БД — уже открытые пулы его не перечитывают.
+STORAGE_PROFILE = os.environ.get('TM_STORAGE_PROFILE', DEFAULT_PROFILE)
 
 # ===== СОЗДАНИЕ ТАБЛИЦ =====
 def init_db():
     """Создаёт все таблицы если их нет"""
     conn = sqlite3.connect(DB_NAME)
+    # journal_mode хранится в самом файле БД — выставляем сразу при создании
+    apply_profile(conn, STORAGE_PROFILE)
     cursor = conn.cursor()
     
     # Таблица пользователей
@@ -86,20 +106,391 @@ def init_db():
     ''')
     
     conn.commit()
+
+    # Индексы и прочие изменения схемы — версионными миграциями
+    applied = run_migrations(conn)
     conn.close()
     print(f"✅ База данных создана: {DB_NAME}")
+    if applied:
+        print(f"✅ Применены миграции: {', '.join(map(str, applied))}")
+
+# ===== ПУЛ СОЕДИНЕНИЙ =====
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> Optional[ConnectionPool]:
+    """Пул соединений для текущего DB_NAME (None, если пул выключен)."""
+    global _pool
+    if DB_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool.database != DB_NAME or _pool.max_size != DB_POOL_SIZE:
+            # сменили файл БД или размер пула (тесты, бенчмарки) — пересоздаём
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_NAME, max_size=DB_POOL_SIZE, on_connect=_configure_connection)
+        return _pool
+
+
+def close_pool():
+    """Закрыть все соединения пула (например, перед удалением файла БД)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _configure_connection(conn: sqlite3.Connection) -> None:
+    apply_profile(conn, STORAGE_PROFILE)
+
+
+def _read_only_uri() -> str:
+    """URI файла БД только на чтение (mode=ro)."""
+    return pathlib.Path(DB_NAME).resolve().as_uri() + "?mode=ro"
+
+
+def _configure_read_only(conn: sqlite3.Connection) -> None:
+    # mode=ro запрещает запись на уровне файла, query_only — на уровне
+    # соединения (в том числе случайный CREATE TEMP / ATTACH с записью)
+    conn.execute("PRAGMA query_only = 1")
+    apply_profile(conn, STORAGE_PROFILE, read_only=True)
+
+
+_read_pool: Optional[ConnectionPool] = None
+
+
+def get_read_pool() -> Optional[ConnectionPool]:
+    """Пул read-only соединений для текущего DB_NAME (None, если выключен)."""
+    global _read_pool
+    if DB_READ_POOL_SIZE <= 0:
+        return None
+    uri = _read_only_uri()
+    with _pool_lock:
+        if _read_pool is None or _read_pool.database != uri or _read_pool.max_size != DB_READ_POOL_SIZE:
+            if _read_pool is not None:
+                _read_pool.close()
+            _read_pool = ConnectionPool(
+                uri, max_size=DB_READ_POOL_SIZE, uri=True, on_connect=_configure_read_only,
+            )
+        return _read_pool
+
+
+def close_read_pool():
+    """Закрыть все соединения read-only пула."""
+    global _read_pool
+    with _pool_lock:
+        if _read_pool is not None:
+            _read_pool.close()
+            _read_pool = None
+
+
+def _acquire_connection():
+    """Взять соединение: из пула или новое. Возвращает (conn, pool)."""
+    pool = get_pool()
+    if pool is None:
+        conn = sqlite3.connect(DB_NAME)
+        conn.row_factory = sqlite3.Row
+        _configure_connection(conn)
+        return conn, None
+    return pool.checkout(), pool
+
+
+def _release_connection(conn, pool):
+    if pool is None:
+        conn.close()
+    else:
+        pool.checkin(conn)
+
+
+class PooledConnection:
+    """
+    Соединение, выданное get_connection().
+    Ведёт себя как sqlite3.Connection, но close() возвращает его в пул,
+    а `with get_connection() as conn:` делает commit/rollback и тоже возвращает.
+    Внутри сессии запроса commit()/close() ничего не делают — транзакцией
+    и соединением владеет DbSession.
+    """
+
+    def __init__(self, conn, pool, session=None):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_session", session)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise sqlite3.ProgrammingError("Соединение уже возвращено в пул")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def commit(self):
+        if self._session is None:
+            self._conn.commit()
+
+    def close(self):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            if self._session is None:
+                _release_connection(conn, self._pool)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._session is None:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # страховка: соединение забыли закрыть — всё равно возвращаем в пул
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# ===== ПОТОК-ПИСАТЕЛЬ (GROUP COMMIT) =====
+_writer: Optional[SingleWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> Optional[SingleWriter]:
+    """Поток-писатель для текущего DB_NAME (None, если выключен)."""
+    global _writer
+    if not DB_WRITER_ENABLED:
+        return None
+    with _writer_lock:
+        if _writer is None or _writer.database != DB_NAME:
+            if _writer is not None:
+                _writer.close()
+            _writer = SingleWriter(DB_NAME, on_connect=_configure_connection)
+        return _writer
+
+
+def close_writer():
+    """Дописать очередь и остановить поток-писатель."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def _write(job, *args):
+    """
+    Выполнить запись job(cursor, *args) через поток-писатель.
+    Внутри HTTP-запроса — в транзакции его сессии (DbSession.write_cursor):
+    все записи запроса коммитятся вместе в конце (COMMIT пачки писателя)
+    и вместе откатываются при ошибке.
+    Вне запроса (фоновые задачи, CLI) каждая запись — своё задание писателя:
+    она попадает в общую пачку и коммитится вместе с записями других потоков.
+    """
+    session = current_session()
+    if session is not None:
+        return job(session.write_cursor(), *args)
+
+    writer = get_writer()
+    if writer is None:
+        with get_db() as cursor:
+            return job(cursor, *args)
+    return writer.execute(job, *args)
+
+
+# ===== СЕССИЯ ЗАПРОСА (UNIT OF WORK) =====
+class DbSession:
+    """
+    Одно соединение и одна транзакция на весь HTTP-запрос.
+    Соединение берётся из пула лениво — при первом обращении к БД,
+    так что запросы, обслуженные из кэша, пул не трогают.
+    С первой записью (_write) транзакция запроса становится единицей работы
+    потока-писателя (db_writer.WriteUnit): дальше и запись, и чтение идут
+    через соединение писателя, а commit — общий COMMIT пачки вместе
+    с записями других запросов. Очередь к писателю вместо борьбы
+    соединений за блокировку записи SQLite.
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.pool = None
+        self.unit = None
+        self._after_commit = []
+        self._attached = {}
+
+    def connection(self):
+        if self.unit is not None:
+            return self.unit.conn
+        if self.conn is None:
+            self.conn, self.pool = _acquire_connection()
+        return self.conn
+
+    @property
+    def in_transaction(self) -> bool:
+        """Есть ли у запроса незакоммиченные записи."""
+        return self.unit is not None or (self.conn is not None and self.conn.in_transaction)
+
+    def write_cursor(self):
+        """Курсор для записи: в единице работы писателя (без писателя — в соединении сессии)."""
+        if self.unit is None:
+            writer = get_writer()
+            # запись уже прошла мимо писателя (get_db) — держим её в той же транзакции
+            if writer is None or (self.conn is not None and self.conn.in_transaction):
+                return self.cursor()
+            self.unit = writer.begin_unit()
+        return self.unit.conn.cursor()
+
+    def attach(self, key, open_connection):
+        """
+        Соединение другого хранилища (PostgreSQL — repository.py) на тот же запрос:
+        open_connection() -> (conn, finish), finish(commit) вызывается в close()
+        вместе с commit/rollback основного соединения.
+        """
+        if key not in self._attached:
+            self._attached[key] = open_connection()
+        return self._attached[key][0]
+
+    def cursor(self):
+        return self.connection().cursor()
+
+    def after_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def close(self, commit: bool):
+        """
+        Завершить транзакцию: commit (или rollback) и вернуть соединения.
+        Сессия остаётся рабочей — следующее обращение к БД начнёт новую
+        транзакцию (так импорт коммитит пачки по одной, см. commit_request_session).
+        """
+        callbacks, self._after_commit = self._after_commit, []
+        attached, self._attached = self._attached, {}
+        unit, self.unit = self.unit, None
+        conn, pool, self.conn = self.conn, self.pool, None
+        try:
+            if unit is not None:
+                unit.finish(commit)
+            if conn is not None:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        except BaseException:
+            if conn is not None:
+                conn.rollback()
+            for _, finish in attached.values():
+                finish(False)
+            raise
+        finally:
+            if conn is not None:
+                _release_connection(conn, pool)
+        for _, finish in attached.values():
+            finish(commit)
+        if commit:
+            for callback in callbacks:
+                callback()
+
+
+def current_session() -> Optional[DbSession]:
+    """Сессия текущего запроса Flask (или None вне запроса)."""
+    if not has_app_context():
+        return None
+    return g.get("db_session")
+
+
+def begin_request_session() -> DbSession:
+    session = DbSession()
+    g.db_session = session
+    return session
+
+
+def end_request_session(commit: bool) -> None:
+    """Закрыть сессию запроса. Повторный вызов ничего не делает."""
+    session = g.pop("db_session", None) if has_app_context() else None
+    if session is not None:
+        session.close(commit)
+
+
+def commit_request_session() -> None:
+    """
+    Закоммитить то, что запрос уже записал (и выполнить его after_commit),
+    и продолжить в новой транзакции. Для долгих запросов вроде импорта:
+    пачка за пачкой, без одной огромной транзакции на всё тело.
+    Вне запроса ничего не делает — там каждая запись коммитится сама.
+    """
+    session = current_session()
+    if session is not None:
+        session.close(commit=True)
+
+
+def after_commit(callback) -> None:
+    """
+    Выполнить callback после успешного commit сессии запроса
+    (вне запроса — сразу). При rollback callback отбрасывается.
+    """
+    session = current_session()
+    if session is None:
+        callback()
+    else:
+        session.after_commit(callback)
+
 
 # ===== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ =====
 @contextmanager
 def get_db():
-    """Контекстный менеджер для работы с БД"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row  # Возвращает словари вместо кортежей
+    """
+    Контекстный менеджер для работы с БД.
+    Внутри HTTP-запроса отдаёт курсор общей сессии (commit — в конце запроса),
+    вне запроса — курсор на соединении из пула с commit на выходе.
+    """
+    session = current_session()
+    if session is not None:
+        yield session.cursor()
+        return
+
+    conn, pool = _acquire_connection()
     try:
         yield conn.cursor()
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        _release_connection(conn, pool)
+
+@contextmanager
+def get_read_db():
+    """
+    Курсор только для чтения.
+    Берётся из read-only пула: в WAL такой читатель работает со снимком БД
+    и не мешает писателям (и не ждёт их). Если же у запроса уже открыта своя
+    транзакция, читаем через неё — иначе запрос не увидел бы собственных
+    незакоммиченных записей.
+    """
+    session = current_session()
+    if session is not None and session.in_transaction:
+        yield session.cursor()
+        return
+
+    pool = get_read_pool()
+    if pool is None:
+        with get_db() as cursor:
+            yield cursor
+        return
+
+    conn = pool.checkout()
+    try:
+        yield conn.cursor()
+    finally:
+        pool.checkin(conn)
 
 def dict_from_row(row):
     """Преобразует sqlite3.Row в словарь"""
@@ -120,18 +511,33 @@ def get_user_by_id(user_id):
             (user_id,)
         )
         return dict_from_row(cursor.fetchone())
-    
+
+def get_users_by_ids(user_ids) -> Dict[int, dict]:
+    """Пользователи по списку id одним запросом: {id: пользователь}."""
+    ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not ids:
+        return {}
+    with get_read_db() as cursor:
+        cursor.execute(
+            "SELECT id, email, username, created_at, role FROM users "
+            "WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),),
+        )
+        return {row["id"]: dict_from_row(row) for row in cursor.fetchall()}
+
 def update_user_role(user_id, new_role):
     """Обновить роль пользователя."""
     if new_role not in ("user", "admin", "super_admin"):
         return False
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute(
             "UPDATE users SET role = ? WHERE id = ?",
             (new_role, user_id)
         )
         return cursor.rowcount > 0
 
+    return _write(job)
+
 def get_user_usage_counts(user_id):
     """Вернуть количество задач и комментариев пользователя (для проверки перед удалением)."""
     with get_db() as cursor:
@@ -153,10 +559,12 @@ def get_user_usage_counts(user_id):
 
 def delete_user(user_id):
     """Удалить пользователя. ВАЖНО: перед этим нужно проверить, что у него нет задач/комментариев."""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
         return cursor.rowcount > 0
 
+    return _write(job)
+
 
 def get_user_by_email(email):
     """Получить пользователя по email"""
@@ -166,7 +574,7 @@ def get_user_by_email(email):
 
 def create_user(email, username, password_hash, role='user'):
     """Создать нового пользователя"""
-    with get_db() as cursor:
+    def job(cursor):
         try:
             cursor.execute(
                 """INSERT INTO users (email, username, password_hash, role) 
@@ -177,6 +585,8 @@ def create_user(email, username, password_hash, role='user'):
         except sqlite3.IntegrityError:
             return None
 
+    return _write(job)
+
 def get_user_by_access_token(token):
     with get_db() as cursor:
         cursor.execute(
@@ -192,28 +602,32 @@ def get_user_by_access_token(token):
         if not row:
             return None
 
-        expires_at = datetime.strptime(row["expires_at"], "%Y-%m-%d %H:%M:%S")
-        if _now_utc() > expires_at:
-            # токен истёк — удаляем и считаем недействительным
-            cursor.execute("DELETE FROM auth_tokens WHERE token = ?", (token,))
-            return None
+    expires_at = datetime.strptime(row["expires_at"], "%Y-%m-%d %H:%M:%S")
+    if _now_utc() > expires_at:
+        # токен истёк — удаляем и считаем недействительным
+        delete_access_token(token)
+        return None
 
-        return dict_from_row(row)
+    return dict_from_row(row)
 
 
 def delete_access_token(token: str) -> bool:
     """Удаляет конкретный токен."""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute("DELETE FROM auth_tokens WHERE token = ?", (token,))
         return cursor.rowcount > 0
 
+    return _write(job)
+
 
 def delete_all_tokens_for_user(user_id: int) -> int:
     """На всякий случай: удалить все токены пользователя (массовый логаут)."""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute("DELETE FROM auth_tokens WHERE user_id = ?", (user_id,))
         return cursor.rowcount
 
+    return _write(job)
+
 def update_user_basic(user_id, fields: dict):
     if not fields:
         return get_user_by_id(user_id)
@@ -226,90 +640,426 @@ def update_user_basic(user_id, fields: dict):
 
     params.append(user_id)
 
-    with get_connection() as conn:
-        cursor = conn.cursor()
+    def job(cursor):
         cursor.execute(f"""
             UPDATE users
             SET {", ".join(sets)}
             WHERE id = ?
         """, params)
-        conn.commit()
+        if 'username' not in fields:
+            return []
+        # имя автора / исполнителя есть в деталях задачи: их кэш устарел
+        cursor.execute("""
+            SELECT id FROM tasks WHERE author_id = ? OR executor_id = ?
+            UNION ALL
+            SELECT id FROM tasks_archive WHERE author_id = ? OR executor_id = ?
+        """, (user_id,) * 4)
+        return [row[0] for row in cursor.fetchall()]
+
+    task_ids = _write(job)
+    if task_ids:
+        after_commit(lambda: invalidate_task_details(task_ids))
     return get_user_by_id(user_id)
 
 
 # ===== ФУНКЦИИ ДЛЯ TASKS =====
-def get_all_tasks(filters=None, limit=100, offset=0):
-    """Получить все задачи с фильтрами"""
-    with get_db() as cursor:
+# Фильтр -> условие SQL (по таблице tasks с алиасом t)
+TASK_FILTERS = {
+    'status': "t.status = ?",
+    'priority': "t.priority = ?",
+    'author_id': "t.author_id = ?",
+    'executor_id': "t.executor_id = ?",
+    'due_date_before': "t.due_date <= ?",
+    'due_date_after': "t.due_date >= ?",
+}
+
+# Поля задачи в списке (?fields=) -> выражение SQL, в порядке ответа
+TASK_LIST_FIELDS = {
+    'id': "t.id",
+    'title': "t.title",
+    'description': "t.description",
+    'status': "t.status",
+    'priority': "t.priority",
+    'due_date': "t.due_date",
+    'author_id': "t.author_id",
+    'executor_id': "t.executor_id",
+    'created_at': "t.created_at",
+    'updated_at': "t.updated_at",
+    'author_name': "u1.username AS author_name",
+    'executor_name': "u2.username AS executor_name",
+}
+
+# Поля, ради которых нужен JOIN с users
+TASK_FIELD_JOINS = {
+    'author_name': "LEFT JOIN users u1 ON t.author_id = u1.id",
+    'executor_name': "LEFT JOIN users u2 ON t.executor_id = u2.id",
+}
+
+# Ключ keyset-пагинации (курсор) — есть в ответе при любом fields
+TASK_REQUIRED_FIELDS = ('id', 'created_at')
+
+# Те же фильтры над task_counters — для total без COUNT(*) по tasks. Пустое
+# значение в счётчике ('' / 0) — это NULL в задаче, а "t.x = ?" с NULL не
+# совпадает ни с чем: такие строки счётчика фильтр тоже не берёт
+COUNTER_FILTERS = {
+    'status': "status = ? AND status <> ''",
+    'priority': "priority = ? AND priority <> ''",
+    'executor_id': "executor_id = ? AND executor_id <> 0",
+}
+
+# Закрытые задачи — кандидаты на перенос в архив
+CLOSED_STATUSES = ('выполнена', 'отменена')
+
+# Колонки задачи, общие для tasks и tasks_archive
+_TASK_COLUMNS = (
+    "id, title, description, status, priority, due_date, "
+    "author_id, executor_id, created_at, updated_at, rev"
+)
+
+# Горячие и архивные задачи одной "таблицей" (для include_archived).
+# Условия WHERE SQLite проталкивает внутрь обеих частей UNION ALL.
+_TASKS_WITH_ARCHIVE = f'''(
+    SELECT {_TASK_COLUMNS}, 0 AS archived FROM tasks
+    UNION ALL
+    SELECT {_TASK_COLUMNS}, 1 AS archived FROM tasks_archive
+)'''
+
+
+def _task_filters_sql(filters, conditions=TASK_FILTERS):
+    """
+    Собрать ' AND ...' условия и параметры по фильтрам списка задач.
+    conditions — условия для каждого фильтра: по tasks (TASK_FILTERS)
+    или по task_counters (COUNTER_FILTERS).
+    """
+    sql = ""
+    params = []
+    for key, condition in conditions.items():
+        if filters and key in filters:
+            sql += f" AND {condition}"
+            params.append(filters[key])
+    return sql, params
+
+
+def task_fields_sql(fields=None):
+    """
+    SELECT-список и JOIN'ы для полей списка задач (None — все поля).
+    Поля идут в порядке TASK_LIST_FIELDS, TASK_REQUIRED_FIELDS добавляются
+    всегда; JOIN с users — только если нужны имена. Общий для SQLite и PostgreSQL.
+    """
+    if fields is None:
+        wanted = TASK_LIST_FIELDS
+    else:
+        wanted = set(fields).union(TASK_REQUIRED_FIELDS)
+    columns = ", ".join(expr for name, expr in TASK_LIST_FIELDS.items() if name in wanted)
+    joins = " ".join(join for name, join in TASK_FIELD_JOINS.items() if name in wanted)
+    return columns, joins
+
+
+def get_all_tasks(filters=None, limit=100, offset=0, after=None, include_archived=False, fields=None):
+    """
+    Получить все задачи с фильтрами.
+    after=(created_at, id) — keyset-пагинация: задачи строго "после" этой
+    (в порядке created_at DESC, id DESC); offset при этом не нужен.
+    include_archived=True — вместе с архивом (у каждой задачи поле archived).
+    fields — только эти поля из TASK_LIST_FIELDS (+ id и created_at):
+    меньше читается из БД и лишние JOIN'ы не делаются.
+    """
+    columns, joins = task_fields_sql(fields)
+    with get_read_db() as cursor:
+        query = f'''
+        SELECT {columns}{", t.archived" if include_archived else ""}
+        FROM {_TASKS_WITH_ARCHIVE if include_archived else "tasks"} t
+        {joins}
+        WHERE 1=1
+        '''
+        # Фильтры: статус, приоритет, автор, исполнитель, срок выполнения
+        filters_sql, params = _task_filters_sql(filters)
+        query += filters_sql
+
+        if after is not None:
+            # seek по индексу (created_at, id) вместо пропуска offset строк
+            query += " AND (t.created_at, t.id) < (?, ?)"
+            params.extend(after)
+
+        query += " ORDER BY t.created_at DESC, t.id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        
+        cursor.execute(query, params)
+        # компактные записи вместо sqlite3.Row + dict на строку (см. records.py)
+        cursor.row_factory = TaskRecord.row_factory(
+            cursor, {"archived": bool} if include_archived else None,
+        )
+        return cursor.fetchall()
+
+
+EXPORT_BATCH_SIZE = 1000
+
+# Колонки выгрузки задач (iter_tasks), в порядке выдачи
+EXPORT_COLUMNS = (
+    "id", "title", "description", "status", "priority", "due_date",
+    "author_id", "executor_id", "created_at", "updated_at",
+    "author_name", "executor_name",
+)
+
+
+def iter_tasks(filters=None, include_archived=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Выгрузка задач пачками кортежей (колонки — EXPORT_COLUMNS, + archived при
+    include_archived). Генератор: строки читаются через fetchmany, в памяти
+    одновременно не больше batch_size строк, сколько бы задач ни было.
+
+    Соединение своё, read-only и без сессии запроса: генератор дочитывается
+    уже после выхода из view (потоковый ответ). Один SELECT — один снимок БД
+    на всю выгрузку. Соединение возвращается в пул, когда генератор закрыт
+    (в том числе если клиент оборвал загрузку).
+    """
+    columns = ", ".join(
+        f"u1.username AS {c}" if c == "author_name"
+        else f"u2.username AS {c}" if c == "executor_name"
+        else f"t.{c}"
+        for c in EXPORT_COLUMNS
+    )
+    query = f'''
+    SELECT {columns}{", t.archived" if include_archived else ""}
+    FROM {_TASKS_WITH_ARCHIVE if include_archived else "tasks"} t
+    LEFT JOIN users u1 ON t.author_id = u1.id
+    LEFT JOIN users u2 ON t.executor_id = u2.id
+    WHERE 1=1
+    '''
+    filters_sql, params = _task_filters_sql(filters)
+    query += filters_sql + " ORDER BY t.id"
+
+    pool = get_read_pool()
+    if pool is not None:
+        conn = pool.checkout()
+    else:
+        conn, pool = _acquire_connection()
+    cursor = None
+    try:
+        conn.row_factory = None  # кортежи дешевле sqlite3.Row; пул вернёт row_factory при checkin
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        # незакрытый курсор держал бы снимок БД (и мешал checkpoint WAL)
+        if cursor is not None:
+            cursor.close()
+        _release_connection(conn, pool)
+
+
+def count_tasks(filters=None, include_archived=False):
+    """
+    Общее количество задач под фильтры (без учёта пагинации).
+    Комбинации status/priority/executor_id считаются по task_counters
+    (их ведут триггеры), остальные — COUNT(*) по индексам tasks.
+    include_archived=True — плюс COUNT(*) по архиву.
+    """
+    filters = filters or {}
+    archived = 0
+    if include_archived:
+        with get_read_db() as cursor:
+            filters_sql, params = _task_filters_sql(filters)
+            cursor.execute("SELECT COUNT(*) FROM tasks_archive t WHERE 1=1" + filters_sql, params)
+            archived = cursor.fetchone()[0]
+
+    with get_read_db() as cursor:
+        if all(key in COUNTER_FILTERS for key in filters):
+            filters_sql, params = _task_filters_sql(filters, COUNTER_FILTERS)
+            query = "SELECT COALESCE(SUM(count), 0) FROM task_counters WHERE 1=1" + filters_sql
+        else:
+            filters_sql, params = _task_filters_sql(filters)
+            query = "SELECT COUNT(*) FROM tasks t WHERE 1=1" + filters_sql
+
+        cursor.execute(query, params)
+        return cursor.fetchone()[0] + archived
+
+def get_task_change_seq():
+    """
+    Номер последнего изменения tasks и его время: {"seq": int, "changed_at": str}.
+    seq растёт на каждую вставку / правку / удаление задачи (триггеры),
+    по нему строится ETag списка задач.
+    """
+    with get_read_db() as cursor:
+        cursor.execute("SELECT seq, changed_at FROM task_change_seq WHERE id = 1")
+        return dict_from_row(cursor.fetchone())
+
+# Колонки задачи в записи журнала изменений — как в списке, + rev
+TASK_CHANGE_COLUMNS = (
+    "id", "title", "description", "status", "priority", "due_date",
+    "author_id", "executor_id", "created_at", "updated_at", "rev",
+    "author_name", "executor_name",
+)
+
+def get_task_changes(since: int, limit: int = 500) -> Dict[str, Any]:
+    """
+    Изменения задач после since (номер из task_change_seq) — для синхронизации
+    локальной копии. По записи на задачу, в порядке seq:
+    {"seq", "op": "upsert", "task_id", "task": {...}} — задача есть (текущая версия),
+    {"seq", "op": "delete", "task_id"} — удалена (или ушла в архив).
+
+    Возвращает {"seq": с какого since продолжать, "changes": [...],
+    "has_more": не всё поместилось в limit, "reset": журнал не покрывает since
+    (почищен или since из другой БД) — нужна полная перезагрузка списка}.
+    """
+    with get_read_db() as cursor:
+        cursor.execute("SELECT seq, min_seq FROM task_change_seq WHERE id = 1")
+        current, min_seq = cursor.fetchone()
+        if since < min_seq or since > current:
+            return {"seq": current, "changes": [], "has_more": False, "reset": True}
+
+        # верхняя граница — прочитанный seq: изменения новее достанутся в следующий раз
+        columns = ", ".join(
+            "u1.username AS author_name" if c == "author_name"
+            else "u2.username AS executor_name" if c == "executor_name"
+            else f"t.{c}"
+            for c in TASK_CHANGE_COLUMNS
+        )
+        cursor.execute(f'''
+        SELECT c.seq AS change_seq, c.op, c.task_id, {columns}
+        FROM task_changes c
+        LEFT JOIN tasks t ON c.op = 'upsert' AND t.id = c.task_id
+        LEFT JOIN users u1 ON t.author_id = u1.id
+        LEFT JOIN users u2 ON t.executor_id = u2.id
+        WHERE c.seq > ? AND c.seq <= ?
+        ORDER BY c.seq
+        LIMIT ?
+        ''', (since, current, limit + 1))
+        rows = cursor.fetchall()
+
+        # между запросами могли почистить надгробия новее since
+        cursor.execute("SELECT min_seq FROM task_change_seq WHERE id = 1")
+        if cursor.fetchone()[0] > since:
+            return {"seq": current, "changes": [], "has_more": False, "reset": True}
+
+    has_more = len(rows) > limit
+    changes = []
+    for row in rows[:limit]:
+        change = {"seq": row["change_seq"], "op": row["op"], "task_id": row["task_id"]}
+        if row["op"] == "upsert":
+            change["task"] = {c: row[c] for c in TASK_CHANGE_COLUMNS}
+        changes.append(change)
+    return {
+        "seq": changes[-1]["seq"] if has_more else current,
+        "changes": changes,
+        "has_more": has_more,
+        "reset": False,
+    }
+
+def compact_task_changes(older_than_days: int, limit: int = 1000, now: Optional[datetime] = None) -> int:
+    """
+    Удалить до limit надгробий (op='delete') старше older_than_days и сдвинуть
+    min_seq: клиент, не синхронизировавшийся дольше, получит reset.
+    Записи 'upsert' не чистятся — их не больше, чем задач. Возвращает число удалённых.
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def job(cursor):
+        cursor.execute(
+            "DELETE FROM task_changes WHERE task_id IN ("
+            "  SELECT task_id FROM task_changes WHERE op = 'delete' AND changed_at < ? LIMIT ?"
+            ") RETURNING seq",
+            (cutoff, limit),
+        )
+        seqs = [row[0] for row in cursor.fetchall()]
+        if seqs:
+            cursor.execute(
+                "UPDATE task_change_seq SET min_seq = MAX(min_seq, ?) WHERE id = 1", (max(seqs),)
+            )
+        return len(seqs)
+
+    return _write(job)
+
+def search_tasks(match_query, filters=None, limit=20, offset=0):
+    """
+    Полнотекстовый поиск задач (FTS5) по названию, описанию и комментариям.
+    match_query — готовое выражение MATCH (utils.search.build_match_query).
+    Задача попадает в выдачу один раз — по лучшему совпадению (bm25: меньше —
+    релевантнее; совпадение в названии весит больше, чем в описании).
+    snippet отдаётся с маркерами \x02 / \x03 вокруг найденных слов и по
+    нормализованному тексту (ё -> е); comment_text — текст комментария,
+    из которого он взят (для utils.search.render_snippet).
+    """
+    with get_read_db() as cursor:
         query = '''
-        SELECT 
+        WITH hits AS (
+            SELECT rowid AS task_id,
+                   bm25(tasks_fts, 5.0, 1.0) AS rank,
+                   snippet(tasks_fts, -1, char(2), char(3), '…', 12) AS snippet,
+                   'task' AS matched_in,
+                   NULL AS comment_text
+            FROM tasks_fts
+            WHERE tasks_fts MATCH ?
+            UNION ALL
+            SELECT c.task_id,
+                   bm25(comments_fts) AS rank,
+                   snippet(comments_fts, 0, char(2), char(3), '…', 12) AS snippet,
+                   'comment' AS matched_in,
+                   c.text AS comment_text
+            FROM comments_fts
+            JOIN comments c ON c.id = comments_fts.rowid
+            WHERE comments_fts MATCH ?
+        ),
+        best AS (
+            -- в SQLite "голые" колонки при MIN() берутся из строки с минимумом
+            SELECT task_id, MIN(rank) AS rank, snippet, matched_in, comment_text
+            FROM hits
+            GROUP BY task_id
+        )
+        SELECT
             t.id, t.title, t.description, t.status, t.priority, t.due_date,
             t.author_id, t.executor_id, t.created_at, t.updated_at,
             u1.username as author_name,
-            u2.username as executor_name
-        FROM tasks t
+            u2.username as executor_name,
+            best.rank, best.snippet, best.matched_in, best.comment_text
+        FROM best
+        JOIN tasks t ON t.id = best.task_id
         LEFT JOIN users u1 ON t.author_id = u1.id
         LEFT JOIN users u2 ON t.executor_id = u2.id
         WHERE 1=1
         '''
-        params = []
-        
-        if filters:
-            # Фильтр по статусу
-            if 'status' in filters:
-                query += " AND t.status = ?"
-                params.append(filters['status'])
-            
-            # Фильтр по приоритету
-            if 'priority' in filters:
-                query += " AND t.priority = ?"
-                params.append(filters['priority'])
-            
-            # Фильтр по автору
-            if 'author_id' in filters:
-                query += " AND t.author_id = ?"
-                params.append(filters['author_id'])
-            
-            # Фильтр по исполнителю
-            if 'executor_id' in filters:
-                query += " AND t.executor_id = ?"
-                params.append(filters['executor_id'])
-            
-            # Фильтр по сроку выполнения
-            if 'due_date_before' in filters:
-                query += " AND t.due_date <= ?"
-                params.append(filters['due_date_before'])
-            
-            if 'due_date_after' in filters:
-                query += " AND t.due_date >= ?"
-                params.append(filters['due_date_after'])
-        
-        query += " ORDER BY t.created_at DESC LIMIT ? OFFSET ?"
+        params = [match_query, match_query]
+        filters_sql, filter_params = _task_filters_sql(filters)
+        query += filters_sql
+        params.extend(filter_params)
+
+        query += " ORDER BY best.rank, t.id DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
-        
+
         cursor.execute(query, params)
         return [dict_from_row(row) for row in cursor.fetchall()]
 
 def get_task_by_id(task_id):
-    """Получить задачу по ID"""
-    with get_db() as cursor:
-        cursor.execute('''
-        SELECT 
-            t.id, t.title, t.description, t.status, t.priority, t.due_date,
-            t.author_id, t.executor_id, t.created_at, t.updated_at,
-            u1.username as author_name,
-            u2.username as executor_name
-        FROM tasks t
-        LEFT JOIN users u1 ON t.author_id = u1.id
-        LEFT JOIN users u2 ON t.executor_id = u2.id
-        WHERE t.id = ?
-        ''', (task_id,))
-        return dict_from_row(cursor.fetchone())
+    """
+    Получить задачу по ID.
+    Если в горячей таблице её нет — ищем в архиве (у такой задачи archived=True).
+    """
+    with get_read_db() as cursor:
+        for table in ("tasks", "tasks_archive"):
+            cursor.execute(f'''
+            SELECT 
+                t.id, t.title, t.description, t.status, t.priority, t.due_date,
+                t.author_id, t.executor_id, t.created_at, t.updated_at, t.rev,
+                u1.username as author_name,
+                u2.username as executor_name
+            FROM {table} t
+            LEFT JOIN users u1 ON t.author_id = u1.id
+            LEFT JOIN users u2 ON t.executor_id = u2.id
+            WHERE t.id = ?
+            ''', (task_id,))
+            task = dict_from_row(cursor.fetchone())
+            if task is not None:
+                if table == "tasks_archive":
+                    task["archived"] = True
+                return task
+        return None
 
 def create_task(title, description, author_id, executor_id=None, 
                 status='к выполнению', priority='средний', due_date=None):
     """Создать новую задачу"""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute('''
         INSERT INTO tasks 
         (title, description, status, priority, due_date, author_id, executor_id)
@@ -317,6 +1067,87 @@ def create_task(title, description, author_id, executor_id=None,
         ''', (title, description, status, priority, due_date, author_id, executor_id))
         return cursor.lastrowid
 
+    return _write(job)
+
+# AFTER INSERT-триггеры tasks "на пачку": те же запросы, что в триггерах
+# (migrations.TASK_INSERT_TRIGGERS), но над диапазоном новых id
+# (параметры — первый и последний id)
+TASK_INSERT_TRIGGERS_BATCH_SQL = {
+    name: task_insert_statements(name, TASK_INSERT_BATCH)
+    for name in TASK_INSERT_TRIGGERS
+}
+
+# С какого размера пачки create_tasks_bulk обновляет счётчики и FTS
+# одним запросом на пачку, а не триггером на каждую строку
+BULK_BATCH_TRIGGERS_MIN = 100
+
+
+def _insert_tasks(cursor, rows):
+    """
+    Вставить строки в tasks одним INSERT ... SELECT по json_each
+    (без лимита на число параметров). id созданных задач — из RETURNING,
+    по возрастанию: это и есть порядок rows.
+    """
+    cursor.execute(
+        f"""
+        INSERT INTO tasks (title, description, status, priority, due_date, author_id, executor_id)
+        SELECT value ->> 0, value ->> 1, value ->> 2, value ->> 3, value ->> 4, value ->> 5, value ->> 6
+        FROM json_each(?) ORDER BY key
+        RETURNING id
+        """,
+        (json.dumps(rows),),
+    )
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def _insert_tasks_batch_triggers(cursor, rows):
+    """
+    Вставить строки в tasks, выполнив AFTER INSERT-триггеры один раз на пачку.
+    Триггеры остаются на месте, но молчат, пока в bulk_insert_guard есть строка
+    (TASK_INSERT_GUARD, миграция 9); строка живёт только в этой транзакции,
+    другие соединения её не видят. Их работу делает TASK_INSERT_TRIGGERS_BATCH_SQL.
+    """
+    cursor.execute("INSERT INTO bulk_insert_guard (id) VALUES (1)")
+    try:
+        task_ids = _insert_tasks(cursor, rows)
+    finally:
+        cursor.execute("DELETE FROM bulk_insert_guard")
+
+    # Пока транзакция открыта, писать в tasks можем только мы, а id
+    # с AUTOINCREMENT строго растут — значит пачка занимает id подряд
+    for statements in TASK_INSERT_TRIGGERS_BATCH_SQL.values():
+        for batch_sql in statements:
+            cursor.execute(batch_sql, (task_ids[0], task_ids[-1]))
+    return task_ids
+
+
+def create_tasks_bulk(tasks):
+    """
+    Создать пачку задач одним INSERT в одной транзакции.
+    tasks — список словарей с полями как у create_task.
+    Возвращает id созданных задач в том же порядке.
+    Для пачек от BULK_BATCH_TRIGGERS_MIN счётчики и FTS-индекс обновляются
+    одним запросом на пачку (см. _insert_tasks_batch_triggers).
+    """
+    if not tasks:
+        return []
+
+    rows = [
+        (
+            t['title'], t.get('description'),
+            t.get('status') or 'к выполнению', t.get('priority') or 'средний',
+            t.get('due_date'), t['author_id'], t.get('executor_id'),
+        )
+        for t in tasks
+    ]
+
+    def job(cursor):
+        if len(rows) >= BULK_BATCH_TRIGGERS_MIN:
+            return _insert_tasks_batch_triggers(cursor, rows)
+        return _insert_tasks(cursor, rows)
+
+    return _write(job)
+
 def update_task(task_id, **kwargs):
     """Обновить задачу"""
     if not kwargs:
@@ -336,42 +1167,140 @@ def update_task(task_id, **kwargs):
     
     params.append(task_id)
     
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute(
             f"UPDATE tasks SET {', '.join(updates)}, "
-            "updated_at = DATETIME('now','localtime') "
+            "updated_at = DATETIME('now','localtime'), rev = rev + 1 "
             "WHERE id = ?",
             params
         )
         return cursor.rowcount > 0
 
+    return _write(job)
+
+def _bulk_target_sql(ids=None, filters=None, author_id=None):
+    """WHERE для массовых операций: список id или фильтры + ограничение по автору."""
+    sql = " WHERE 1=1"
+    params = []
+    if ids is not None:
+        # json_each вместо IN (?, ?, ...) — без лимита на число параметров
+        sql += " AND t.id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(ids)))
+    if filters:
+        filters_sql, filters_params = _task_filters_sql(filters)
+        sql += filters_sql
+        params.extend(filters_params)
+    if author_id is not None:
+        sql += " AND t.author_id = ?"
+        params.append(author_id)
+    return sql, params
+
+
+def update_tasks_bulk(changes, ids=None, filters=None, author_id=None):
+    """
+    Один UPDATE для всех задач из ids / под filters.
+    author_id — обновлять только задачи этого автора (права admin).
+    Возвращает список id обновлённых задач.
+    """
+    allowed_fields = ['title', 'description', 'status', 'priority', 'due_date', 'executor_id']
+    updates = []
+    params = []
+    for field, value in changes.items():
+        if field in allowed_fields and value is not None:
+            updates.append(f"{field} = ?")
+            params.append(value)
+    if not updates:
+        return []
+
+    where_sql, where_params = _bulk_target_sql(ids, filters, author_id)
+    def job(cursor):
+        cursor.execute(
+            f"UPDATE tasks AS t SET {', '.join(updates)}, "
+            "updated_at = DATETIME('now','localtime'), rev = rev + 1"
+            f"{where_sql} RETURNING id",
+            params + where_params
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    return _write(job)
+
+
+def delete_tasks_bulk(ids=None, filters=None, author_id=None):
+    """Один DELETE для всех задач из ids / под filters. Возвращает id удалённых."""
+    where_sql, where_params = _bulk_target_sql(ids, filters, author_id)
+    def job(cursor):
+        cursor.execute(f"DELETE FROM tasks AS t{where_sql} RETURNING id", where_params)
+        return [row[0] for row in cursor.fetchall()]
+
+    return _write(job)
+
+
 def delete_task(task_id):
     """Удалить задачу"""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
         return cursor.rowcount > 0
 
+    return _write(job)
+
 # ===== ФУНКЦИИ ДЛЯ COMMENTS =====
 def get_comments_by_task(task_id):
-    """Получить комментарии к задаче"""
-    with get_db() as cursor:
-        cursor.execute('''
-        SELECT c.*, u.username as author_name
-        FROM comments c
+    """
+    Получить комментарии к задаче.
+    Комментарии переезжают в архив вместе с задачей (а к архивной задаче
+    новых не добавить), поэтому архив смотрим, только если горячих нет.
+    """
+    with get_read_db() as cursor:
+        for table in ("comments", "comments_archive"):
+            cursor.execute(f'''
+            SELECT c.*, u.username as author_name
+            FROM {table} c
+            JOIN users u ON c.author_id = u.id
+            WHERE c.task_id = ?
+            ORDER BY c.created_at
+            ''', (task_id,))
+            cursor.row_factory = CommentRecord.row_factory(cursor)
+            comments = cursor.fetchall()
+            if comments:
+                return comments
+        return []
+
+def get_comments_for_tasks(task_ids) -> Dict[int, list]:
+    """
+    Комментарии сразу нескольких задач одним запросом (горячие и архивные):
+    {task_id: [комментарии в порядке создания]}. Задачи без комментариев — [].
+    """
+    ids = sorted(set(task_ids))
+    result = {task_id: [] for task_id in ids}
+    if not ids:
+        return result
+    select = '''
+        SELECT c.id, c.task_id, c.author_id, c.text, c.created_at AS created_at, u.username AS author_name
+        FROM {table} c
         JOIN users u ON c.author_id = u.id
-        WHERE c.task_id = ?
-        ORDER BY c.created_at
-        ''', (task_id,))
-        return [dict_from_row(row) for row in cursor.fetchall()]
+        WHERE c.task_id IN (SELECT value FROM json_each(:ids))
+    '''
+    with get_read_db() as cursor:
+        cursor.execute(
+            select.format(table="comments") + " UNION ALL " + select.format(table="comments_archive")
+            + " ORDER BY task_id, created_at",
+            {"ids": json.dumps(ids)},
+        )
+        cursor.row_factory = CommentRecord.row_factory(cursor)
+        for comment in cursor.fetchall():
+            result[comment["task_id"]].append(comment)
+    return result
 
 def add_comment(task_id, author_id, text):
     """Добавить комментарий к задаче"""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute(
             "INSERT INTO comments (task_id, author_id, text) VALUES (?, ?, ?)",
             (task_id, author_id, text)
         )
         return cursor.lastrowid
+
+    return _write(job)
     
 def get_comment_by_id(comment_id):
     """Получить один комментарий по ID"""
@@ -391,40 +1320,57 @@ def get_comment_by_id(comment_id):
         return dict_from_row(cursor.fetchone())
 
 
+def delete_comment(comment_id):
+    """Удалить комментарий"""
+    def job(cursor):
+        cursor.execute("DELETE FROM comments WHERE id = ?", (comment_id,))
+        return cursor.rowcount > 0
+
+    return _write(job)
+
+
 def update_comment(comment_id, text):
     """Обновить текст комментария"""
     if not text:
         return False
 
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute(
             "UPDATE comments SET text = ? WHERE id = ?",
             (text, comment_id)
         )
         return cursor.rowcount > 0
+
+    return _write(job)
     
 def get_task_stats():
-    """Получить статистику задач по статусам и приоритетам."""
-    with get_db() as cursor:
+    """
+    Получить статистику задач по статусам и приоритетам.
+    Читается из task_stats_counters (их ведут триггеры) — без сканирования tasks.
+    """
+    with get_read_db() as cursor:
         stats = {
             "by_status": {},
             "by_priority": {},
         }
 
-        cursor.execute("SELECT status, COUNT(*) as count FROM tasks GROUP BY status")
-        for row in cursor.fetchall():
-            stats["by_status"][row["status"]] = row["count"]
-
-        cursor.execute("SELECT priority, COUNT(*) as count FROM tasks GROUP BY priority")
+        cursor.execute(
+            "SELECT dimension, value, count FROM task_stats_counters WHERE count > 0"
+        )
         for row in cursor.fetchall():
-            stats["by_priority"][row["priority"]] = row["count"]
+            # value = '' — задача с NULL в этом поле
+            stats[f"by_{row['dimension']}"][row["value"] or None] = row["count"]
 
         return stats
 
 
 def get_active_users(limit: int = 10):
-    """Получить список активных пользователей (по задачам и комментариям)."""
-    with get_db() as cursor:
+    """
+    Получить список активных пользователей (по задачам и комментариям).
+    Счётчики берутся из user_activity (их ведут триггеры), топ читается
+    по индексу idx_user_activity_total — без JOIN задач с комментариями.
+    """
+    with get_read_db() as cursor:
         cursor.execute("""
         SELECT 
             u.id,
@@ -432,16 +1378,173 @@ def get_active_users(limit: int = 10):
             u.username,
             u.role,
             u.created_at,
-            COUNT(DISTINCT t.id) AS tasks_count,
-            COUNT(DISTINCT c.id) AS comments_count
-        FROM users u
-        LEFT JOIN tasks t ON t.author_id = u.id
-        LEFT JOIN comments c ON c.author_id = u.id
-        GROUP BY u.id, u.email, u.username, u.role, u.created_at
-        ORDER BY tasks_count + comments_count DESC, u.id
+            a.tasks_count,
+            a.comments_count
+        FROM user_activity a
+        JOIN users u ON u.id = a.user_id
+        ORDER BY a.tasks_count + a.comments_count DESC, a.user_id
         LIMIT ?
         """, (limit,))
         return [dict_from_row(row) for row in cursor.fetchall()]
+# ===== АРХИВ ЗАКРЫТЫХ ЗАДАЧ =====
+def archive_closed_tasks(older_than_days: int, limit: int = 500, now: Optional[datetime] = None) -> List[int]:
+    """
+    Перенести в архив до limit закрытых задач (CLOSED_STATUSES), которые не
+    менялись дольше older_than_days, вместе с комментариями и записями о
+    файлах. Всё — одной транзакцией потока-писателя. Возвращает id перенесённых.
+
+    Удаление из горячих таблиц запускает обычные триггеры: счётчики списка
+    и статистики и FTS-индекс начинают описывать только горячие задачи.
+    Активность пользователей (user_activity) включает архив — её уменьшение
+    компенсируем заранее.
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    placeholders = ", ".join("?" for _ in CLOSED_STATUSES)
+
+    def job(cursor):
+        cursor.execute(
+            f"SELECT id FROM tasks WHERE status IN ({placeholders}) AND updated_at < ? LIMIT ?",
+            (*CLOSED_STATUSES, cutoff, limit),
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+
+        target = "(SELECT value FROM json_each(?))"
+        ids_json = json.dumps(ids)
+
+        cursor.execute(
+            f"INSERT INTO tasks_archive ({_TASK_COLUMNS}) "
+            f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id IN {target}",
+            (ids_json,),
+        )
+        cursor.execute(
+            "INSERT INTO comments_archive (id, task_id, author_id, text, created_at) "
+            f"SELECT id, task_id, author_id, text, created_at FROM comments WHERE task_id IN {target}",
+            (ids_json,),
+        )
+        cursor.execute(
+            "INSERT INTO task_files_archive "
+            "(id, task_id, original_name, stored_name, content_type, size_bytes, uploaded_at, uploader_id) "
+            "SELECT id, task_id, original_name, stored_name, content_type, size_bytes, uploaded_at, uploader_id "
+            f"FROM task_files WHERE task_id IN {target}",
+            (ids_json,),
+        )
+
+        # триггеры удаления сейчас уменьшат user_activity — прибавляем столько же
+        cursor.execute(
+            f'''
+            UPDATE user_activity SET tasks_count = tasks_count + moved.n
+            FROM (SELECT author_id, COUNT(*) AS n FROM tasks WHERE id IN {target} GROUP BY author_id) AS moved
+            WHERE user_activity.user_id = moved.author_id
+            ''',
+            (ids_json,),
+        )
+        cursor.execute(
+            f'''
+            UPDATE user_activity SET comments_count = comments_count + moved.n
+            FROM (SELECT author_id, COUNT(*) AS n FROM comments WHERE task_id IN {target} GROUP BY author_id) AS moved
+            WHERE user_activity.user_id = moved.author_id
+            ''',
+            (ids_json,),
+        )
+
+        cursor.execute(f"DELETE FROM comments WHERE task_id IN {target}", (ids_json,))
+        cursor.execute(f"DELETE FROM task_files WHERE task_id IN {target}", (ids_json,))
+        cursor.execute(f"DELETE FROM tasks WHERE id IN {target}", (ids_json,))
+        return ids
+
+    return _write(job)
+
+
+# ===== СЧЁТЧИКИ (ПРОВЕРКА / ПЕРЕСЧЁТ) =====
+# Таблицы, которые ведут триггеры. Для каждой — колонки и SELECT, дающий
+# правильное содержимое "с нуля" по исходным таблицам. Строки с нулевыми
+# счётчиками (остаются после удалений) при сравнении не учитываются.
+COUNTER_TABLES = {
+    "task_counters": {
+        "columns": ("status", "priority", "executor_id", "count"),
+        "expected": '''
+            SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(executor_id, 0), COUNT(*)
+            FROM tasks
+            GROUP BY 1, 2, 3
+        ''',
+        "nonzero": "count != 0",
+    },
+    "task_stats_counters": {
+        "columns": ("dimension", "value", "count"),
+        "expected": '''
+            SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tasks GROUP BY 2
+            UNION ALL
+            SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tasks GROUP BY 2
+        ''',
+        "nonzero": "count != 0",
+    },
+    "user_activity": {
+        "columns": ("user_id", "tasks_count", "comments_count"),
+        "expected": '''
+            SELECT user_id, SUM(tasks), SUM(comments) FROM (
+                SELECT id AS user_id, 0 AS tasks, 0 AS comments FROM users
+                UNION ALL
+                SELECT author_id, COUNT(*), 0 FROM tasks GROUP BY author_id
+                UNION ALL
+                SELECT author_id, COUNT(*), 0 FROM tasks_archive GROUP BY author_id
+                UNION ALL
+                SELECT author_id, 0, COUNT(*) FROM comments GROUP BY author_id
+                UNION ALL
+                SELECT author_id, 0, COUNT(*) FROM comments_archive GROUP BY author_id
+            )
+            GROUP BY user_id
+        ''',
+        "nonzero": "tasks_count != 0 OR comments_count != 0 OR user_id IN (SELECT id FROM users)",
+    },
+}
+
+
+def check_counters(tables=None) -> Dict[str, int]:
+    """
+    Сверить счётчики с исходными таблицами.
+    Возвращает {таблица: число расходящихся строк} (0 — всё сходится;
+    строка с неверным счётчиком считается дважды — "ожидалось" и "есть").
+    """
+    result = {}
+    with get_read_db() as cursor:
+        for table in tables or COUNTER_TABLES:
+            spec = COUNTER_TABLES[table]
+            actual = f"SELECT {', '.join(spec['columns'])} FROM {table} WHERE {spec['nonzero']}"
+            cursor.execute(f'''
+            SELECT COUNT(*) FROM (
+                SELECT * FROM ({spec['expected']}) EXCEPT {actual}
+                UNION ALL
+                SELECT * FROM ({actual} EXCEPT SELECT * FROM ({spec['expected']}))
+            )
+            ''')
+            result[table] = cursor.fetchone()[0]
+    return result
+
+
+def rebuild_counters(tables=None) -> Dict[str, int]:
+    """
+    Пересчитать счётчики с нуля (одной транзакцией, через поток-писатель —
+    параллельные записи подождут и не увидят полупустых таблиц).
+    Возвращает {таблица: число строк после пересчёта}.
+    """
+    names = list(tables or COUNTER_TABLES)
+
+    def job(cursor):
+        result = {}
+        for table in names:
+            spec = COUNTER_TABLES[table]
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(spec['columns'])}) {spec['expected']}"
+            )
+            result[table] = cursor.rowcount
+        return result
+
+    return _write(job)
+
+
 # ===== LEGACY ATTACHMENTS (не используется, оставлено для совместимости/истории) =====
 # В проекте актуальная система файлов — таблица task_files и функции ниже.
 # ===== ФУНКЦИИ ДЛЯ ATTACHMENT ========
@@ -501,29 +1604,38 @@ def get_attachments_for_task(task_id: int) -> list[dict]:
 
 def get_attachment_by_id(attachment_id: int) -> dict | None:
     """
-    Один файл по ID.
+    Один файл по ID. Файл архивной задачи берётся из task_files_archive
+    (у такого archived=True).
     """
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            id,
-            task_id,
-            stored_name,
-            original_name,
-            content_type,
-            size_bytes,
-            uploader_id,
-            uploaded_at
-        FROM task_files
-        WHERE id = ?
-        """,
-        (attachment_id,),
-    )
-    row = cur.fetchone()
+    for table in ("task_files", "task_files_archive"):
+        cur.execute(
+            f"""
+            SELECT
+                id,
+                task_id,
+                stored_name,
+                original_name,
+                content_type,
+                size_bytes,
+                uploader_id,
+                uploaded_at
+            FROM {table}
+            WHERE id = ?
+            """,
+            (attachment_id,),
+        )
+        row = cur.fetchone()
+        if row:
+            break
     conn.close()
-    return dict(row) if row else None
+    if row is None:
+        return None
+    attachment = dict(row)
+    if table == "task_files_archive":
+        attachment["archived"] = True
+    return attachment
 
 def delete_attachment(attachment_id: int) -> bool:
     """
@@ -539,6 +1651,28 @@ def delete_attachment(attachment_id: int) -> bool:
 
 
 # ===== ИНИЦИАЛИЗАЦИЯ =====
+# Тестовые данные (общие для всех хранилищ — см. repository.py)
+# Пользователи (пароль: 123456)
+TEST_USERS = [
+    ('super@mail.ru', 'Супер Админ', 'super_admin'),
+    ('admin@mail.ru', 'Администратор', 'admin'),
+    ('ivan@mail.ru', 'Иван Петров', 'user'),
+    ('anna@mail.ru', 'Анна Сидорова', 'user')
+]
+TEST_PASSWORD = "123456"
+
+TEST_TASKS = [
+    ('Настроить сервер', 'Установить и настроить веб-сервер', 2, 3, 'в процессе', 'высокий', '2024-12-10'),
+    ('Создать API', 'Написать REST API endpoints', 1, 4, 'к выполнению', 'средний', '2024-12-15'),
+    ('Тестирование', 'Протестировать функционал', 2, 3, 'к выполнению', 'низкий', None),
+]
+
+TEST_COMMENTS = [
+    (1, 1, 'Сервер нужно настроить до конца недели'),
+    (1, 3, 'Какая версия Ubuntu ставим?'),
+    (2, 1, 'API должно быть RESTful'),
+]
+
 def add_test_data():
     """Добавить тестовые данные"""
     with get_db() as cursor:
@@ -548,45 +1682,21 @@ def add_test_data():
             print("✅ Тестовые данные уже существуют")
             return
         
-        # Тестовые пользователи (пароль: 123456)
-        users = [
-            ('super@mail.ru', 'Супер Админ', 'super_admin'),
-            ('admin@mail.ru', 'Администратор', 'admin'),
-            ('ivan@mail.ru', 'Иван Петров', 'user'),
-            ('anna@mail.ru', 'Анна Сидорова', 'user')
-        ]
-        
-        for email, username, role in users:
+        for email, username, role in TEST_USERS:
             cursor.execute(
                 """INSERT INTO users (email, username, password_hash, role) 
                    VALUES (?, ?, ?, ?)""",
-                (email, username, generate_password_hash("123456"), role)
+                (email, username, generate_password_hash(TEST_PASSWORD), role)
             )
 
-
-        
-        # Тестовые задачи
-        tasks = [
-            ('Настроить сервер', 'Установить и настроить веб-сервер', 2, 3, 'в процессе', 'высокий', '2024-12-10'),
-            ('Создать API', 'Написать REST API endpoints', 1, 4, 'к выполнению', 'средний', '2024-12-15'),
-            ('Тестирование', 'Протестировать функционал', 2, 3, 'к выполнению', 'низкий', None),
-        ]
-        
-        for title, desc, author, executor, status, priority, due_date in tasks:
+        for title, desc, author, executor, status, priority, due_date in TEST_TASKS:
             cursor.execute('''
             INSERT INTO tasks 
             (title, description, author_id, executor_id, status, priority, due_date)
             VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (title, desc, author, executor, status, priority, due_date))
         
-        # Тестовые комментарии
-        comments = [
-            (1, 1, 'Сервер нужно настроить до конца недели'),
-            (1, 3, 'Какая версия Ubuntu ставим?'),
-            (2, 1, 'API должно быть RESTful'),
-        ]
-        
-        for task_id, author_id, text in comments:
+        for task_id, author_id, text in TEST_COMMENTS:
             cursor.execute(
                 "INSERT INTO comments (task_id, author_id, text) VALUES (?, ?, ?)",
                 (task_id, author_id, text)
@@ -603,7 +1713,7 @@ def create_auth_token(user_id):
     now = _now_utc()
     expires_at = now + timedelta(minutes=TOKEN_TTL_MINUTES)
 
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute(
             """
             INSERT INTO auth_tokens (token, user_id, expires_at, created_at)
@@ -616,6 +1726,8 @@ def create_auth_token(user_id):
                 now.strftime("%Y-%m-%d %H:%M:%S"),
             ),
         )
+
+    _write(job)
     return token
 
 
@@ -636,7 +1748,7 @@ def get_user_by_token(token: str):
 
 def refresh_token(old_token: str, expires_in: int = 3600):
     """Обновить токен: старый инвалидируем, создаём новый."""
-    with get_db() as cursor:
+    def job(cursor):
         cursor.execute('''
         SELECT user_id FROM auth_tokens
         WHERE token = ? AND expires_at > CURRENT_TIMESTAMP
@@ -659,42 +1771,85 @@ def refresh_token(old_token: str, expires_in: int = 3600):
         )
 
         return new_token
+
+    return _write(job)
+
+
+def delete_expired_tokens(limit: int = 1000, now: Optional[datetime] = None) -> int:
+    """
+    Удалить не больше limit протухших токенов (самые старые — первыми).
+    Ограниченная пачка — короткая транзакция: писатель не держит
+    блокировку надолго, даже если протухших накопились миллионы.
+    Поиск — по индексу idx_auth_tokens_expires. Возвращает число удалённых.
+    """
+    cutoff = (now or _now_utc()).strftime("%Y-%m-%d %H:%M:%S")
+
+    def job(cursor):
+        cursor.execute(
+            """
+            DELETE FROM auth_tokens
+            WHERE rowid IN (
+                SELECT rowid FROM auth_tokens
+                WHERE expires_at < ?
+                ORDER BY expires_at
+                LIMIT ?
+            )
+            """,
+            (cutoff, limit),
+        )
+        return cursor.rowcount
+
+    return _write(job)
+
+
+def get_auth_tokens_size() -> Dict[str, Any]:
+    """
+    Размер таблицы auth_tokens: строк всего / протухших и байт на диске
+    (таблица + её индексы, по dbstat; None, если SQLite собран без dbstat).
+    """
+    now = _now_utc().strftime("%Y-%m-%d %H:%M:%S")
+    with get_read_db() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM auth_tokens")
+        rows = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM auth_tokens WHERE expires_at < ?", (now,))
+        expired = cursor.fetchone()[0]
+        try:
+            cursor.execute('''
+            SELECT SUM(pgsize) FROM dbstat
+            WHERE name = 'auth_tokens'
+               OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'auth_tokens' AND type = 'index')
+            ''')
+            size_bytes = cursor.fetchone()[0]
+        except sqlite3.OperationalError:  # no such table: dbstat
+            size_bytes = None
+    return {"rows": rows, "expired": expired, "size_bytes": size_bytes}
     
 # ====== ФАЙЛЫ ===========
 def get_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Соединение из пула (или соединение сессии запроса); close() возвращает его обратно."""
+    session = current_session()
+    if session is not None:
+        return PooledConnection(session.connection(), None, session)
+    conn, pool = _acquire_connection()
+    return PooledConnection(conn, pool)
 
 def save_task_file(task_id: int, stored_name: str, original_name: str, content_type: str, size_bytes: int, uploader_id: int = None):
     """
     Сохранить файл задачи в базу данных.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO task_files (task_id, stored_name, original_name, content_type, size_bytes, uploader_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (task_id, stored_name, original_name, content_type, size_bytes, uploader_id)
-    )
-    conn.commit()
-    cursor.execute(
-        """
-        SELECT id, task_id, stored_name, original_name, content_type, size_bytes, uploader_id, uploaded_at
-        FROM task_files
-        WHERE id = ?
-        """,
-        (cursor.lastrowid,)
-    )
-    row = cursor.fetchone()
-    conn.close()
-
-    if not row:
-        return None
+    def job(cursor):
+        cursor.execute(
+            """
+            INSERT INTO task_files (task_id, stored_name, original_name, content_type, size_bytes, uploader_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            RETURNING id, task_id, stored_name, original_name, content_type, size_bytes, uploader_id, uploaded_at
+            """,
+            (task_id, stored_name, original_name, content_type, size_bytes, uploader_id)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
 
-    return dict(row)
+    return _write(job)
 
 
 def get_task_files_for_task(task_id: int) -> list[dict]:
@@ -703,66 +1858,67 @@ def get_task_files_for_task(task_id: int) -> list[dict]:
     """
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, task_id, stored_name, original_name, content_type, size_bytes, uploader_id, uploaded_at
-        FROM task_files
-        WHERE task_id = ?
-        ORDER BY uploaded_at DESC
-        """,
-        (task_id,)
-    )
-    rows = cursor.fetchall()
+    # файлы архивной задачи лежат в task_files_archive (см. get_comments_by_task)
+    for table in ("task_files", "task_files_archive"):
+        cursor.execute(
+            f"""
+            SELECT id, task_id, stored_name, original_name, content_type, size_bytes, uploader_id, uploaded_at
+            FROM {table}
+            WHERE task_id = ?
+            ORDER BY uploaded_at DESC
+            """,
+            (task_id,)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            break
     conn.close()
 
     return [dict(row) for row in rows]
 
 
 
-def get_task_file(file_id: int) -> dict | None:
+def get_task_files_for_tasks(task_ids) -> Dict[int, list]:
     """
-    Получить файл по ID.
+    Файлы сразу нескольких задач одним запросом (горячие и архивные):
+    {task_id: [файлы, новые первыми]}, как get_task_files_for_task для каждой.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
+    ids = sorted(set(task_ids))
+    result = {task_id: [] for task_id in ids}
+    if not ids:
+        return result
+    select = """
         SELECT id, task_id, stored_name, original_name, content_type, size_bytes, uploader_id, uploaded_at
-        FROM task_files
-        WHERE id = ?
-        """,
-        (file_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
+        FROM {table}
+        WHERE task_id IN (SELECT value FROM json_each(:ids))
+    """
+    with get_read_db() as cursor:
+        cursor.execute(
+            select.format(table="task_files") + " UNION ALL " + select.format(table="task_files_archive")
+            + " ORDER BY task_id, uploaded_at DESC",
+            {"ids": json.dumps(ids)},
+        )
+        for row in cursor.fetchall():
+            result[row["task_id"]].append(dict(row))
+    return result
 
-    return dict(row) if row else None
+
+def get_task_file(file_id: int) -> dict | None:
+    """
+    Получить файл по ID (с архивом, как get_attachment_by_id).
+    """
+    return get_attachment_by_id(file_id)
 
 
 def delete_task_file(file_id: int) -> bool:
     """
     Удалить файл по ID из базы данных.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM task_files WHERE id = ?', (file_id,))
-    conn.commit()
-    affected_rows = cursor.rowcount
-    conn.close()
-
-    return affected_rows > 0
-
-def get_task_file(file_id: int) -> dict | None:
-    file = get_task_file(file_id)
-    if file is None:
-        raise FileNotFoundError(f"File with ID {file_id} not found.")
-    return file
+    def job(cursor):
+        cursor.execute('DELETE FROM task_files WHERE id = ?', (file_id,))
+        return cursor.rowcount > 0
 
-def delete_task_file(file_id: int) -> bool:
-    success = delete_task_file(file_id)
-    if not success:
-        raise FileNotFoundError(f"File with ID {file_id} not found or already deleted.")
-    return success
+    return _write(job)
 
 # Алиасы на всякий случай, если во view мы используем другие имена
 def get_task_files(task_id: int) -> list[dict]:
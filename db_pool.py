@@ -0,0 +1,205 @@
+# db_pool.py
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Все соединения пула заняты, и ни одно не вернули за отведённое время."""
+
+
+class _IdleConnection:
+    """Свободное соединение в пуле + служебная информация о нём."""
+
+    __slots__ = ("conn", "thread_id", "released_at")
+
+    def __init__(self, conn: sqlite3.Connection, thread_id: int, released_at: float):
+        self.conn = conn
+        self.thread_id = thread_id
+        self.released_at = released_at
+
+
+class ConnectionPool:
+    """
+    Пул "тёплых" соединений SQLite.
+
+    - checkout() выдаёт соединение: сначала то, которым этот же поток
+      пользовался в прошлый раз, затем самое свежее из свободных, и только
+      потом открывает новое (если не упёрлись в max_size);
+    - checkin() возвращает соединение: незакрытая транзакция откатывается;
+    - соединение, пролежавшее без дела дольше health_check_interval,
+      перед выдачей проверяется запросом SELECT 1 и при ошибке пересоздаётся.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        max_size: int = 8,
+        timeout: float = 5.0,
+        health_check_interval: float = 30.0,
+        uri: bool = False,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+        row_factory=sqlite3.Row,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size должен быть >= 1")
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.uri = uri
+        self.on_connect = on_connect
+        self.row_factory = row_factory
+
+        self._idle: List[_IdleConnection] = []
+        self._size = 0  # открыто соединений всего (свободные + выданные)
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # счётчики для отладки / бенчмарков
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    # ---------- создание / проверка соединений ----------
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False: соединение может перейти к другому потоку,
+        # но одновременно им пользуется только тот, кто сделал checkout()
+        conn = sqlite3.connect(self.database, uri=self.uri, check_same_thread=False)
+        conn.row_factory = self.row_factory
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        self.created += 1
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self.discarded += 1
+
+    def _take_idle(self) -> Optional[_IdleConnection]:
+        """Забрать свободное соединение, предпочитая "своё" для текущего потока."""
+        if not self._idle:
+            return None
+        thread_id = threading.get_ident()
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].thread_id == thread_id:
+                return self._idle.pop(i)
+        return self._idle.pop()  # LIFO: самое "тёплое"
+
+    # ---------- публичный API ----------
+    def checkout(self) -> sqlite3.Connection:
+        """Взять соединение из пула (блокируется, если все max_size заняты)."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+                idle = self._take_idle()
+                if idle is not None:
+                    break
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    idle = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Нет свободных соединений (max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        if idle is None:
+            try:
+                return self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+
+        conn = idle.conn
+        if time.monotonic() - idle.released_at >= self.health_check_interval:
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+        self.reused += 1
+        return conn
+
+    def checkin(self, conn: sqlite3.Connection) -> None:
+        """Вернуть соединение в пул. Незавершённая транзакция откатывается."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            # вызывающий код мог поменять row_factory — возвращаем как было
+            conn.row_factory = self.row_factory
+        except sqlite3.Error:
+            self._discard(conn)
+            self._release_slot()
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                self._discard(conn)
+                return
+            self._idle.append(
+                _IdleConnection(conn, threading.get_ident(), time.monotonic())
+            )
+            self._cond.notify()
+
+    def discard(self, conn: sqlite3.Connection) -> None:
+        """Закрыть "сломанное" соединение вместо возврата в пул."""
+        self._discard(conn)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... — checkout + гарантированный checkin."""
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def close(self) -> None:
+        """Закрыть все свободные соединения; выданные закроются при возврате."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            self._discard(item.conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
@@ -0,0 +1,240 @@
+# db_writer.py
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Optional
+
+_STOP = object()
+
+
+class _WriteJob:
+    __slots__ = ("fn", "args", "kwargs", "future")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteUnit:
+    """
+    Единица работы (транзакция HTTP-запроса) внутри пачки писателя.
+
+    Когда очередь доходит до единицы, писатель открывает SAVEPOINT и отдаёт
+    своё соединение потоку запроса, а сам ждёт finish(). Все записи и чтения
+    запроса идут через это соединение; finish(True) — RELEASE и ожидание
+    COMMIT пачки, finish(False) — откат к SAVEPOINT. Пока соединение
+    у запроса, писатель больше ничего не выполняет, так что единицы
+    не перемешиваются и откат одной не задевает другие.
+    """
+
+    def __init__(self):
+        self.conn: Optional[sqlite3.Connection] = None
+        self.future = Future()  # результат — после COMMIT пачки
+        self._lent = Future()   # соединение писателя, когда до единицы дошла очередь
+        self._finished = threading.Event()
+        self._released = False
+
+    def wait(self, timeout: Optional[float]) -> sqlite3.Connection:
+        """Дождаться своей очереди. TimeoutError — единица снимается с очереди."""
+        try:
+            self.conn = self._lent.result(timeout)
+        except FutureTimeout:
+            if self._lent.cancel():
+                raise
+            self.conn = self._lent.result()
+        return self.conn
+
+    def finish(self, commit: bool, timeout: Optional[float] = 30) -> None:
+        """Завершить единицу; при commit — дождаться COMMIT пачки (ошибка пробрасывается)."""
+        conn, self.conn = self.conn, None
+        try:
+            if not commit:
+                conn.execute("ROLLBACK TO write_unit")
+            conn.execute("RELEASE write_unit")
+            self._released = commit
+        except BaseException:
+            conn.execute("ROLLBACK TO write_unit")
+            conn.execute("RELEASE write_unit")
+            raise
+        finally:
+            self._finished.set()
+        if commit:
+            self.future.result(timeout)
+
+    # ---------- в потоке-писателе ----------
+    def _fail(self, error: BaseException) -> None:
+        if self._lent.set_running_or_notify_cancel():
+            self._lent.set_exception(error)
+
+    def _lend(self, conn: sqlite3.Connection) -> bool:
+        """Отдать соединение запросу и ждать finish(). True — записи единицы нужно коммитить."""
+        if not self._lent.set_running_or_notify_cancel():
+            return False
+        conn.execute("SAVEPOINT write_unit")
+        self._lent.set_result(conn)
+        self._finished.wait()
+        self.future.set_running_or_notify_cancel()
+        if not self._released:
+            self.future.set_result(None)
+        return self._released
+
+
+class SingleWriter:
+    """
+    Один поток-писатель на файл БД.
+
+    Записи ставятся в очередь (submit -> Future). Поток забирает из очереди
+    всё, что накопилось (до max_batch), и выполняет одной транзакцией —
+    group commit: один COMMIT (и один fsync) на пачку вместо одного на запись.
+    Каждая запись идёт в своём SAVEPOINT, так что ошибка одной не откатывает
+    остальные. Конкуренции за блокировку записи между потоками больше нет.
+    Транзакция HTTP-запроса целиком — единица работы (begin_unit) в той же пачке.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        max_batch: int = 64,
+        max_wait: float = 0.002,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        self.database = database
+        self.max_batch = max_batch
+        self.max_wait = max_wait  # сколько ждать "попутчиков" для пачки, сек
+        self.on_connect = on_connect
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+
+        # статистика: сколько записей и сколько COMMIT
+        self.jobs = 0
+        self.commits = 0
+
+        self._thread.start()
+
+    # ---------- публичный API ----------
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Поставить запись в очередь. fn(cursor, *args, **kwargs) выполнится в потоке-писателе."""
+        if not self._thread.is_alive():
+            raise sqlite3.ProgrammingError("Поток записи остановлен")
+        job = _WriteJob(fn, args, kwargs)
+        self._queue.put(job)
+        return job.future
+
+    def execute(self, fn: Callable, *args, timeout: Optional[float] = 30, **kwargs):
+        """submit + ожидание результата (исключение пробрасывается вызывающему)."""
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    def begin_unit(self, timeout: Optional[float] = 30) -> WriteUnit:
+        """
+        Открыть единицу работы (см. WriteUnit) и дождаться соединения писателя.
+        Вызывающий обязан завершить её unit.finish(commit).
+        """
+        if not self._thread.is_alive():
+            raise sqlite3.ProgrammingError("Поток записи остановлен")
+        unit = WriteUnit()
+        self._queue.put(unit)
+        unit.wait(timeout)
+        return unit
+
+    def close(self, timeout: Optional[float] = 5) -> None:
+        """Дописать очередь и остановить поток."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "jobs": self.jobs,
+            "commits": self.commits,
+            "queued": self._queue.qsize(),
+        }
+
+    # ---------- поток-писатель ----------
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None — транзакциями управляем сами (BEGIN IMMEDIATE / COMMIT)
+        conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def _collect_batch(self, first) -> tuple[list, bool]:
+        """Добрать в пачку то, что уже в очереди или придёт за max_wait."""
+        batch = [first]
+        stop = False
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=self.max_wait)
+            except queue.Empty:
+                break
+            if job is _STOP:
+                stop = True
+                break
+            batch.append(job)
+        return batch, stop
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                job = self._queue.get()
+                if job is _STOP:
+                    break
+                batch, stop = self._collect_batch(job)
+                self._commit_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            for job in batch:
+                if isinstance(job, WriteUnit):
+                    job._fail(e)
+                else:
+                    job.future.set_exception(e)
+            return
+
+        cursor = conn.cursor()
+        for job in batch:
+            if isinstance(job, WriteUnit):
+                if job._lend(conn):
+                    done.append((job, None))
+                continue
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            cursor.execute("SAVEPOINT write_job")
+            try:
+                result = job.fn(cursor, *job.args, **job.kwargs)
+            except BaseException as e:
+                cursor.execute("ROLLBACK TO write_job")
+                cursor.execute("RELEASE write_job")
+                job.future.set_exception(e)
+            else:
+                cursor.execute("RELEASE write_job")
+                done.append((job, result))
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for job, _ in done:
+                job.future.set_exception(e)
+            return
+
+        self.jobs += len(done)
+        self.commits += 1
+        for job, result in done:
+            job.future.set_result(result)
@@ -0,0 +1,95 @@
+# json_provider.py
+"""
+JSON-провайдеры Flask, которые умеют сериализовать записи из records.py.
+Запись отдаёт значения как есть: промежуточный dict живёт только
+на время кодирования одной строки и в кэше не остаётся.
+
+Провайдеров два, вывод у них побайтно одинаковый (ключи по алфавиту,
+кириллица как есть, без \\uXXXX, даты — как у Flask, в формате HTTP):
+  RecordJSONProvider  — stdlib json;
+  OrjsonJSONProvider  — orjson (в разы быстрее на больших списках).
+
+Какой использовать, задаёт окружение:
+  TM_JSON_PROVIDER = auto (по умолчанию: orjson, если установлен) | orjson | stdlib
+"""
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+from records import Record
+
+try:  # orjson — необязательная зависимость: pip install orjson
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDER = os.environ.get("TM_JSON_PROVIDER", "auto")
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider + Record -> JSON-объект."""
+
+    name = "stdlib"
+    # JSON_AS_ASCII во Flask 3 больше не читается — отключаем экранирование здесь:
+    # кириллица в UTF-8 вдвое-втрое короче, чем \\uXXXX
+    ensure_ascii = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonJSONProvider(RecordJSONProvider):
+    """
+    Тот же вывод, что у RecordJSONProvider, но кодирует orjson.
+    Даты и dataclass orjson не трогает (PASSTHROUGH) — их, как и Record,
+    переводит default() Flask. Всё, чего orjson не умеет (ключи не-строки,
+    целые больше 64 бит, очень глубокая вложенность), кодирует stdlib —
+    поэтому результат не зависит от провайдера. Красивый вывод
+    (indent в режиме отладки) — тоже stdlib.
+    Различие одно: float в экспоненциальной записи (1e-05 у stdlib, 0.00001
+    у orjson) и NaN (null у orjson); в ответах API float только округлённые.
+    """
+
+    name = "orjson"
+
+    def __init__(self, app):
+        if orjson is None:
+            raise RuntimeError("Для TM_JSON_PROVIDER=orjson нужен пакет orjson: pip install orjson")
+        super().__init__(app)
+
+    def _encode(self, obj) -> bytes:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs) -> str:
+        # orjson пишет только компактно; с пробелами после , и : (как json.dumps
+        # по умолчанию) и с прочими аргументами — stdlib
+        if kwargs != {"separators": (",", ":")}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+def create_json_provider(app, name: str = None) -> DefaultJSONProvider:
+    """JSON-провайдер по имени (по умолчанию — из TM_JSON_PROVIDER)."""
+    name = name or JSON_PROVIDER
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name == "orjson":
+        return OrjsonJSONProvider(app)
+    if name == "stdlib":
+        return RecordJSONProvider(app)
+    raise ValueError(f"Неизвестный JSON-провайдер: {name}. Доступны: auto, orjson, stdlib")
@@ -0,0 +1,220 @@
+# maintenance.py
+"""
+Фоновое обслуживание БД.
+
+- Чистка протухших токенов: auth_tokens пополняется на каждом логине, а
+  истёкшая строка раньше удалялась, только если кто-то предъявит этот токен.
+  Чистильщик периодически удаляет протухшие токены ограниченными пачками и
+  пишет метрику размера таблицы (история — в TOKEN_METRICS).
+- Архивация: закрытые задачи старше ARCHIVE_AFTER_DAYS переезжают в
+  tasks_archive (с комментариями и файлами), история — в ARCHIVE_METRICS.
+- Чистка журнала изменений: надгробия удалённых задач старше
+  TASK_CHANGES_RETENTION_DAYS удаляются из task_changes; клиент синхронизации,
+  отставший сильнее, получит reset. История — в TASK_CHANGES_METRICS.
+
+Метрики отдаются в /admin/stats.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Optional
+
+from cache import invalidate_task_detail, invalidate_task_list_cache
+from repository import get_repository
+
+TOKEN_SWEEP_INTERVAL = 300   # раз в сколько секунд чистить
+TOKEN_SWEEP_BATCH = 1000     # строк за одну транзакцию
+TOKEN_SWEEP_PAUSE = 0.05     # пауза между пачками — даём пройти обычным записям
+
+# История метрик: последние сутки при интервале 5 минут
+TOKEN_METRICS: Deque[Dict[str, Any]] = deque(maxlen=288)
+
+ARCHIVE_AFTER_DAYS = 90      # закрытые задачи, не менявшиеся дольше, — в архив
+ARCHIVE_INTERVAL = 3600      # раз в сколько секунд запускать перенос
+ARCHIVE_BATCH = 500          # задач за одну транзакцию
+ARCHIVE_PAUSE = 0.05
+
+ARCHIVE_METRICS: Deque[Dict[str, Any]] = deque(maxlen=168)  # неделя при интервале в час
+
+TASK_CHANGES_RETENTION_DAYS = 30   # сколько дней хранить надгробия удалённых задач
+TASK_CHANGES_INTERVAL = 3600
+TASK_CHANGES_BATCH = 1000
+TASK_CHANGES_PAUSE = 0.05
+
+TASK_CHANGES_METRICS: Deque[Dict[str, Any]] = deque(maxlen=168)
+
+
+def sweep_expired_tokens(
+    batch_size: int = TOKEN_SWEEP_BATCH,
+    max_batches: Optional[int] = None,
+    pause: float = TOKEN_SWEEP_PAUSE,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """Удалить все протухшие токены пачками по batch_size. Возвращает число удалённых."""
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        deleted = get_repository().delete_expired_tokens(batch_size)
+        total += deleted
+        batches += 1
+        if deleted < batch_size:
+            break
+        sleep(pause)
+    return total
+
+
+def record_token_metrics(deleted: int = 0, duration: float = 0.0) -> Dict[str, Any]:
+    """Снять размер auth_tokens и добавить точку в TOKEN_METRICS."""
+    sample = {
+        "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "deleted": deleted,
+        "duration_ms": round(duration * 1000, 1),
+        **get_repository().get_auth_tokens_size(),
+    }
+    TOKEN_METRICS.append(sample)
+    return sample
+
+
+def run_token_sweep() -> Dict[str, Any]:
+    """Один проход: чистка + метрика."""
+    start = time.perf_counter()
+    deleted = sweep_expired_tokens()
+    return record_token_metrics(deleted, time.perf_counter() - start)
+
+
+def archive_old_tasks(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH,
+    max_batches: Optional[int] = None,
+    pause: float = ARCHIVE_PAUSE,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """Перенести в архив все подходящие закрытые задачи пачками. Возвращает их число."""
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = get_repository().archive_closed_tasks(older_than_days, batch_size)
+        total += len(ids)
+        batches += 1
+        if ids:
+            # задачи ушли из горячих таблиц — кэш списков и деталей устарел
+            invalidate_task_list_cache()
+            for task_id in ids:
+                invalidate_task_detail(task_id)
+        if len(ids) < batch_size:
+            break
+        sleep(pause)
+    return total
+
+
+def run_archive() -> Dict[str, Any]:
+    """Один проход архивации + метрика."""
+    start = time.perf_counter()
+    moved = archive_old_tasks()
+    sample = {
+        "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "moved": moved,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    ARCHIVE_METRICS.append(sample)
+    return sample
+
+
+def compact_task_changes(
+    older_than_days: int = TASK_CHANGES_RETENTION_DAYS,
+    batch_size: int = TASK_CHANGES_BATCH,
+    max_batches: Optional[int] = None,
+    pause: float = TASK_CHANGES_PAUSE,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """Удалить старые надгробия из журнала изменений пачками. Возвращает их число."""
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        deleted = get_repository().compact_task_changes(older_than_days, batch_size)
+        total += deleted
+        batches += 1
+        if deleted < batch_size:
+            break
+        sleep(pause)
+    return total
+
+
+def run_task_changes_compaction() -> Dict[str, Any]:
+    """Один проход чистки журнала + метрика."""
+    start = time.perf_counter()
+    deleted = compact_task_changes()
+    sample = {
+        "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "deleted": deleted,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    TASK_CHANGES_METRICS.append(sample)
+    return sample
+
+
+def run_periodically(
+    job: Callable[[], Any],
+    interval: float,
+    stop_event: Optional[threading.Event] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    title: str = "Фоновая задача",
+) -> None:
+    """
+    Бесконечный цикл job() раз в interval секунд (до stop_event).
+    Ошибка одного прохода не останавливает цикл — следующий проход повторит.
+    """
+    while stop_event is None or not stop_event.is_set():
+        try:
+            job()
+        except Exception as e:
+            print(f"⚠️ {title} не удалась: {e}")
+        sleep(interval)
+
+
+def token_sweeper_loop(
+    interval: float = TOKEN_SWEEP_INTERVAL,
+    stop_event: Optional[threading.Event] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    """Цикл чистильщика токенов."""
+    run_periodically(run_token_sweep, interval, stop_event, sleep, "Чистка токенов")
+
+
+def archiver_loop(
+    interval: float = ARCHIVE_INTERVAL,
+    stop_event: Optional[threading.Event] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    """Цикл архивации закрытых задач."""
+    run_periodically(run_archive, interval, stop_event, sleep, "Архивация задач")
+
+
+def task_changes_compactor_loop(
+    interval: float = TASK_CHANGES_INTERVAL,
+    stop_event: Optional[threading.Event] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    """Цикл чистки журнала изменений задач."""
+    run_periodically(run_task_changes_compaction, interval, stop_event, sleep, "Чистка журнала изменений")
+
+
+def get_maintenance_stats() -> Dict[str, Any]:
+    """Метрики для /admin/stats."""
+    return {
+        "auth_tokens": {
+            "last": TOKEN_METRICS[-1] if TOKEN_METRICS else None,
+            "history": list(TOKEN_METRICS),
+        },
+        "archive": {
+            "after_days": ARCHIVE_AFTER_DAYS,
+            "last": ARCHIVE_METRICS[-1] if ARCHIVE_METRICS else None,
+            "history": list(ARCHIVE_METRICS),
+        },
+        "task_changes": {
+            "retention_days": TASK_CHANGES_RETENTION_DAYS,
+            "last": TASK_CHANGES_METRICS[-1] if TASK_CHANGES_METRICS else None,
+            "history": list(TASK_CHANGES_METRICS),
+        },
+    }
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Служебные команды для локальной БД (работают с файлом напрямую, без API).
+
+Примеры:
+  python manage.py check-counters
+  python manage.py rebuild-counters
+  python manage.py rebuild-counters --table task_stats_counters
+  python manage.py sweep-tokens
+  python manage.py archive-tasks --older-than-days 180
+  python manage.py import-tasks tasks.ndjson
+  python manage.py --db /path/to/other.db check-counters
+"""
+import argparse
+import os
+import sys
+
+
+def _db_from_argv(argv):
+    """Значение --db без разбора остальных аргументов."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--db")
+    return parser.parse_known_args(argv)[0].db
+
+
+# database.py при импорте создаёт БД и тестовые данные в своём DB_NAME —
+# файл из --db нужно задать раньше, иначе init_db() тронет task_manager.db
+if __name__ == "__main__":
+    _db = _db_from_argv(sys.argv[1:])
+    if _db:
+        os.environ["TM_DB_NAME"] = _db
+
+import database
+import maintenance
+import task_import
+from repository import close_repository, get_repository
+
+
+def cmd_check_counters(args):
+    """Сверить счётчики с исходными таблицами. Код выхода 1 — есть расхождения."""
+    result = database.check_counters(args.table)
+    for table, mismatched in result.items():
+        mark = "✅" if mismatched == 0 else "❌"
+        print(f"{mark} {table}: расходящихся строк — {mismatched}")
+
+    if any(result.values()):
+        print("   Исправить: python manage.py rebuild-counters")
+        sys.exit(1)
+
+
+def cmd_rebuild_counters(args):
+    """Пересчитать счётчики с нуля."""
+    result = database.rebuild_counters(args.table)
+    for table, rows in result.items():
+        print(f"✅ {table}: пересчитано, строк — {rows}")
+    database.close_writer()
+
+
+def cmd_sweep_tokens(args):
+    """Удалить протухшие токены пачками и показать размер auth_tokens."""
+    deleted = maintenance.sweep_expired_tokens(batch_size=args.batch, pause=0)
+    size = get_repository().get_auth_tokens_size()
+    print(f"✅ Удалено протухших токенов: {deleted}")
+    print(f"   auth_tokens: строк — {size['rows']}, протухших — {size['expired']}, "
+          f"на диске — {size['size_bytes'] if size['size_bytes'] is not None else '?'} байт")
+    close_repository()
+
+
+def cmd_archive_tasks(args):
+    """Перенести старые закрытые задачи в архив."""
+    moved = maintenance.archive_old_tasks(args.older_than_days, batch_size=args.batch, pause=0)
+    print(f"✅ Перенесено в архив задач: {moved} (закрытые, не менялись {args.older_than_days}+ дн.)")
+    database.close_writer()
+
+
+def cmd_import_tasks(args):
+    """Загрузить задачи из NDJSON-файла (или stdin) пачками."""
+    created = 0
+
+    def on_chunk(task_ids):
+        nonlocal created
+        created += len(task_ids)
+        print(f"   ... создано {created}", end="\r", flush=True)
+
+    if args.file == "-":
+        report = task_import.import_ndjson(sys.stdin.buffer, args.chunk_size, on_chunk=on_chunk)
+    else:
+        with open(args.file, "rb") as f:
+            report = task_import.import_ndjson(f, args.chunk_size, on_chunk=on_chunk)
+    database.close_writer()
+    if created:
+        print()  # после строки прогресса
+
+    print(f"✅ Создано задач: {report['created']} (строк — {report['lines']}, пачек — {report['chunks']})")
+    if report["failed"]:
+        print(f"❌ С ошибками строк: {report['failed']}")
+        for item in report["errors"]:
+            print(f"   строка {item['line']}: {'; '.join(item['errors'])}")
+        if report["errors_truncated"]:
+            print("   ... остальные ошибки не показаны")
+        sys.exit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Служебные команды Task Manager для локальной БД.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "--db",
+        help=f"Файл БД (по умолчанию {database.DB_NAME}).",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    table_help = "Только эта таблица (можно несколько раз). По умолчанию — все."
+
+    p_check = subparsers.add_parser(
+        "check-counters",
+        help="Проверить, что счётчики сходятся с данными.",
+        description=(
+            "Сверить таблицы счётчиков, которые ведут триггеры, с исходными данными.\n"
+            f"Таблицы: {', '.join(database.COUNTER_TABLES)}"
+        ),
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    p_check.add_argument("--table", action="append", choices=list(database.COUNTER_TABLES), help=table_help)
+    p_check.set_defaults(func=cmd_check_counters)
+
+    p_rebuild = subparsers.add_parser(
+        "rebuild-counters",
+        help="Пересчитать счётчики с нуля.",
+        description=(
+            "Пересчитать таблицы счётчиков по исходным данным одной транзакцией.\n"
+            f"Таблицы: {', '.join(database.COUNTER_TABLES)}"
+        ),
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    p_rebuild.add_argument("--table", action="append", choices=list(database.COUNTER_TABLES), help=table_help)
+    p_rebuild.set_defaults(func=cmd_rebuild_counters)
+
+    p_sweep = subparsers.add_parser(
+        "sweep-tokens",
+        help="Удалить протухшие токены авторизации.",
+        description=(
+            "Удалить протухшие строки auth_tokens пачками (то же, что делает\n"
+            "фоновый чистильщик сервера), и показать размер таблицы."
+        ),
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    p_sweep.add_argument(
+        "--batch", type=int, default=maintenance.TOKEN_SWEEP_BATCH,
+        help=f"Строк за одну транзакцию (по умолчанию {maintenance.TOKEN_SWEEP_BATCH}).",
+    )
+    p_sweep.set_defaults(func=cmd_sweep_tokens)
+
+    p_archive = subparsers.add_parser(
+        "archive-tasks",
+        help="Перенести старые закрытые задачи в архив.",
+        description=(
+            "Перенести задачи со статусом 'выполнена' / 'отменена', которые не менялись\n"
+            "дольше заданного срока, в tasks_archive вместе с комментариями и файлами\n"
+            "(то же, что делает фоновый архиватор сервера)."
+        ),
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    p_archive.add_argument(
+        "--older-than-days", type=int, default=maintenance.ARCHIVE_AFTER_DAYS,
+        help=f"Возраст в днях (по умолчанию {maintenance.ARCHIVE_AFTER_DAYS}).",
+    )
+    p_archive.add_argument(
+        "--batch", type=int, default=maintenance.ARCHIVE_BATCH,
+        help=f"Задач за одну транзакцию (по умолчанию {maintenance.ARCHIVE_BATCH}).",
+    )
+    p_archive.set_defaults(func=cmd_archive_tasks)
+
+    p_import = subparsers.add_parser(
+        "import-tasks",
+        help="Загрузить задачи из NDJSON.",
+        description=(
+            "Загрузить задачи из NDJSON-файла: по JSON-объекту на строку, поля как у\n"
+            "POST /api/tasks. Каждая строка проверяется, корректные задачи пишутся\n"
+            "пачками (одна транзакция на пачку). Код выхода 1 — были ошибки в строках."
+        ),
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    p_import.add_argument("file", help="Путь к файлу или '-' для stdin.")
+    p_import.add_argument(
+        "--chunk-size", type=int, default=task_import.IMPORT_CHUNK_SIZE,
+        help=f"Задач за одну транзакцию (по умолчанию {task_import.IMPORT_CHUNK_SIZE}).",
+    )
+    p_import.set_defaults(func=cmd_import_tasks)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not hasattr(args, "func"):
+        parser.print_help()
+        sys.exit(0)
+
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,570 @@
+# migrations.py
+"""
+Версионные миграции схемы.
+
+Базовые таблицы создаёт init_db() (CREATE TABLE IF NOT EXISTS), а всё, что
+меняется потом — индексы, новые таблицы, триггеры — добавляется сюда новой
+записью в MIGRATIONS. Применённые версии хранятся в таблице schema_version,
+поэтому на существующей БД выполняются только недостающие шаги.
+"""
+import sqlite3
+from typing import Callable, Dict, List, Tuple, Union
+
+# Шаг миграции — SQL-строка или функция, принимающая курсор
+Step = Union[str, Callable[[sqlite3.Cursor], None]]
+
+# ===== AFTER INSERT-триггеры tasks =====
+
+# Каждый триггер описан один раз — списком запросов над новыми задачами
+# {rows}. В самом триггере это вставленная строка, а в create_tasks_bulk —
+# вся пачка (диапазон id), и тогда те же запросы выполняются раз на пачку
+TASK_INSERT_ROW = "tasks WHERE id = NEW.id"
+TASK_INSERT_BATCH = "tasks WHERE id BETWEEN ? AND ?"
+
+# пока в bulk_insert_guard есть строка, построчные триггеры молчат
+TASK_INSERT_GUARD = "WHEN NOT EXISTS (SELECT 1 FROM bulk_insert_guard)"
+
+TASK_INSERT_TRIGGERS: Dict[str, List[str]] = {
+    "trg_task_counters_insert": ['''
+        INSERT INTO task_counters (status, priority, executor_id, count)
+        SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(executor_id, 0), COUNT(*)
+        FROM {rows}
+        GROUP BY 1, 2, 3
+        ON CONFLICT (status, priority, executor_id) DO UPDATE SET count = count + excluded.count
+    '''],
+    "trg_tasks_fts_insert": ['''
+        INSERT INTO tasks_fts (rowid, title, description)
+        SELECT id,
+               replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+               replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+        FROM {rows}
+    '''],
+    "trg_task_stats_insert": [
+        f'''
+        INSERT INTO task_stats_counters (dimension, value, count)
+        SELECT '{dimension}', COALESCE({dimension}, ''), COUNT(*)
+        FROM {{rows}}
+        GROUP BY 2
+        ON CONFLICT (dimension, value) DO UPDATE SET count = count + excluded.count
+        '''
+        for dimension in ("status", "priority")
+    ],
+    "trg_user_activity_task_insert": ['''
+        INSERT INTO user_activity (user_id, tasks_count)
+        SELECT author_id, COUNT(*)
+        FROM {rows}
+        GROUP BY author_id
+        ON CONFLICT (user_id) DO UPDATE SET tasks_count = tasks_count + excluded.tasks_count
+    '''],
+    # +1 на каждую строку: сначала записи журнала с номерами seq + 1,
+    # seq + 2, ..., потом сам счётчик
+    "trg_task_change_seq_insert": ['''
+        INSERT INTO task_changes (task_id, seq, op)
+        SELECT id, (SELECT seq FROM task_change_seq WHERE id = 1) + ROW_NUMBER() OVER (ORDER BY id), 'upsert'
+        FROM {rows}
+        ON CONFLICT (task_id) DO UPDATE
+        SET seq = excluded.seq, op = excluded.op, changed_at = excluded.changed_at
+    ''', '''
+        UPDATE task_change_seq
+        SET seq = seq + (SELECT COUNT(*) FROM {rows}),
+            changed_at = DATETIME('now','localtime')
+        WHERE id = 1
+    '''],
+}
+
+
+def task_insert_statements(name: str, rows: str) -> List[str]:
+    """Запросы триггера name над новыми задачами rows (TASK_INSERT_ROW / TASK_INSERT_BATCH)."""
+    return [statement.format(rows=rows) for statement in TASK_INSERT_TRIGGERS[name]]
+
+
+def task_insert_trigger_sql(name: str) -> str:
+    """CREATE TRIGGER для строки — с условием TASK_INSERT_GUARD."""
+    body = "".join(f"{statement.rstrip()};\n" for statement in task_insert_statements(name, TASK_INSERT_ROW))
+    return f"CREATE TRIGGER {name} AFTER INSERT ON tasks {TASK_INSERT_GUARD}\nBEGIN{body}END"
+
+
+# (версия, описание, шаги). Версии только растут, старые записи не меняем.
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "Вторичные индексы для фильтров и связей", [
+        # список задач: ORDER BY created_at (+ rowid = id идёт в индекс неявно)
+        "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)",
+        # фильтр + сортировка одним проходом по индексу
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_priority_created ON tasks(priority, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_author_created ON tasks(author_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_executor_created ON tasks(executor_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date)",
+        # комментарии задачи в порядке создания
+        "CREATE INDEX IF NOT EXISTS idx_comments_task_created ON comments(task_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_comments_author ON comments(author_id)",
+        # токены: массовый логаут и чистка протухших
+        "CREATE INDEX IF NOT EXISTS idx_auth_tokens_user ON auth_tokens(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_auth_tokens_expires ON auth_tokens(expires_at)",
+        # файлы задачи
+        "CREATE INDEX IF NOT EXISTS idx_task_files_task_uploaded ON task_files(task_id, uploaded_at)",
+    ]),
+    (2, "Счётчики задач по (status, priority, executor_id) для total в списке", [
+        # executor_id = 0 — задача без исполнителя (NULL нельзя в PRIMARY KEY)
+        '''
+        CREATE TABLE IF NOT EXISTS task_counters (
+            status TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            executor_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, priority, executor_id)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_task_counters_priority ON task_counters(priority)",
+        "CREATE INDEX IF NOT EXISTS idx_task_counters_executor ON task_counters(executor_id)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_counters_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_counters (status, priority, executor_id, count)
+            VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.priority, ''), COALESCE(NEW.executor_id, 0), 1)
+            ON CONFLICT (status, priority, executor_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_counters_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_counters SET count = count - 1
+            WHERE status = COALESCE(OLD.status, '')
+              AND priority = COALESCE(OLD.priority, '')
+              AND executor_id = COALESCE(OLD.executor_id, 0);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_counters_update
+        AFTER UPDATE OF status, priority, executor_id ON tasks
+        WHEN OLD.status IS NOT NEW.status
+          OR OLD.priority IS NOT NEW.priority
+          OR OLD.executor_id IS NOT NEW.executor_id
+        BEGIN
+            UPDATE task_counters SET count = count - 1
+            WHERE status = COALESCE(OLD.status, '')
+              AND priority = COALESCE(OLD.priority, '')
+              AND executor_id = COALESCE(OLD.executor_id, 0);
+            INSERT INTO task_counters (status, priority, executor_id, count)
+            VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.priority, ''), COALESCE(NEW.executor_id, 0), 1)
+            ON CONFLICT (status, priority, executor_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        # заполняем по уже существующим задачам
+        '''
+        INSERT INTO task_counters (status, priority, executor_id, count)
+        SELECT COALESCE(status, ''), COALESCE(priority, ''), COALESCE(executor_id, 0), COUNT(*)
+        FROM tasks
+        GROUP BY 1, 2, 3
+        ''',
+    ]),
+    (3, "Полнотекстовый поиск FTS5 по задачам и комментариям", [
+        # unicode61 приводит к нижнему регистру и кириллицу, но "ё" считает
+        # отдельной буквой — поэтому индексируем текст с ё -> е (через view),
+        # а запрос нормализуем так же (utils/search.py)
+        '''
+        CREATE VIEW IF NOT EXISTS tasks_fts_content AS
+        SELECT id,
+               replace(replace(title, 'ё', 'е'), 'Ё', 'Е') AS title,
+               replace(replace(description, 'ё', 'е'), 'Ё', 'Е') AS description
+        FROM tasks
+        ''',
+        '''
+        CREATE VIEW IF NOT EXISTS comments_fts_content AS
+        SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') AS text
+        FROM comments
+        ''',
+        # external content: сам текст в индексе не дублируется
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description,
+            content='tasks_fts_content', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+            text,
+            content='comments_fts_content', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (NEW.id,
+                    replace(replace(NEW.title, 'ё', 'е'), 'Ё', 'Е'),
+                    replace(replace(NEW.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', OLD.id,
+                    replace(replace(OLD.title, 'ё', 'е'), 'Ё', 'Е'),
+                    replace(replace(OLD.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_update AFTER UPDATE OF title, description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', OLD.id,
+                    replace(replace(OLD.title, 'ё', 'е'), 'Ё', 'Е'),
+                    replace(replace(OLD.description, 'ё', 'е'), 'Ё', 'Е'));
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (NEW.id,
+                    replace(replace(NEW.title, 'ё', 'е'), 'Ё', 'Е'),
+                    replace(replace(NEW.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_comments_fts_insert AFTER INSERT ON comments
+        BEGIN
+            INSERT INTO comments_fts (rowid, text)
+            VALUES (NEW.id, replace(replace(NEW.text, 'ё', 'е'), 'Ё', 'Е'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_comments_fts_delete AFTER DELETE ON comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text)
+            VALUES ('delete', OLD.id, replace(replace(OLD.text, 'ё', 'е'), 'Ё', 'Е'));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_comments_fts_update AFTER UPDATE OF text ON comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text)
+            VALUES ('delete', OLD.id, replace(replace(OLD.text, 'ё', 'е'), 'Ё', 'Е'));
+            INSERT INTO comments_fts (rowid, text)
+            VALUES (NEW.id, replace(replace(NEW.text, 'ё', 'е'), 'Ё', 'Е'));
+        END
+        ''',
+        # индексируем уже существующие задачи и комментарии
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+        "INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')",
+    ]),
+    (4, "Счётчики задач по статусам и приоритетам для /admin/stats", [
+        # dimension — 'status' или 'priority'; value = '' — NULL в задаче
+        '''
+        CREATE TABLE IF NOT EXISTS task_stats_counters (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_stats_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_stats_counters (dimension, value, count)
+            VALUES ('status', COALESCE(NEW.status, ''), 1), ('priority', COALESCE(NEW.priority, ''), 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_stats_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_stats_counters SET count = count - 1
+            WHERE (dimension = 'status' AND value = COALESCE(OLD.status, ''))
+               OR (dimension = 'priority' AND value = COALESCE(OLD.priority, ''));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_stats_update_status
+        AFTER UPDATE OF status ON tasks
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE task_stats_counters SET count = count - 1
+            WHERE dimension = 'status' AND value = COALESCE(OLD.status, '');
+            INSERT INTO task_stats_counters (dimension, value, count)
+            VALUES ('status', COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_task_stats_update_priority
+        AFTER UPDATE OF priority ON tasks
+        WHEN OLD.priority IS NOT NEW.priority
+        BEGIN
+            UPDATE task_stats_counters SET count = count - 1
+            WHERE dimension = 'priority' AND value = COALESCE(OLD.priority, '');
+            INSERT INTO task_stats_counters (dimension, value, count)
+            VALUES ('priority', COALESCE(NEW.priority, ''), 1)
+            ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        INSERT INTO task_stats_counters (dimension, value, count)
+        SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tasks GROUP BY 2
+        UNION ALL
+        SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tasks GROUP BY 2
+        ''',
+    ]),
+    (5, "Счётчики активности пользователей (задачи / комментарии) для топа", [
+        '''
+        CREATE TABLE IF NOT EXISTS user_activity (
+            user_id INTEGER PRIMARY KEY,
+            tasks_count INTEGER NOT NULL DEFAULT 0,
+            comments_count INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        # топ активных: ORDER BY (tasks_count + comments_count) DESC, user_id —
+        # читается по индексу, LIMIT останавливает скан после N строк
+        '''
+        CREATE INDEX IF NOT EXISTS idx_user_activity_total
+        ON user_activity((tasks_count + comments_count) DESC, user_id)
+        ''',
+        # строка на каждого пользователя — чтобы в топ попадали и те, у кого
+        # пока ничего нет. При удалении пользователя строку не трогаем: его
+        # задачи и комментарии могут остаться, а JOIN users в выборке её отсечёт
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_user_insert AFTER INSERT ON users
+        BEGIN
+            INSERT OR IGNORE INTO user_activity (user_id) VALUES (NEW.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_task_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO user_activity (user_id, tasks_count) VALUES (NEW.author_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET tasks_count = tasks_count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_task_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE user_activity SET tasks_count = tasks_count - 1 WHERE user_id = OLD.author_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_task_update AFTER UPDATE OF author_id ON tasks
+        WHEN OLD.author_id IS NOT NEW.author_id
+        BEGIN
+            UPDATE user_activity SET tasks_count = tasks_count - 1 WHERE user_id = OLD.author_id;
+            INSERT INTO user_activity (user_id, tasks_count) VALUES (NEW.author_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET tasks_count = tasks_count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_comment_insert AFTER INSERT ON comments
+        BEGIN
+            INSERT INTO user_activity (user_id, comments_count) VALUES (NEW.author_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET comments_count = comments_count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_comment_delete AFTER DELETE ON comments
+        BEGIN
+            UPDATE user_activity SET comments_count = comments_count - 1 WHERE user_id = OLD.author_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_user_activity_comment_update AFTER UPDATE OF author_id ON comments
+        WHEN OLD.author_id IS NOT NEW.author_id
+        BEGIN
+            UPDATE user_activity SET comments_count = comments_count - 1 WHERE user_id = OLD.author_id;
+            INSERT INTO user_activity (user_id, comments_count) VALUES (NEW.author_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET comments_count = comments_count + 1;
+        END
+        ''',
+        '''
+        INSERT INTO user_activity (user_id, tasks_count, comments_count)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM tasks t WHERE t.author_id = u.id),
+               (SELECT COUNT(*) FROM comments c WHERE c.author_id = u.id)
+        FROM users u
+        ''',
+    ]),
+    (6, "Архив закрытых задач (холодные таблицы)", [
+        # те же колонки, что в горячих таблицах, + момент переноса.
+        # id сохраняются: AUTOINCREMENT в tasks не выдаст их повторно
+        '''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            status TEXT,
+            priority TEXT,
+            due_date TEXT,
+            author_id INTEGER NOT NULL,
+            executor_id INTEGER,
+            created_at TEXT,
+            updated_at TEXT,
+            archived_at TEXT DEFAULT (DATETIME('now','localtime'))
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS comments_archive (
+            id INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            created_at TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS task_files_archive (
+            id INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            original_name TEXT NOT NULL,
+            stored_name TEXT NOT NULL,
+            content_type TEXT,
+            size_bytes INTEGER,
+            uploaded_at TEXT,
+            uploader_id INTEGER
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_tasks_archive_created_at ON tasks_archive(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_archive_author ON tasks_archive(author_id)",
+        "CREATE INDEX IF NOT EXISTS idx_comments_archive_task_created ON comments_archive(task_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_comments_archive_author ON comments_archive(author_id)",
+        "CREATE INDEX IF NOT EXISTS idx_task_files_archive_task ON task_files_archive(task_id, uploaded_at)",
+        # кандидаты на перенос: закрытые задачи, не менявшиеся дольше N дней
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status_updated ON tasks(status, updated_at)",
+    ]),
+    (7, "Версии задач и общий счётчик изменений для ETag", [
+        # rev растёт при каждом UPDATE: updated_at меняется раз в секунду,
+        # а две правки за одну секунду должны давать разные ETag
+        "ALTER TABLE tasks ADD COLUMN rev INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE tasks_archive ADD COLUMN rev INTEGER NOT NULL DEFAULT 0",
+        # одна строка: номер последнего изменения tasks и его время
+        '''
+        CREATE TABLE IF NOT EXISTS task_change_seq (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL DEFAULT 0,
+            changed_at TEXT DEFAULT (DATETIME('now','localtime'))
+        )
+        ''',
+        "INSERT OR IGNORE INTO task_change_seq (id, seq) VALUES (1, 0)",
+        *[
+            f'''
+            CREATE TRIGGER IF NOT EXISTS trg_task_change_seq_{event.lower()} AFTER {event} ON tasks
+            BEGIN
+                UPDATE task_change_seq
+                SET seq = seq + 1, changed_at = DATETIME('now','localtime')
+                WHERE id = 1;
+            END
+            '''
+            for event in ("INSERT", "UPDATE", "DELETE")
+        ],
+        # в задаче отдаются имена автора и исполнителя: переименование
+        # пользователя — новая версия его задач (и списка)
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_rev_username AFTER UPDATE OF username ON users
+        WHEN OLD.username IS NOT NEW.username
+        BEGIN
+            UPDATE tasks SET rev = rev + 1 WHERE author_id = NEW.id OR executor_id = NEW.id;
+            UPDATE tasks_archive SET rev = rev + 1 WHERE author_id = NEW.id OR executor_id = NEW.id;
+            UPDATE task_change_seq
+            SET seq = seq + 1, changed_at = DATETIME('now','localtime')
+            WHERE id = 1;
+        END
+        ''',
+    ]),
+    (8, "Журнал изменений задач для синхронизации (GET /api/tasks/changes)", [
+        # по строке на задачу — её последнее изменение: seq и что стало
+        # ('upsert' — есть, 'delete' — удалена, надгробие). Клиенту с since
+        # достаются только строки с seq > since, по одной на задачу
+        '''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            task_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+            changed_at TEXT DEFAULT (DATETIME('now','localtime'))
+        )
+        ''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_task_changes_seq ON task_changes(seq)",
+        # для чистки старых надгробий
+        "CREATE INDEX IF NOT EXISTS idx_task_changes_tombstones ON task_changes(changed_at) WHERE op = 'delete'",
+        # журнал полон для since >= min_seq; задачи, не менявшиеся до миграции,
+        # в нём не записаны — такие клиенты получат reset
+        "ALTER TABLE task_change_seq ADD COLUMN min_seq INTEGER NOT NULL DEFAULT 0",
+        "UPDATE task_change_seq SET min_seq = seq",
+        # счётчик и журнал — одним триггером: номер записи = новый seq
+        *[f"DROP TRIGGER IF EXISTS trg_task_change_seq_{event.lower()}" for event in ("INSERT", "UPDATE", "DELETE")],
+        *[
+            f'''
+            CREATE TRIGGER IF NOT EXISTS trg_task_change_seq_{event.lower()} AFTER {event} ON tasks
+            BEGIN
+                UPDATE task_change_seq
+                SET seq = seq + 1, changed_at = DATETIME('now','localtime')
+                WHERE id = 1;
+                INSERT INTO task_changes (task_id, seq, op)
+                VALUES ({row}.id, (SELECT seq FROM task_change_seq WHERE id = 1), '{op}')
+                ON CONFLICT (task_id) DO UPDATE
+                SET seq = excluded.seq, op = excluded.op, changed_at = excluded.changed_at;
+            END
+            '''
+            for event, row, op in (
+                ("INSERT", "NEW", "upsert"),
+                ("UPDATE", "NEW", "upsert"),
+                ("DELETE", "OLD", "delete"),
+            )
+        ],
+    ]),
+    (9, "Флаг пакетной вставки задач вместо пересоздания триггеров", [
+        # строка здесь живёт только внутри транзакции create_tasks_bulk:
+        # пока она есть, построчные INSERT-триггеры tasks молчат, а их работу
+        # делают те же запросы раз на пачку (database.TASK_INSERT_TRIGGERS_BATCH_SQL)
+        '''
+        CREATE TABLE IF NOT EXISTS bulk_insert_guard (
+            id INTEGER PRIMARY KEY CHECK (id = 1)
+        )
+        ''',
+        # все INSERT-триггеры tasks — заново, из общих определений
+        *[f"DROP TRIGGER IF EXISTS {name}" for name in TASK_INSERT_TRIGGERS],
+        *[task_insert_trigger_sql(name) for name in TASK_INSERT_TRIGGERS],
+    ]),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 — миграции ещё не применялись)."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT DEFAULT (DATETIME('now','localtime'))
+    )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn: sqlite3.Connection) -> List[int]:
+    """
+    Применить недостающие миграции. Каждая версия — в своей транзакции:
+    упала на середине — откатывается целиком и не записывается.
+    Возвращает список применённых версий.
+    """
+    current = get_schema_version(conn)
+    conn.commit()
+    applied = []
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    return applied
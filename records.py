@@ -0,0 +1,125 @@
+# records.py
+"""
+Компактные записи для строк списков (задачи, комментарии).
+
+sqlite3.Row + dict_from_row дают на каждую строку два объекта, и самый
+тяжёлый из них — dict (хэш-таблица ключей на каждую строку). Запись здесь
+держит только кортеж значений, который и так возвращает sqlite3, а имена
+колонок и их позиции общие для всех строк одной выборки — лежат в классе.
+
+Для чтения запись ведёт себя как dict: rec["title"], rec.get(...), keys(),
+dict(rec). В JSON превращается через провайдеры json_provider.py.
+Записи неизменяемые — их можно без копирования держать в кэше.
+"""
+from typing import Any, Callable, Optional
+
+
+class Record:
+    """Строка выборки поверх кортежа значений. Колонки задаёт подкласс (for_columns)."""
+
+    __slots__ = ("_values",)
+
+    _fields: tuple = ()
+    _index: dict = {}
+    _types: dict = {}  # кэш подклассов по набору колонок, свой у каждого базового класса
+
+    def __init__(self, values: tuple):
+        self._values = values
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not cls._fields:
+            cls._types = {}
+
+    # ---------- создание ----------
+    @classmethod
+    def for_columns(cls, columns: tuple) -> type:
+        """Подкласс записи для данного набора колонок (создаётся один раз)."""
+        record_type = cls._types.get(columns)
+        if record_type is None:
+            record_type = type(cls.__name__, (cls,), {
+                "__slots__": (),
+                "_fields": columns,
+                "_index": {name: i for i, name in enumerate(columns)},
+            })
+            cls._types[columns] = record_type
+        return record_type
+
+    @classmethod
+    def row_factory(
+        cls, cursor, converters: Optional[dict[str, Callable[[Any], Any]]] = None,
+    ) -> Callable:
+        """
+        row_factory для курсора после execute: колонки берутся из
+        cursor.description один раз, а не на каждую строку.
+        converters={"колонка": функция} — поправить значения при чтении.
+        """
+        record_type = cls.for_columns(tuple(d[0] for d in cursor.description))
+        if not converters:
+            return lambda _cursor, row: record_type(row)
+
+        convert = [(record_type._index[name], fn) for name, fn in converters.items()]
+
+        def factory(_cursor, row):
+            values = list(row)
+            for i, fn in convert:
+                values[i] = fn(values[i])
+            return record_type(tuple(values))
+
+        return factory
+
+    # ---------- доступ как к dict ----------
+    def __getitem__(self, key: str):
+        try:
+            return self._values[self._index[key]]
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._values[i]
+
+    def keys(self) -> tuple:
+        return self._fields
+
+    def values(self) -> tuple:
+        return self._values
+
+    def items(self):
+        return zip(self._fields, self._values)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._fields, self._values))
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self._fields == other._fields and self._values == other._values
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class TaskRecord(Record):
+    """Задача в списке (get_all_tasks)."""
+
+    __slots__ = ()
+
+
+class CommentRecord(Record):
+    """Комментарий к задаче (get_comments_by_task)."""
+
+    __slots__ = ()
@@ -0,0 +1,978 @@
+# repository.py
+"""
+Хранилище данных за единым интерфейсом (Repository).
+
+SQLiteRepository — текущая реализация: функции database.py (пул, поток-писатель,
+сессия запроса, счётчики, FTS, архив). PostgresRepository — PostgreSQL через
+пул соединений psycopg_pool, для запуска нескольких узлов приложения на одной БД.
+
+Какое хранилище использовать, задаёт окружение:
+  TM_STORAGE_BACKEND = sqlite (по умолчанию) | postgres
+  TM_POSTGRES_DSN    = строка подключения, например "postgresql://tm@localhost/tm"
+
+Методы интерфейса повторяют имена и аргументы функций database.py, поэтому
+приложение переключается на другое хранилище без правок во view. Чего
+реализация не умеет (например, полнотекстовый поиск FTS5 в PostgreSQL),
+то бросает UnsupportedByBackend — API отвечает на это 501.
+"""
+import os
+import secrets
+from abc import ABC, abstractmethod, update_abstractmethods
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from werkzeug.security import generate_password_hash
+
+import database
+from cache import invalidate_task_details
+
+try:  # PostgreSQL — необязательная зависимость: pip install -r requirements-postgres.txt
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool as PgConnectionPool
+except ImportError:
+    psycopg = None
+
+STORAGE_BACKEND = os.environ.get("TM_STORAGE_BACKEND", "sqlite")
+POSTGRES_DSN = os.environ.get("TM_POSTGRES_DSN", "")
+POSTGRES_POOL_MIN = 1
+POSTGRES_POOL_MAX = 10
+
+# Поля задачи, которые можно менять (update_task / update_tasks_bulk)
+TASK_UPDATE_FIELDS = ('title', 'description', 'status', 'priority', 'due_date', 'executor_id')
+
+
+class UnsupportedByBackend(Exception):
+    """Возможности нет у этого хранилища (не ошибка в коде) — API отвечает 501."""
+
+    def __init__(self, backend: str, feature: str):
+        super().__init__(f"{feature}: не поддерживается хранилищем {backend}")
+        self.backend = backend
+        self.feature = feature
+
+
+class Repository(ABC):
+    """
+    Интерфейс хранилища: пользователи, задачи, комментарии, токены, файлы задач.
+    Аргументы и результаты (dict / список dict / id / bool) — как у database.py.
+    Методы интерфейса абстрактные: хранилище, в котором реализовано не всё,
+    не создаётся (TypeError), а не падает на первом вызове недостающего метода.
+    """
+
+    name = ""
+    # нарушение ограничения БД (UNIQUE, CHECK, NOT NULL) — своё у каждого драйвера
+    IntegrityError: type = Exception
+
+    # ---------- пользователи ----------
+    @abstractmethod
+    def get_all_users(self): ...
+    @abstractmethod
+    def get_user_by_id(self, user_id): ...
+    @abstractmethod
+    def get_users_by_ids(self, user_ids): ...
+    @abstractmethod
+    def get_user_by_email(self, email): ...
+    @abstractmethod
+    def create_user(self, email, username, password_hash, role='user'): ...
+    @abstractmethod
+    def update_user_role(self, user_id, new_role): ...
+    @abstractmethod
+    def update_user_basic(self, user_id, fields: dict): ...
+    @abstractmethod
+    def get_user_usage_counts(self, user_id): ...
+    @abstractmethod
+    def delete_user(self, user_id): ...
+
+    # ---------- токены ----------
+    @abstractmethod
+    def create_auth_token(self, user_id): ...
+    @abstractmethod
+    def get_user_by_token(self, token: str): ...
+    @abstractmethod
+    def get_user_by_access_token(self, token): ...
+    @abstractmethod
+    def refresh_token(self, old_token: str, expires_in: int = 3600): ...
+    @abstractmethod
+    def delete_access_token(self, token: str) -> bool: ...
+    @abstractmethod
+    def delete_all_tokens_for_user(self, user_id: int) -> int: ...
+    @abstractmethod
+    def delete_expired_tokens(self, limit: int = 1000, now: Optional[datetime] = None) -> int:
+        ...
+    @abstractmethod
+    def get_auth_tokens_size(self) -> dict: ...
+
+    # ---------- задачи ----------
+    @abstractmethod
+    def get_all_tasks(self, filters=None, limit=100, offset=0, after=None, include_archived=False,
+                      fields=None):
+        ...
+    @abstractmethod
+    def count_tasks(self, filters=None, include_archived=False): ...
+    @abstractmethod
+    def get_task_change_seq(self): ...
+    @abstractmethod
+    def get_task_changes(self, since: int, limit: int = 500): ...
+    @abstractmethod
+    def compact_task_changes(self, older_than_days: int, limit: int = 1000, now: Optional[datetime] = None) -> int:
+        ...
+    @abstractmethod
+    def get_task_by_id(self, task_id): ...
+    @abstractmethod
+    def create_task(self, title, description, author_id, executor_id=None,
+                    status='к выполнению', priority='средний', due_date=None):
+        ...
+    @abstractmethod
+    def create_tasks_bulk(self, tasks): ...
+    @abstractmethod
+    def update_task(self, task_id, **kwargs): ...
+    @abstractmethod
+    def update_tasks_bulk(self, changes, ids=None, filters=None, author_id=None): ...
+    @abstractmethod
+    def delete_task(self, task_id): ...
+    @abstractmethod
+    def delete_tasks_bulk(self, ids=None, filters=None, author_id=None): ...
+    @abstractmethod
+    def get_task_stats(self): ...
+    @abstractmethod
+    def get_active_users(self, limit: int = 10): ...
+    @abstractmethod
+    def search_tasks(self, match_query, filters=None, limit=20, offset=0): ...
+    @abstractmethod
+    def iter_tasks(self, filters=None, include_archived=False, batch_size=database.EXPORT_BATCH_SIZE):
+        ...
+    @abstractmethod
+    def archive_closed_tasks(self, older_than_days, limit=500, now=None): ...
+
+    # ---------- комментарии ----------
+    @abstractmethod
+    def get_comments_by_task(self, task_id): ...
+    @abstractmethod
+    def get_comments_for_tasks(self, task_ids): ...
+    @abstractmethod
+    def get_comment_by_id(self, comment_id): ...
+    @abstractmethod
+    def add_comment(self, task_id, author_id, text): ...
+    @abstractmethod
+    def update_comment(self, comment_id, text): ...
+    @abstractmethod
+    def delete_comment(self, comment_id): ...
+
+    # ---------- файлы задач ----------
+    @abstractmethod
+    def save_task_file(self, task_id: int, stored_name: str, original_name: str,
+                       content_type: str, size_bytes: int, uploader_id: int = None):
+        ...
+    @abstractmethod
+    def get_task_files_for_task(self, task_id: int): ...
+    @abstractmethod
+    def get_task_files_for_tasks(self, task_ids): ...
+    @abstractmethod
+    def get_attachment_by_id(self, attachment_id: int): ...
+    @abstractmethod
+    def delete_attachment(self, attachment_id: int): ...
+
+    def get_attachments_for_task(self, task_id: int):
+        return self.get_task_files_for_task(task_id)
+
+    # ---------- служебные ----------
+    @abstractmethod
+    def add_test_data(self): ...
+
+    def close(self) -> None:
+        pass
+
+
+# ===== SQLITE =====
+def _delegate(name):
+    """Метод, который вызывает функцию database.py с тем же именем (в момент вызова)."""
+    def method(self, *args, **kwargs):
+        return getattr(database, name)(*args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = f"database.{name}"
+    return method
+
+
+class SQLiteRepository(Repository):
+    """Текущее хранилище: функции database.py как есть (методы — см. ниже)."""
+
+    name = "sqlite"
+    IntegrityError = sqlite3.IntegrityError
+
+    def close(self) -> None:
+        database.close_pool()
+        database.close_read_pool()
+        database.close_writer()
+
+
+for _name in Repository.__abstractmethods__:
+    if _name not in vars(SQLiteRepository):
+        setattr(SQLiteRepository, _name, _delegate(_name))
+del _name
+update_abstractmethods(SQLiteRepository)
+
+
+# ===== POSTGRESQL =====
+# Та же схема, что у SQLite. Даты — текстом в том же формате
+# ('YYYY-MM-DD HH:MM:SS'), чтобы API отдавал одинаковые значения.
+# Доли секунды отбрасываются (to_char), а не округляются, как у
+# localtimestamp(0): иначе дата правки может оказаться в будущем.
+_PG_NOW_LOCAL = "to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS')"
+_PG_NOW_UTC = "to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+POSTGRES_SCHEMA = [
+    f'''
+    CREATE TABLE IF NOT EXISTS users (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        email TEXT UNIQUE NOT NULL,
+        username TEXT NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TEXT DEFAULT {_PG_NOW_LOCAL},
+        role TEXT DEFAULT 'user' CHECK(role IN ('user', 'admin', 'super_admin'))
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS tasks (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        status TEXT DEFAULT 'к выполнению'
+            CHECK(status IN ('к выполнению', 'в процессе', 'выполнена', 'отменена')),
+        priority TEXT DEFAULT 'средний'
+            CHECK(priority IN ('низкий', 'средний', 'высокий')),
+        due_date TEXT,
+        author_id BIGINT NOT NULL REFERENCES users(id),
+        executor_id BIGINT REFERENCES users(id),
+        created_at TEXT DEFAULT {_PG_NOW_LOCAL},
+        updated_at TEXT DEFAULT {_PG_NOW_LOCAL},
+        rev BIGINT NOT NULL DEFAULT 0
+    )
+    ''',
+    # таблицы, созданные до появления rev
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS rev BIGINT NOT NULL DEFAULT 0",
+    f'''
+    CREATE TABLE IF NOT EXISTS comments (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        task_id BIGINT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+        author_id BIGINT NOT NULL REFERENCES users(id),
+        text TEXT NOT NULL,
+        created_at TEXT DEFAULT {_PG_NOW_LOCAL}
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS auth_tokens (
+        token TEXT PRIMARY KEY,
+        user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        expires_at TEXT NOT NULL,
+        created_at TEXT DEFAULT {_PG_NOW_LOCAL}
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS task_files (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        task_id BIGINT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+        original_name TEXT NOT NULL,
+        stored_name TEXT NOT NULL,
+        content_type TEXT,
+        size_bytes BIGINT,
+        uploaded_at TEXT DEFAULT {_PG_NOW_UTC},
+        uploader_id BIGINT REFERENCES users(id) ON DELETE SET NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_author ON tasks(author_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_executor ON tasks(executor_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_created_id ON tasks(created_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_task ON comments(task_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_author ON comments(author_id)",
+    "CREATE INDEX IF NOT EXISTS idx_auth_tokens_user ON auth_tokens(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_auth_tokens_expires ON auth_tokens(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_task_files_task ON task_files(task_id)",
+    # счётчик изменений tasks (ETag списка). Строка блокируется до конца
+    # транзакции, поэтому seq виден другим ровно тогда, когда видны и сами изменения
+    f'''
+    CREATE TABLE IF NOT EXISTS task_change_seq (
+        id INT PRIMARY KEY CHECK (id = 1),
+        seq BIGINT NOT NULL DEFAULT 0,
+        changed_at TEXT DEFAULT {_PG_NOW_LOCAL}
+    )
+    ''',
+    "INSERT INTO task_change_seq (id, seq) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+    # журнал изменений (GET /api/tasks/changes) — как migrations.py, версия 8
+    f'''
+    CREATE TABLE IF NOT EXISTS task_changes (
+        task_id BIGINT PRIMARY KEY,
+        seq BIGINT NOT NULL UNIQUE,
+        op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+        changed_at TEXT DEFAULT {_PG_NOW_LOCAL}
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_task_changes_tombstones ON task_changes(changed_at) WHERE op = 'delete'",
+    "ALTER TABLE task_change_seq ADD COLUMN IF NOT EXISTS min_seq BIGINT NOT NULL DEFAULT 0",
+    # изменения до появления журнала в нём не записаны — клиентам с since раньше — reset
+    "UPDATE task_change_seq SET min_seq = seq WHERE NOT EXISTS (SELECT 1 FROM task_changes) AND min_seq < seq",
+    f'''
+    CREATE OR REPLACE FUNCTION log_task_change() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        next_seq BIGINT;
+    BEGIN
+        UPDATE task_change_seq SET seq = seq + 1, changed_at = {_PG_NOW_LOCAL}
+        WHERE id = 1 RETURNING seq INTO next_seq;
+        INSERT INTO task_changes (task_id, seq, op)
+        VALUES (
+            CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END,
+            next_seq,
+            CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END
+        )
+        ON CONFLICT (task_id) DO UPDATE
+        SET seq = EXCLUDED.seq, op = EXCLUDED.op, changed_at = EXCLUDED.changed_at;
+        RETURN NULL;
+    END
+    $$
+    ''',
+    # по строке: у каждой задачи в журнале свой номер
+    '''
+    CREATE OR REPLACE TRIGGER trg_task_change_seq
+    AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION log_task_change()
+    ''',
+    # переименование пользователя — новая версия его задач (имена в ответе)
+    '''
+    CREATE OR REPLACE FUNCTION bump_tasks_rev_for_user() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE tasks SET rev = rev + 1 WHERE author_id = NEW.id OR executor_id = NEW.id;
+        RETURN NULL;
+    END
+    $$
+    ''',
+    '''
+    CREATE OR REPLACE TRIGGER trg_tasks_rev_username
+    AFTER UPDATE OF username ON users
+    FOR EACH ROW WHEN (OLD.username IS DISTINCT FROM NEW.username)
+    EXECUTE FUNCTION bump_tasks_rev_for_user()
+    ''',
+]
+
+_PG_TASK_SELECT = '''
+SELECT
+    t.id, t.title, t.description, t.status, t.priority, t.due_date,
+    t.author_id, t.executor_id, t.created_at, t.updated_at,
+    u1.username AS author_name,
+    u2.username AS executor_name
+    {extra}
+FROM tasks t
+LEFT JOIN users u1 ON t.author_id = u1.id
+LEFT JOIN users u2 ON t.executor_id = u2.id
+WHERE 1=1
+'''
+
+_PG_FILE_COLUMNS = "id, task_id, stored_name, original_name, content_type, size_bytes, uploader_id, uploaded_at"
+
+
+def _pg_filters_sql(filters):
+    """Условия фильтров списка задач (database.TASK_FILTERS) с плейсхолдерами psycopg."""
+    sql, params = database._task_filters_sql(filters)
+    return sql.replace("?", "%s"), params
+
+
+class PostgresRepository(Repository):
+    """
+    PostgreSQL через пул соединений psycopg_pool.
+    Внутри HTTP-запроса все вызовы идут в одной транзакции запроса (как у
+    SQLite, см. _connection), вне запроса каждый вызов — своя короткая
+    транзакция на соединении из пула.
+    """
+
+    name = "postgres"
+    IntegrityError = psycopg.IntegrityError if psycopg is not None else sqlite3.IntegrityError
+
+    def __init__(self, dsn: str, min_size: int = POSTGRES_POOL_MIN, max_size: int = POSTGRES_POOL_MAX):
+        if psycopg is None:
+            raise RuntimeError(
+                "Для TM_STORAGE_BACKEND=postgres нужны пакеты psycopg и psycopg_pool: "
+                "pip install -r requirements-postgres.txt"
+            )
+        if not dsn:
+            raise RuntimeError("Для TM_STORAGE_BACKEND=postgres задайте TM_POSTGRES_DSN")
+        self.pool = PgConnectionPool(
+            dsn, min_size=min_size, max_size=max_size,
+            kwargs={"row_factory": dict_row}, open=True,
+        )
+
+    def init_schema(self) -> None:
+        """Создать таблицы и индексы, если их ещё нет."""
+        with self.pool.connection() as conn:
+            for statement in POSTGRES_SCHEMA:
+                conn.execute(statement)
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def add_test_data(self):
+        """Те же тестовые данные, что database.add_test_data (если пользователей ещё нет)."""
+        with self.pool.connection() as conn:
+            if conn.execute("SELECT COUNT(*) AS n FROM users").fetchone()["n"] > 0:
+                return
+            user_ids = [
+                conn.execute(
+                    "INSERT INTO users (email, username, password_hash, role) VALUES (%s, %s, %s, %s) RETURNING id",
+                    (email, username, generate_password_hash(database.TEST_PASSWORD), role),
+                ).fetchone()["id"]
+                for email, username, role in database.TEST_USERS
+            ]
+            task_ids = [
+                conn.execute(
+                    """
+                    INSERT INTO tasks (title, description, author_id, executor_id, status, priority, due_date)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+                    """,
+                    (title, desc, user_ids[author - 1], user_ids[executor - 1], status, priority, due_date),
+                ).fetchone()["id"]
+                for title, desc, author, executor, status, priority, due_date in database.TEST_TASKS
+            ]
+            for task, author, text in database.TEST_COMMENTS:
+                conn.execute(
+                    "INSERT INTO comments (task_id, author_id, text) VALUES (%s, %s, %s)",
+                    (task_ids[task - 1], user_ids[author - 1], text),
+                )
+
+    # ---------- вспомогательные ----------
+    @contextmanager
+    def _connection(self):
+        """
+        Соединение для одного вызова.
+        Внутри HTTP-запроса — общее на весь запрос (сессия database.py): одна
+        транзакция, commit в конце, rollback при ошибке обработчика. Каждый вызов
+        идёт в своём SAVEPOINT — ошибка, которую приложение обработало
+        (IntegrityError -> 400), не обрывает транзакцию запроса.
+        Вне запроса — соединение из пула, commit на выходе.
+        """
+        session = database.current_session()
+        if session is None:
+            with self.pool.connection() as conn:
+                yield conn
+            return
+
+        conn = session.attach(self, self._request_connection)
+        conn.execute("SAVEPOINT repository_call")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO SAVEPOINT repository_call")
+            raise
+        conn.execute("RELEASE SAVEPOINT repository_call")
+
+    def _request_connection(self):
+        conn = self.pool.getconn()
+
+        def finish(commit: bool):
+            try:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            finally:
+                self.pool.putconn(conn)
+
+        return conn, finish
+
+    def _one(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def _all(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _execute(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).rowcount
+
+    # ---------- пользователи ----------
+    def get_all_users(self):
+        return self._all("SELECT id, email, username, created_at, role FROM users ORDER BY id")
+
+    def get_user_by_id(self, user_id):
+        return self._one("SELECT id, email, username, created_at, role FROM users WHERE id = %s", (user_id,))
+
+    def get_users_by_ids(self, user_ids):
+        ids = sorted({user_id for user_id in user_ids if user_id is not None})
+        if not ids:
+            return {}
+        rows = self._all("SELECT id, email, username, created_at, role FROM users WHERE id = ANY(%s)", (ids,))
+        return {row["id"]: row for row in rows}
+
+    def get_user_by_email(self, email):
+        return self._one("SELECT * FROM users WHERE email = %s", (email,))
+
+    def create_user(self, email, username, password_hash, role='user'):
+        try:
+            row = self._one(
+                "INSERT INTO users (email, username, password_hash, role) "
+                "VALUES (%s, %s, %s, %s) RETURNING id",
+                (email, username, password_hash, role),
+            )
+        except self.IntegrityError:
+            return None
+        return row["id"]
+
+    def update_user_role(self, user_id, new_role):
+        if new_role not in ("user", "admin", "super_admin"):
+            return False
+        return self._execute("UPDATE users SET role = %s WHERE id = %s", (new_role, user_id)) > 0
+
+    def update_user_basic(self, user_id, fields: dict):
+        if fields:
+            sets = ", ".join(f"{key} = %s" for key in fields)
+            self._execute(f"UPDATE users SET {sets} WHERE id = %s", [*fields.values(), user_id])
+        if "username" in fields:
+            # имя автора / исполнителя есть в деталях задачи: их кэш устарел
+            task_ids = [row["id"] for row in self._all(
+                "SELECT id FROM tasks WHERE author_id = %s OR executor_id = %s", (user_id, user_id),
+            )]
+            if task_ids:
+                database.after_commit(lambda: invalidate_task_details(task_ids))
+        return self.get_user_by_id(user_id)
+
+    def get_user_usage_counts(self, user_id):
+        return self._one(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM tasks WHERE author_id = %s OR executor_id = %s) AS tasks_count,
+                (SELECT COUNT(*) FROM comments WHERE author_id = %s) AS comments_count
+            """,
+            (user_id, user_id, user_id),
+        )
+
+    def delete_user(self, user_id):
+        return self._execute("DELETE FROM users WHERE id = %s", (user_id,)) > 0
+
+    # ---------- токены ----------
+    def create_auth_token(self, user_id):
+        token = secrets.token_urlsafe(32)
+        now = database._now_utc()
+        expires_at = now + timedelta(minutes=database.TOKEN_TTL_MINUTES)
+        self._execute(
+            "INSERT INTO auth_tokens (token, user_id, expires_at, created_at) VALUES (%s, %s, %s, %s)",
+            (token, user_id, expires_at.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        return token
+
+    def get_user_by_token(self, token: str):
+        return self._one(
+            f"""
+            SELECT u.id, u.email, u.username, u.created_at, u.role
+            FROM auth_tokens t
+            JOIN users u ON t.user_id = u.id
+            WHERE t.token = %s AND t.expires_at > {_PG_NOW_UTC}
+            """,
+            (token,),
+        )
+
+    def get_user_by_access_token(self, token):
+        with self._connection() as conn:
+            row = conn.execute(
+                """
+                SELECT u.*, a.expires_at
+                FROM auth_tokens a
+                JOIN users u ON a.user_id = u.id
+                WHERE a.token = %s
+                """,
+                (token,),
+            ).fetchone()
+            if not row:
+                return None
+            if database._now_utc() > datetime.strptime(row["expires_at"], "%Y-%m-%d %H:%M:%S"):
+                # токен истёк — удаляем и считаем недействительным
+                conn.execute("DELETE FROM auth_tokens WHERE token = %s", (token,))
+                return None
+            return row
+
+    def refresh_token(self, old_token: str, expires_in: int = 3600):
+        with self._connection() as conn:
+            row = conn.execute(
+                f"DELETE FROM auth_tokens WHERE token = %s AND expires_at > {_PG_NOW_UTC} RETURNING user_id",
+                (old_token,),
+            ).fetchone()
+            if not row:
+                return None
+            new_token = secrets.token_urlsafe(32)
+            expires_at = (database._now_utc() + timedelta(seconds=expires_in)).strftime("%Y-%m-%d %H:%M:%S")
+            conn.execute(
+                "INSERT INTO auth_tokens (token, user_id, expires_at) VALUES (%s, %s, %s)",
+                (new_token, row["user_id"], expires_at),
+            )
+            return new_token
+
+    def delete_access_token(self, token: str) -> bool:
+        return self._execute("DELETE FROM auth_tokens WHERE token = %s", (token,)) > 0
+
+    def delete_all_tokens_for_user(self, user_id: int) -> int:
+        return self._execute("DELETE FROM auth_tokens WHERE user_id = %s", (user_id,))
+
+    def delete_expired_tokens(self, limit: int = 1000, now: Optional[datetime] = None) -> int:
+        cutoff = (now or database._now_utc()).strftime("%Y-%m-%d %H:%M:%S")
+        return self._execute(
+            """
+            DELETE FROM auth_tokens
+            WHERE token IN (
+                SELECT token FROM auth_tokens
+                WHERE expires_at < %s
+                ORDER BY expires_at
+                LIMIT %s
+            )
+            """,
+            (cutoff, limit),
+        )
+
+    def get_auth_tokens_size(self) -> dict:
+        now = database._now_utc().strftime("%Y-%m-%d %H:%M:%S")
+        return self._one(
+            """
+            SELECT
+                COUNT(*) AS rows,
+                COUNT(*) FILTER (WHERE expires_at < %s) AS expired,
+                pg_total_relation_size('auth_tokens') AS size_bytes
+            FROM auth_tokens
+            """,
+            (now,),
+        )
+
+    # ---------- задачи ----------
+    def get_all_tasks(self, filters=None, limit=100, offset=0, after=None, include_archived=False,
+                      fields=None):
+        columns, joins = database.task_fields_sql(fields)
+        # архива в PostgreSQL нет: все задачи "горячие"
+        query = (
+            f"SELECT {columns}{', FALSE AS archived' if include_archived else ''} "
+            f"FROM tasks t {joins} WHERE 1=1"
+        )
+        filters_sql, params = _pg_filters_sql(filters)
+        query += filters_sql
+        if after is not None:
+            query += " AND (t.created_at, t.id) < (%s, %s)"
+            params.extend(after)
+        # limit=-1 — без ограничения, как в SQLite (LIMIT NULL в PostgreSQL)
+        query += " ORDER BY t.created_at DESC, t.id DESC LIMIT %s OFFSET %s"
+        params.extend([limit if limit >= 0 else None, offset])
+        return self._all(query, params)
+
+    def count_tasks(self, filters=None, include_archived=False):
+        filters_sql, params = _pg_filters_sql(filters)
+        return self._one("SELECT COUNT(*) AS count FROM tasks t WHERE 1=1" + filters_sql, params)["count"]
+
+    def get_task_change_seq(self):
+        return self._one("SELECT seq, changed_at FROM task_change_seq WHERE id = 1")
+
+    def get_task_changes(self, since, limit=500):
+        columns = ", ".join(
+            "u1.username AS author_name" if c == "author_name"
+            else "u2.username AS executor_name" if c == "executor_name"
+            else f"t.{c}"
+            for c in database.TASK_CHANGE_COLUMNS
+        )
+        with self._connection() as conn:
+            state = conn.execute("SELECT seq, min_seq FROM task_change_seq WHERE id = 1").fetchone()
+            current = state["seq"]
+            reset = {"seq": current, "changes": [], "has_more": False, "reset": True}
+            if since < state["min_seq"] or since > current:
+                return reset
+            rows = conn.execute(
+                f"""
+                SELECT c.seq AS change_seq, c.op, c.task_id, {columns}
+                FROM task_changes c
+                LEFT JOIN tasks t ON c.op = 'upsert' AND t.id = c.task_id
+                LEFT JOIN users u1 ON t.author_id = u1.id
+                LEFT JOIN users u2 ON t.executor_id = u2.id
+                WHERE c.seq > %s AND c.seq <= %s
+                ORDER BY c.seq
+                LIMIT %s
+                """,
+                (since, current, limit + 1),
+            ).fetchall()
+            if conn.execute("SELECT min_seq FROM task_change_seq WHERE id = 1").fetchone()["min_seq"] > since:
+                return reset
+
+        has_more = len(rows) > limit
+        changes = []
+        for row in rows[:limit]:
+            change = {"seq": row["change_seq"], "op": row["op"], "task_id": row["task_id"]}
+            if row["op"] == "upsert":
+                change["task"] = {c: row[c] for c in database.TASK_CHANGE_COLUMNS}
+            changes.append(change)
+        return {
+            "seq": changes[-1]["seq"] if has_more else current,
+            "changes": changes,
+            "has_more": has_more,
+            "reset": False,
+        }
+
+    def compact_task_changes(self, older_than_days, limit=1000, now=None):
+        cutoff = ((now or datetime.now()) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._connection() as conn:
+            seqs = [row["seq"] for row in conn.execute(
+                """
+                DELETE FROM task_changes WHERE task_id IN (
+                    SELECT task_id FROM task_changes WHERE op = 'delete' AND changed_at < %s LIMIT %s
+                ) RETURNING seq
+                """,
+                (cutoff, limit),
+            ).fetchall()]
+            if seqs:
+                conn.execute(
+                    "UPDATE task_change_seq SET min_seq = GREATEST(min_seq, %s) WHERE id = 1", (max(seqs),)
+                )
+        return len(seqs)
+
+    def get_task_by_id(self, task_id):
+        return self._one(_PG_TASK_SELECT.format(extra=", t.rev") + " AND t.id = %s", (task_id,))
+
+    def create_task(self, title, description, author_id, executor_id=None,
+                    status='к выполнению', priority='средний', due_date=None):
+        row = self._one(
+            """
+            INSERT INTO tasks (title, description, status, priority, due_date, author_id, executor_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+            """,
+            (title, description, status, priority, due_date, author_id, executor_id),
+        )
+        return row["id"]
+
+    def create_tasks_bulk(self, tasks):
+        if not tasks:
+            return []
+        rows = [
+            (
+                t['title'], t.get('description'),
+                t.get('status') or 'к выполнению', t.get('priority') or 'средний',
+                t.get('due_date'), t['author_id'], t.get('executor_id'),
+            )
+            for t in tasks
+        ]
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                INSERT INTO tasks (title, description, status, priority, due_date, author_id, executor_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+                """,
+                rows,
+                returning=True,
+            )
+            task_ids = []
+            while True:
+                task_ids.append(cursor.fetchone()["id"])
+                if not cursor.nextset():
+                    break
+            return task_ids
+
+    @staticmethod
+    def _task_updates(changes):
+        fields = [(f, v) for f, v in changes.items() if f in TASK_UPDATE_FIELDS and v is not None]
+        sql = ", ".join(f"{f} = %s" for f, _ in fields)
+        return sql, [v for _, v in fields]
+
+    @staticmethod
+    def _bulk_target_sql(ids=None, filters=None, author_id=None):
+        sql = " WHERE 1=1"
+        params = []
+        if ids is not None:
+            sql += " AND t.id = ANY(%s)"
+            params.append(list(ids))
+        if filters:
+            filters_sql, filters_params = _pg_filters_sql(filters)
+            sql += filters_sql
+            params.extend(filters_params)
+        if author_id is not None:
+            sql += " AND t.author_id = %s"
+            params.append(author_id)
+        return sql, params
+
+    def update_task(self, task_id, **kwargs):
+        sets, params = self._task_updates(kwargs)
+        if not sets:
+            return False
+        return self._execute(
+            f"UPDATE tasks SET {sets}, updated_at = {_PG_NOW_LOCAL}, rev = rev + 1 WHERE id = %s",
+            params + [task_id],
+        ) > 0
+
+    def update_tasks_bulk(self, changes, ids=None, filters=None, author_id=None):
+        sets, params = self._task_updates(changes)
+        if not sets:
+            return []
+        where_sql, where_params = self._bulk_target_sql(ids, filters, author_id)
+        rows = self._all(
+            f"UPDATE tasks AS t SET {sets}, updated_at = {_PG_NOW_LOCAL}, rev = rev + 1{where_sql} RETURNING id",
+            params + where_params,
+        )
+        return [row["id"] for row in rows]
+
+    def delete_task(self, task_id):
+        return self._execute("DELETE FROM tasks WHERE id = %s", (task_id,)) > 0
+
+    def delete_tasks_bulk(self, ids=None, filters=None, author_id=None):
+        where_sql, where_params = self._bulk_target_sql(ids, filters, author_id)
+        rows = self._all(f"DELETE FROM tasks AS t{where_sql} RETURNING id", where_params)
+        return [row["id"] for row in rows]
+
+    def get_task_stats(self):
+        stats = {"by_status": {}, "by_priority": {}}
+        for dimension in ("status", "priority"):
+            for row in self._all(f"SELECT {dimension} AS value, COUNT(*) AS count FROM tasks GROUP BY {dimension}"):
+                stats[f"by_{dimension}"][row["value"]] = row["count"]
+        return stats
+
+    def get_active_users(self, limit: int = 10):
+        return self._all(
+            """
+            SELECT * FROM (
+                SELECT
+                    u.id, u.email, u.username, u.role, u.created_at,
+                    (SELECT COUNT(*) FROM tasks t WHERE t.author_id = u.id) AS tasks_count,
+                    (SELECT COUNT(*) FROM comments c WHERE c.author_id = u.id) AS comments_count
+                FROM users u
+            ) a
+            ORDER BY a.tasks_count + a.comments_count DESC, a.id
+            LIMIT %s
+            """,
+            (limit,),
+        )
+
+    # поиск держится на FTS5, экспорт и архив — на функциях database.py для SQLite
+    def search_tasks(self, match_query, filters=None, limit=20, offset=0):
+        raise UnsupportedByBackend(self.name, "Полнотекстовый поиск")
+
+    def iter_tasks(self, filters=None, include_archived=False, batch_size=database.EXPORT_BATCH_SIZE):
+        raise UnsupportedByBackend(self.name, "Экспорт задач")
+
+    def archive_closed_tasks(self, older_than_days, limit=500, now=None):
+        raise UnsupportedByBackend(self.name, "Архив задач")
+
+    # ---------- комментарии ----------
+    def get_comments_by_task(self, task_id):
+        return self._all(
+            """
+            SELECT c.*, u.username AS author_name
+            FROM comments c
+            JOIN users u ON c.author_id = u.id
+            WHERE c.task_id = %s
+            ORDER BY c.created_at, c.id
+            """,
+            (task_id,),
+        )
+
+    def get_comments_for_tasks(self, task_ids):
+        ids = sorted(set(task_ids))
+        result = {task_id: [] for task_id in ids}
+        if ids:
+            for comment in self._all(
+                """
+                SELECT c.id, c.task_id, c.author_id, c.text, c.created_at, u.username AS author_name
+                FROM comments c
+                JOIN users u ON c.author_id = u.id
+                WHERE c.task_id = ANY(%s)
+                ORDER BY c.task_id, c.created_at, c.id
+                """,
+                (ids,),
+            ):
+                result[comment["task_id"]].append(comment)
+        return result
+
+    def get_comment_by_id(self, comment_id):
+        return self._one(
+            """
+            SELECT c.id, c.task_id, c.author_id, c.text, c.created_at, u.username AS author_name
+            FROM comments c
+            JOIN users u ON c.author_id = u.id
+            WHERE c.id = %s
+            """,
+            (comment_id,),
+        )
+
+    def add_comment(self, task_id, author_id, text):
+        row = self._one(
+            "INSERT INTO comments (task_id, author_id, text) VALUES (%s, %s, %s) RETURNING id",
+            (task_id, author_id, text),
+        )
+        return row["id"]
+
+    def update_comment(self, comment_id, text):
+        if not text:
+            return False
+        return self._execute("UPDATE comments SET text = %s WHERE id = %s", (text, comment_id)) > 0
+
+    def delete_comment(self, comment_id):
+        return self._execute("DELETE FROM comments WHERE id = %s", (comment_id,)) > 0
+
+    # ---------- файлы задач ----------
+    def save_task_file(self, task_id: int, stored_name: str, original_name: str,
+                       content_type: str, size_bytes: int, uploader_id: int = None):
+        return self._one(
+            f"""
+            INSERT INTO task_files (task_id, stored_name, original_name, content_type, size_bytes, uploader_id)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING {_PG_FILE_COLUMNS}
+            """,
+            (task_id, stored_name, original_name, content_type, size_bytes, uploader_id),
+        )
+
+    def get_task_files_for_task(self, task_id: int):
+        return self._all(
+            f"SELECT {_PG_FILE_COLUMNS} FROM task_files WHERE task_id = %s ORDER BY uploaded_at DESC, id DESC",
+            (task_id,),
+        )
+
+    def get_task_files_for_tasks(self, task_ids):
+        ids = sorted(set(task_ids))
+        result = {task_id: [] for task_id in ids}
+        if ids:
+            for row in self._all(
+                f"SELECT {_PG_FILE_COLUMNS} FROM task_files WHERE task_id = ANY(%s) "
+                "ORDER BY task_id, uploaded_at DESC, id DESC",
+                (ids,),
+            ):
+                result[row["task_id"]].append(row)
+        return result
+
+    def get_attachment_by_id(self, attachment_id: int):
+        return self._one(f"SELECT {_PG_FILE_COLUMNS} FROM task_files WHERE id = %s", (attachment_id,))
+
+    def delete_attachment(self, attachment_id: int):
+        return self._execute("DELETE FROM task_files WHERE id = %s", (attachment_id,)) > 0
+
+
+# ===== ВЫБОР ХРАНИЛИЩА =====
+_repository: Optional[Repository] = None
+
+
+def create_repository(backend: str = None, dsn: str = None) -> Repository:
+    """Создать хранилище по имени (по умолчанию — из TM_STORAGE_BACKEND)."""
+    backend = backend or STORAGE_BACKEND
+    if backend == "sqlite":
+        return SQLiteRepository()
+    if backend == "postgres":
+        repo = PostgresRepository(POSTGRES_DSN if dsn is None else dsn)
+        repo.init_schema()
+        # как database.py при импорте: схема + тестовые данные в пустой БД
+        repo.add_test_data()
+        return repo
+    raise ValueError(f"Неизвестное хранилище: {backend}. Доступны: sqlite, postgres")
+
+
+def get_repository() -> Repository:
+    """Хранилище приложения (создаётся при первом обращении)."""
+    global _repository
+    if _repository is None:
+        _repository = create_repository()
+    return _repository
+
+
+def close_repository() -> None:
+    global _repository
+    if _repository is not None:
+        _repository.close()
+        _repository = None
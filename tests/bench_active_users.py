@@ -0,0 +1,109 @@
+# tests/bench_active_users.py
+"""
+Бенчмарк топа активных пользователей: прежний запрос (LEFT JOIN задач и
+комментариев + COUNT(DISTINCT)) против чтения user_activity по индексу.
+
+Запуск:  python tests/bench_active_users.py [задач] [комментариев] [пользователей] [таймаут, сек]
+По умолчанию 1 000 000 задач и 5 000 000 комментариев (заполнение займёт
+несколько минут). Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+
+LEGACY_QUERY = """
+SELECT u.id, COUNT(DISTINCT t.id) AS tasks_count, COUNT(DISTINCT c.id) AS comments_count
+FROM users u
+LEFT JOIN tasks t ON t.author_id = u.id
+LEFT JOIN comments c ON c.author_id = u.id
+GROUP BY u.id
+ORDER BY tasks_count + comments_count DESC, u.id
+LIMIT 10
+"""
+
+CHUNK = 50000
+
+
+def author_for(i, users):
+    # "плодовитые" пользователи: большая часть записей у небольшого числа авторов
+    return 1 + int(users * ((i * 7919) % 1000 / 1000) ** 3)
+
+
+def prepare_db(tasks, comments, users):
+    database.STORAGE_PROFILE = "throughput"
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executemany(
+        "INSERT INTO users (email, username, password_hash) VALUES (?, ?, '')",
+        ((f"user{i}@bench", f"Пользователь {i}") for i in range(users)),
+    )
+    for start in range(0, tasks, CHUNK):
+        conn.executemany(
+            "INSERT INTO tasks (title, author_id) VALUES (?, ?)",
+            ((f"Задача {i}", author_for(i, users)) for i in range(start, min(start + CHUNK, tasks))),
+        )
+        conn.commit()
+    for start in range(0, comments, CHUNK):
+        conn.executemany(
+            "INSERT INTO comments (task_id, author_id, text) VALUES (?, ?, ?)",
+            ((1 + i % tasks, author_for(i, users), f"Комментарий {i}")
+             for i in range(start, min(start + CHUNK, comments))),
+        )
+        conn.commit()
+    conn.close()
+
+
+def time_legacy(timeout):
+    conn = sqlite3.connect(database.DB_NAME)
+    deadline = time.perf_counter() + timeout
+    # прерываем запрос, если он не уложился в таймаут
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, 100000)
+    start = time.perf_counter()
+    try:
+        conn.execute(LEGACY_QUERY).fetchall()
+    except sqlite3.OperationalError:  # interrupted
+        return None
+    finally:
+        conn.close()
+    return time.perf_counter() - start
+
+
+def time_counters(repeat=100):
+    database.get_active_users()  # прогрев соединения
+    start = time.perf_counter()
+    for _ in range(repeat):
+        database.get_active_users()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    comments = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000_000
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    timeout = float(sys.argv[4]) if len(sys.argv) > 4 else 60
+
+    start = time.perf_counter()
+    prepare_db(tasks, comments, users)
+    print(f"{tasks} задач, {comments} комментариев, {users} пользователей "
+          f"(заполнение {time.perf_counter() - start:.0f} сек)")
+
+    legacy = time_legacy(timeout)
+    counters = time_counters()
+    legacy_text = f"{legacy * 1000:.1f} мс" if legacy is not None else f"> {timeout:g} сек (прерван)"
+    print(f"{'JOIN + COUNT(DISTINCT)':<26}{legacy_text:>24}")
+    print(f"{'user_activity по индексу':<26}{counters * 1000:>21.3f} мс")
+    print(f"расхождений в счётчиках: {database.check_counters(['user_activity'])['user_activity']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# tests/bench_db_pool.py
+"""
+Бенчмарк: запросы/сек на существующих эндпоинтах без пула соединений
+(DB_POOL_SIZE = 0, как было раньше) и с пулом.
+
+Запуск:  python tests/bench_db_pool.py [кол-во запросов на эндпоинт]
+Работает на временной копии БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from app import app
+from cache import invalidate_all_task_details, invalidate_task_list_cache
+
+
+def prepare_db():
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+
+def login(client):
+    resp = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"})
+    return resp.get_json()["token"]
+
+
+def run(client, token, n):
+    headers = {"Authorization": f"Bearer {token}"}
+    cases = [
+        ("GET /api/tasks/1", lambda: client.get("/api/tasks/1")),
+        ("GET /api/tasks/1/comments", lambda: client.get("/api/tasks/1/comments")),
+        ("GET /api/tasks", lambda: client.get("/api/tasks?limit=50")),
+        ("GET /users/me (token)", lambda: client.get("/users/me", headers=headers)),
+    ]
+    results = {}
+    for name, call in cases:
+        start = time.perf_counter()
+        for _ in range(n):
+            # кэш сбрасываем, чтобы каждый запрос реально шёл в БД
+            invalidate_all_task_details()
+            invalidate_task_list_cache()
+            resp = call()
+            assert resp.status_code == 200, (name, resp.status_code)
+        elapsed = time.perf_counter() - start
+        results[name] = n / elapsed
+    return results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    prepare_db()
+    app.config["TESTING"] = True
+
+    table = {}
+    for label, pool_size in (("без пула", 0), ("с пулом", 8)):
+        database.DB_POOL_SIZE = pool_size
+        with app.test_client() as client:
+            token = login(client)
+            run(client, token, n // 10)  # прогрев
+            table[label] = run(client, token, n)
+
+    print(f"{'эндпоинт':<30}{'без пула, rps':>16}{'с пулом, rps':>16}{'ускорение':>12}")
+    for name in table["без пула"]:
+        before = table["без пула"][name]
+        after = table["с пулом"][name]
+        print(f"{name:<30}{before:>16.0f}{after:>16.0f}{after / before:>11.2f}x")
+    print("pool:", database.get_pool().stats())
+
+
+if __name__ == "__main__":
+    main()
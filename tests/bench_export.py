@@ -0,0 +1,79 @@
+# tests/bench_export.py
+"""
+Бенчмарк выгрузки задач: пиковая память (tracemalloc) и время для
+GET /api/tasks?limit=-1 (весь список в памяти + jsonify) и потоковой
+GET /api/tasks/export (NDJSON / CSV) на разном числе задач.
+
+Запуск:  python tests/bench_export.py [число задач через запятую]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from app import app
+from cache import invalidate_task_list_cache
+
+
+def prepare_db(tasks):
+    database.close_pool()
+    database.close_read_pool()
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.executemany(
+        "INSERT INTO tasks (title, description, author_id, executor_id) VALUES (?, ?, ?, ?)",
+        ((f"Задача {i}", "Описание задачи " * 8, 1 + i % 3, 1 + i % 2) for i in range(tasks)),
+    )
+    conn.commit()
+    conn.close()
+    # строки добавлены мимо database.py — кэш списка об этом не знает
+    invalidate_task_list_cache()
+
+
+def measure(client, url, headers):
+    """Прочитать ответ целиком по кускам; вернуть (байт, сек, пик памяти в МБ)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    resp = client.get(url, headers=headers, buffered=False)
+    size = 0
+    for chunk in resp.response:
+        size += len(chunk)
+    resp.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak / 1024 / 1024
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10000, 100000]
+    app.config["TESTING"] = True
+
+    print(f"{'задач':>8}  {'способ':<24}{'МБ ответа':>10}{'сек':>8}{'пик памяти, МБ':>17}")
+    for tasks in sizes:
+        prepare_db(tasks)
+        with app.test_client() as client:
+            token = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"}).get_json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for title, url in (
+                ("GET /api/tasks?limit=-1", "/api/tasks?limit=-1"),
+                ("export ndjson", "/api/tasks/export?format=ndjson"),
+                ("export csv", "/api/tasks/export?format=csv"),
+            ):
+                size, elapsed, peak = measure(client, url, headers)
+                print(f"{tasks:>8}  {title:<24}{size / 1024 / 1024:>10.1f}{elapsed:>8.2f}{peak:>17.1f}")
+    database.close_writer()
+
+
+if __name__ == "__main__":
+    main()
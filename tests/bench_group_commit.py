@@ -0,0 +1,95 @@
+# tests/bench_group_commit.py
+"""
+Бенчмарк: параллельные add_comment / create_task из нескольких потоков
+напрямую через соединения (DB_WRITER_ENABLED = False) и через поток-писатель
+с group commit. Оба режима — и вне запроса (фоновые задачи, CLI), и внутри
+сессии HTTP-запроса (одна запись — один запрос со своей транзакцией).
+
+Запуск:  python tests/bench_group_commit.py [потоков] [записей на поток]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+import database
+
+# сессия запроса живёт в flask.g — нужен только контекст приложения
+app = Flask(__name__)
+
+
+def prepare_db():
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+
+def write(n, i):
+    if i % 4 == 0:
+        database.create_task(f"Задача {n}-{i}", "", author_id=2)
+    else:
+        database.add_comment(1, 1, f"Комментарий {n}-{i}")
+
+
+def run(threads, per_thread, in_request):
+    errors = []
+
+    def worker(n):
+        for i in range(per_thread):
+            try:
+                if not in_request:
+                    write(n, i)
+                    continue
+                with app.app_context():
+                    database.begin_request_session()
+                    try:
+                        write(n, i)
+                    except BaseException:
+                        database.end_request_session(commit=False)
+                        raise
+                    database.end_request_session(commit=True)
+            except sqlite3.OperationalError as e:  # database is locked
+                errors.append(e)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return threads * per_thread / elapsed, len(errors)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    prepare_db()
+
+    print(f"{threads} потоков x {per_thread} записей")
+    print(f"{'режим':<28}{'записей/сек':>14}{'locked':>10}{'COMMIT':>10}")
+
+    for in_request, label in ((False, "вне запроса"), (True, "в запросе")):
+        database.DB_WRITER_ENABLED = False
+        rate, errors = run(threads, per_thread, in_request)
+        mode = f"соединение, {label}"
+        print(f"{mode:<28}{rate:>14.0f}{errors:>10}{threads * per_thread - errors:>10}")
+
+        database.DB_WRITER_ENABLED = True
+        writer = database.get_writer()
+        rate, errors = run(threads, per_thread, in_request)
+        mode = f"писатель, {label}"
+        print(f"{mode:<28}{rate:>14.0f}{errors:>10}{writer.stats()['commits']:>10}")
+        database.close_writer()
+
+
+if __name__ == "__main__":
+    main()
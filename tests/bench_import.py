@@ -0,0 +1,67 @@
+# tests/bench_import.py
+"""
+Бенчмарк импорта задач: POST /api/tasks (по одной), POST /api/tasks/import
+с разным chunk_size. Считает задачи в секунду.
+
+Запуск:  python tests/bench_import.py [задач для импорта] [задач по одной]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from app import app
+
+
+def prepare_db():
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+
+def ndjson(count):
+    for i in range(count):
+        yield json.dumps({
+            "title": f"Историческая задача {i}",
+            "description": "Перенесено из старой системы",
+            "author_id": 1 + i % 3,
+            "priority": "высокий" if i % 5 == 0 else "средний",
+        }, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    one_by_one = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    prepare_db()
+    app.config["TESTING"] = True
+
+    with app.test_client() as client:
+        token = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"}).get_json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print(f"{'способ':<32}{'задач':>10}{'сек':>8}{'задач/сек':>12}")
+        start = time.perf_counter()
+        for line in ndjson(one_by_one):
+            client.post("/api/tasks", data=line, content_type="application/json", headers=headers)
+        elapsed = time.perf_counter() - start
+        print(f"{'POST /api/tasks по одной':<32}{one_by_one:>10}{elapsed:>8.2f}{one_by_one / elapsed:>12.0f}")
+
+        body = b"".join(ndjson(total))
+        for chunk_size in (100, 1000, 10000):
+            start = time.perf_counter()
+            resp = client.post(f"/api/tasks/import?chunk_size={chunk_size}", data=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            created = resp.get_json()["created"]
+            title = f"import chunk_size={chunk_size}"
+            print(f"{title:<32}{created:>10}{elapsed:>8.2f}{created / elapsed:>12.0f}")
+    database.close_writer()
+
+
+if __name__ == "__main__":
+    main()
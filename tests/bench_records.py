@@ -0,0 +1,106 @@
+# tests/bench_records.py
+"""
+Бенчмарк представления строк списка задач: sqlite3.Row + dict_from_row
+против записей records.TaskRecord.
+
+Меряет на limit строк:
+  - память на строку (tracemalloc: сколько занимает готовый список);
+  - время выборки и время выборки + JSON (как GET /api/tasks без кэша).
+
+Запуск:  python tests/bench_records.py [limit] [повторов]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from app import app
+from records import TaskRecord
+
+LIST_QUERY = '''
+SELECT
+    t.id, t.title, t.description, t.status, t.priority, t.due_date,
+    t.author_id, t.executor_id, t.created_at, t.updated_at,
+    u1.username as author_name,
+    u2.username as executor_name
+FROM tasks t
+LEFT JOIN users u1 ON t.author_id = u1.id
+LEFT JOIN users u2 ON t.executor_id = u2.id
+ORDER BY t.created_at DESC, t.id DESC LIMIT ?
+'''
+
+
+def prepare_db(tasks):
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.executemany(
+        "INSERT INTO tasks (title, description, author_id, executor_id) VALUES (?, ?, ?, ?)",
+        ((f"Задача {i}", "Описание задачи " * 4, 1 + i % 3, 1 + i % 2) for i in range(tasks)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def fetch_dicts(conn, limit):
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(LIST_QUERY, (limit,)).fetchall()
+    return [database.dict_from_row(row) for row in rows]
+
+
+def fetch_records(conn, limit):
+    conn.row_factory = None
+    cursor = conn.execute(LIST_QUERY, (limit,))
+    cursor.row_factory = TaskRecord.row_factory(cursor)
+    return cursor.fetchall()
+
+
+def memory_per_row(fetch, conn, limit):
+    fetch(conn, limit)  # прогрев: кэш запросов, классы записей
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = fetch(conn, limit)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(rows) == limit
+    return (after - before) / limit
+
+
+def timing_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    prepare_db(limit * 2)
+    conn = sqlite3.connect(database.DB_NAME)
+
+    print(f"limit={limit}, лучшее из {repeat}")
+    print(f"{'строки':<22}{'байт/строку':>12}{'выборка, мс':>14}{'+ JSON, мс':>13}")
+    with app.app_context():
+        for title, fetch in (("sqlite3.Row + dict", fetch_dicts), ("TaskRecord", fetch_records)):
+            per_row = memory_per_row(fetch, conn, limit)
+            fetch_ms = timing_ms(lambda: fetch(conn, limit), repeat)
+            json_ms = timing_ms(lambda: app.json.dumps({"tasks": fetch(conn, limit)}), repeat)
+            print(f"{title:<22}{per_row:>12.0f}{fetch_ms:>14.2f}{json_ms:>13.2f}")
+    conn.close()
+    database.close_writer()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# tests/bench_response_cache.py
+"""
+Бенчмарк попадания в кэш GET /api/tasks: как было (в кэше словарь,
+на каждый запрос jsonify) против готовых байтов ответа (cache.make_cached_body),
+в том числе сжатых gzip.
+
+Меряет на limit задач в ответе:
+  - только сборку тела (jsonify словаря против копирования байтов);
+  - полный запрос через тестовый клиент Flask (кэш уже прогрет) —
+    чтобы видеть, какую долю попадания занимала сериализация.
+
+Запуск:  python tests/bench_response_cache.py [limit] [повторов]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from app import app, cached_json_response
+from cache import gzip_body, make_cached_body
+
+
+def prepare_db(tasks):
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.executemany(
+        "INSERT INTO tasks (title, description, author_id, executor_id) VALUES (?, ?, ?, ?)",
+        ((f"Задача {i}", "Описание задачи " * 4, 1 + i % 3, 1 + i % 2) for i in range(tasks)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def timing_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    prepare_db(limit * 2)
+    app.config["TESTING"] = True
+    url = f"/api/tasks?limit={limit}"
+
+    with app.test_request_context(url, headers={"Accept-Encoding": "gzip"}):
+        from flask import jsonify
+        body = {"success": True, "tasks": database.get_all_tasks(limit=limit)}
+        entry = make_cached_body(jsonify(body).get_data())
+        gzip_body(entry)
+        print(f"limit={limit}, тело {len(entry['body']) / 1024:.0f} КБ "
+              f"(gzip {len(entry['gzip']) / 1024:.0f} КБ), лучшее из {repeat}")
+        print(f"{'попадание в кэш':<28}{'сборка тела, мс':>17}")
+        print(f"{'словарь + jsonify':<28}{timing_ms(lambda: jsonify(body).get_data(), repeat):>17.3f}")
+        print(f"{'готовые байты':<28}{timing_ms(lambda: cached_json_response(entry).get_data(), repeat):>17.3f}")
+
+    print(f"\n{'запрос (тестовый клиент)':<28}{'мс':>17}")
+    with app.test_client() as client:
+        for title, headers in (("готовые байты", {}), ("готовые байты, gzip", {"Accept-Encoding": "gzip"})):
+            client.get(url, headers=headers)  # прогрев кэша
+            ms = timing_ms(lambda: client.get(url, headers=headers), repeat)
+            print(f"{title:<28}{ms:>17.3f}")
+
+    database.close_writer()
+
+
+if __name__ == "__main__":
+    main()
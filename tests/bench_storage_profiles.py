@@ -0,0 +1,80 @@
+# tests/bench_storage_profiles.py
+"""
+Бенчмарк профилей хранения на нагрузке с частыми записями
+(create_task / add_comment, как в bench_group_commit.py):
+  - один поток, COMMIT на каждую запись (DB_WRITER_ENABLED = False);
+  - несколько потоков через поток-писатель с group commit.
+
+Запуск:  python tests/bench_storage_profiles.py [потоков] [записей на поток]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+from storage_profiles import STORAGE_PROFILES
+
+
+def prepare_db(profile):
+    database.close_writer()
+    database.close_pool()
+    database.close_read_pool()
+    database.STORAGE_PROFILE = profile
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+
+def write(n, i):
+    if i % 4 == 0:
+        database.create_task(f"Задача {n}-{i}", "", author_id=2)
+    else:
+        database.add_comment(1, 1, f"Комментарий {n}-{i}")
+
+
+def run_single(count):
+    database.DB_WRITER_ENABLED = False
+    start = time.perf_counter()
+    for i in range(count):
+        write(0, i)
+    return count / (time.perf_counter() - start)
+
+
+def run_threads(threads, per_thread):
+    database.DB_WRITER_ENABLED = True
+
+    def worker(n):
+        for i in range(per_thread):
+            write(n, i)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return threads * per_thread / (time.perf_counter() - start)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"1 поток x {per_thread} записей; {threads} потоков x {per_thread} записей через писателя")
+    print(f"{'профиль':<14}{'1 поток, зап/сек':>20}{'писатель, зап/сек':>20}")
+    for profile in STORAGE_PROFILES:
+        prepare_db(profile)
+        single = run_single(per_thread)
+        threaded = run_threads(threads, per_thread)
+        print(f"{profile:<14}{single:>20.0f}{threaded:>20.0f}")
+    database.close_writer()
+
+
+if __name__ == "__main__":
+    main()
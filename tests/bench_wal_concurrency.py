@@ -0,0 +1,112 @@
+# tests/bench_wal_concurrency.py
+"""
+Бенчмарк: смешанная нагрузка — читатели (статистика задач, активные пользователи)
+и писатели (add_comment) одновременно.
+
+Сравниваются два режима:
+  - профиль legacy (journal_mode=DELETE), чтения через общий read-write пул;
+  - профиль balanced (journal_mode=WAL) + read-only пул для чтений.
+
+Запуск:  python tests/bench_wal_concurrency.py [читателей] [писателей] [секунд] [задач]
+Работает на временной БД, рабочий task_manager.db не трогает.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+
+
+def prepare_db(tasks):
+    tmp_dir = tempfile.mkdtemp(prefix="tm_bench_")
+    database.DB_NAME = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.add_test_data()
+
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.executemany(
+        "INSERT INTO tasks (title, description, author_id, executor_id) VALUES (?, ?, ?, ?)",
+        ((f"Задача {i}", "Описание " * 10, 1 + i % 3, 1 + i % 2) for i in range(tasks)),
+    )
+    conn.executemany(
+        "INSERT INTO comments (task_id, author_id, text) VALUES (?, ?, ?)",
+        ((1 + i % tasks, 1 + i % 3, f"Комментарий {i}") for i in range(tasks)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(readers, writers, seconds):
+    stop = threading.Event()
+    reads = []
+    write_latencies = []
+    errors = []
+
+    def reader(n):
+        count = 0
+        while not stop.is_set():
+            try:
+                if n % 2:
+                    database.get_active_users()
+                else:
+                    database.get_task_stats()
+                count += 1
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+        reads.append(count)
+
+    def writer(n):
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                database.add_comment(1, 1, f"Комментарий писателя {n}")
+                latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError as e:  # database is locked
+                errors.append(e)
+        write_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    write_latencies.sort()
+    p95 = write_latencies[int(len(write_latencies) * 0.95)] * 1000 if write_latencies else 0
+    return sum(reads) / seconds, len(write_latencies) / seconds, p95, len(errors)
+
+
+def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    tasks = int(sys.argv[4]) if len(sys.argv) > 4 else 3000
+
+    print(f"{readers} читателей, {writers} писателей, {seconds:g} сек, {tasks} задач")
+    print(f"{'режим':<24}{'чтений/сек':>12}{'записей/сек':>14}{'p95 записи, мс':>17}{'ошибок':>9}")
+
+    for title, profile, read_pool_size in (
+        ("DELETE, общий пул", "legacy", 0),
+        ("WAL, read-only пул", "balanced", 8),
+    ):
+        database.STORAGE_PROFILE = profile
+        database.DB_READ_POOL_SIZE = read_pool_size
+        prepare_db(tasks)
+        rps, wps, p95, errors = run(readers, writers, seconds)
+        print(f"{title:<24}{rps:>12.0f}{wps:>14.0f}{p95:>17.1f}{errors:>9}")
+        database.close_writer()
+        database.close_pool()
+        database.close_read_pool()
+
+
+if __name__ == "__main__":
+    main()
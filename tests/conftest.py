@@ -0,0 +1,147 @@
+# tests/conftest.py
+"""
+Общие фикстуры: хранилище для тестов.
+
+HTTP-тесты идут в то хранилище, что выбрано для приложения (repository.py):
+  python -m pytest -q                                    — SQLite
+  TM_STORAGE_BACKEND=postgres TM_POSTGRES_DSN=postgresql://tm@localhost/tm_test \\
+      python -m pytest -q                                — PostgreSQL
+На PostgreSQL тесты внутренностей database.py (пулы, триггеры, счётчики,
+FTS, архив, экспорт) пропускаются — они помечены @pytest.mark.sqlite_only.
+
+Тесты repository.py (test_repository.py) гоняют оба хранилища всегда:
+PostgreSQL — по TM_TEST_POSTGRES_DSN или на временном локальном кластере.
+
+app_storage — пустое хранилище приложения на один тест (с тестовыми данными).
+Загруженные в тестах файлы пишутся во временный каталог, а не в uploads/.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+import repository
+from cache import TASK_DETAIL_CACHE, invalidate_task_list_cache
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "sqlite_only: тест внутренностей database.py, только для SQLite")
+
+
+def pytest_collection_modifyitems(config, items):
+    if repository.STORAGE_BACKEND == "sqlite":
+        return
+    skip = pytest.mark.skip(reason=f"только SQLite (TM_STORAGE_BACKEND={repository.STORAGE_BACKEND})")
+    for item in items:
+        if "sqlite_only" in item.keywords:
+            item.add_marker(skip)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def upload_folder(tmp_path_factory):
+    from app import app
+
+    old_folder = app.config["UPLOAD_FOLDER"]
+    app.config["UPLOAD_FOLDER"] = str(tmp_path_factory.mktemp("uploads"))
+    yield app.config["UPLOAD_FOLDER"]
+    app.config["UPLOAD_FOLDER"] = old_folder
+
+
+@pytest.fixture(scope="session")
+def postgres_dsn(tmp_path_factory):
+    """Сервер PostgreSQL для тестов: TM_TEST_POSTGRES_DSN или временный кластер (initdb + pg_ctl)."""
+    if repository.psycopg is None:
+        pytest.skip("не установлены psycopg / psycopg_pool")
+
+    dsn = os.environ.get("TM_TEST_POSTGRES_DSN")
+    if dsn:
+        yield dsn
+        return
+
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not (initdb and pg_ctl):
+        pytest.skip("нет TM_TEST_POSTGRES_DSN и PostgreSQL (initdb, pg_ctl) в PATH")
+
+    data = tmp_path_factory.mktemp("pgdata")
+    port = _free_port()
+    subprocess.run(
+        [initdb, "-D", str(data), "-U", "tm", "--auth=trust", "-E", "UTF8", "--locale=C"],
+        check=True, capture_output=True,
+    )
+    subprocess.run(
+        [pg_ctl, "-D", str(data), "-l", str(data / "server.log"), "-w",
+         "-o", f"-p {port} -k {data} -c listen_addresses=''", "start"],
+        check=True, capture_output=True,
+    )
+    try:
+        yield f"postgresql://tm@/postgres?host={data}&port={port}"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data), "-m", "fast", "-w", "stop"], capture_output=True)
+
+
+@pytest.fixture
+def fresh_postgres_db():
+    """
+    make(server_dsn, name) -> DSN пустой БД name на том же сервере
+    (как временный файл для SQLite). После теста БД удаляется.
+    """
+    created = []
+
+    def drop(server_dsn, name):
+        with repository.psycopg.connect(server_dsn, autocommit=True) as conn:
+            conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+
+    def make(server_dsn, name):
+        drop(server_dsn, name)
+        with repository.psycopg.connect(server_dsn, autocommit=True) as conn:
+            conn.execute(f'CREATE DATABASE "{name}"')
+        created.append((server_dsn, name))
+        return repository.psycopg.conninfo.make_conninfo(server_dsn, dbname=name)
+
+    yield make
+    for server_dsn, name in created:
+        drop(server_dsn, name)
+
+
+@pytest.fixture
+def app_storage(tmp_path, fresh_postgres_db, monkeypatch):
+    """
+    Новое хранилище приложения того же вида, что выбран в repository.py:
+    SQLite — временный файл, PostgreSQL — новая БД на том же сервере.
+    На время теста app.storage и get_repository() указывают на него.
+    """
+    import app as app_module
+
+    old_name = database.DB_NAME
+    if repository.STORAGE_BACKEND == "postgres":
+        repo = repository.create_repository("postgres", fresh_postgres_db(repository.POSTGRES_DSN, "tm_test_app"))
+    else:
+        database.DB_NAME = str(tmp_path / "app.db")
+        database.init_db()
+        database.add_test_data()
+        repo = repository.SQLiteRepository()
+    monkeypatch.setattr(app_module, "storage", repo)
+    monkeypatch.setattr(repository, "_repository", repo)
+    # в кэшах ответов — данные прежней БД
+    invalidate_task_list_cache()
+    TASK_DETAIL_CACHE.clear()
+    yield repo
+    invalidate_task_list_cache()
+    TASK_DETAIL_CACHE.clear()
+    if repo.name == "postgres":
+        repo.close()
+    else:
+        database.close_writer()
+        database.close_pool()
+        database.close_read_pool()
+        database.DB_NAME = old_name
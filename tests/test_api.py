@@ -1,9 +1,13 @@
 # tests/test_api.py
 import os
 import sys
+from datetime import datetime, timedelta, timezone
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
 from app import app
+from cache import invalidate_task_detail
+from utils import conditional
+from werkzeug.http import http_date
 
 
 @pytest.fixture
@@ -73,6 +77,45 @@ def test_get_tasks(client):
     assert isinstance(data["tasks"], list)
 
 
+def test_get_tasks_cursor_pagination(client):
+    # Полный список одной страницей — эталон порядка
+    full = client.get("/api/tasks?limit=1000").get_json()["tasks"]
+    expected_ids = [t["id"] for t in full]
+
+    # Идём курсором по 2 задачи и собираем всё
+    seen = []
+    resp = client.get("/api/tasks?limit=2&cursor=")
+    data = resp.get_json()
+    seen += [t["id"] for t in data["tasks"]]
+    while data["next_cursor"]:
+        resp = client.get(f"/api/tasks?limit=2&cursor={data['next_cursor']}")
+        assert resp.status_code == 200
+        data = resp.get_json()
+        seen += [t["id"] for t in data["tasks"]]
+
+    assert seen == expected_ids
+
+
+def test_get_tasks_page_returns_next_cursor(client):
+    resp = client.get("/api/tasks?limit=1&page=1")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["page"] == 1
+    assert data["count"] == 1
+    assert data["next_cursor"]
+
+    # вторая страница по курсору совпадает со второй страницей по page
+    by_cursor = client.get(f"/api/tasks?limit=1&cursor={data['next_cursor']}").get_json()
+    by_page = client.get("/api/tasks?limit=1&page=2").get_json()
+    assert by_cursor["tasks"] == by_page["tasks"]
+
+
+def test_get_tasks_invalid_cursor(client):
+    resp = client.get("/api/tasks?cursor=not-a-cursor")
+    assert resp.status_code == 400
+    assert "cursor" in resp.get_json()["error"]
+
+
 def test_create_task_success(client, auth_token):
     payload = {
         "title": "Новая задача",
@@ -336,3 +379,732 @@ def test_create_task_forbidden_for_user(client, user_token):
     data = resp.get_json()
     assert "error" in data
 
+
+
+def test_get_tasks_total_matches_filters(client, auth_token):
+    # total не зависит от limit и совпадает с реальным числом задач
+    all_tasks = client.get("/api/tasks?limit=100000").get_json()
+    assert all_tasks["total"] == all_tasks["count"]
+
+    resp = client.get("/api/tasks?limit=1")
+    assert resp.get_json()["total"] == all_tasks["total"]
+
+    # создание задачи сразу отражается в счётчиках (триггеры + сброс кэша)
+    before = client.get("/api/tasks?status=отменена&priority=низкий").get_json()["total"]
+    resp = client.post(
+        "/api/tasks",
+        json={"title": "Для счётчика", "author_id": 2, "status": "отменена", "priority": "низкий"},
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 201
+    after = client.get("/api/tasks?status=отменена&priority=низкий").get_json()["total"]
+    assert after == before + 1
+
+
+@pytest.mark.sqlite_only
+def test_count_tasks_counters_match_count_star():
+    import database
+
+    filter_sets = [
+        {},
+        {"status": "к выполнению"},
+        {"priority": "высокий"},
+        {"executor_id": 3},
+        {"status": "в процессе", "priority": "высокий", "executor_id": 3},
+        {"author_id": 2},                      # не покрыт счётчиками
+        {"status": "к выполнению", "due_date_before": "2030-01-01"},
+        # в счётчиках "без исполнителя" — 0, а в tasks — NULL: 0 не совпадает ни с чем
+        {"executor_id": 0},
+        {"executor_id": "0"},                  # так приходит из query-параметров
+        {"executor_id": "3"},
+        {"status": ""},
+    ]
+    def check():
+        for filters in filter_sets:
+            expected = len(database.get_all_tasks(filters, limit=-1))
+            assert database.count_tasks(filters) == expected, filters
+
+    # задача без исполнителя — строка счётчика с executor_id = 0
+    unassigned_id = database.create_task("Без исполнителя", "", author_id=2)
+    check()
+    # триггеры держат счётчики в актуальном состоянии при update / delete
+    task_id = database.create_task("Счётчик", "", author_id=2, executor_id=3)
+    check()
+    database.update_task(task_id, status="в процессе", priority="высокий", executor_id=4)
+    check()
+    database.delete_task(task_id)
+    database.delete_task(unassigned_id)
+    check()
+
+
+@pytest.mark.sqlite_only
+def test_task_stats_counters_match_group_by():
+    import database
+
+    def expected():
+        stats = {"by_status": {}, "by_priority": {}}
+        for task in database.get_all_tasks(limit=-1):
+            for key in ("status", "priority"):
+                bucket = stats[f"by_{key}"]
+                bucket[task[key]] = bucket.get(task[key], 0) + 1
+        return stats
+
+    assert database.get_task_stats() == expected()
+    task_id = database.create_task("Статистика", "", author_id=2, priority="низкий")
+    database.update_task(task_id, status="отменена")
+    assert database.get_task_stats() == expected()
+    database.delete_task(task_id)
+    assert database.get_task_stats() == expected()
+    assert database.check_counters() == {table: 0 for table in database.COUNTER_TABLES}
+
+
+@pytest.mark.sqlite_only
+def test_active_users_counters_match_join():
+    import database
+
+    def expected(limit=10):
+        # прежний запрос "в лоб" — эталон
+        with database.get_db() as cursor:
+            cursor.execute("""
+            SELECT u.id, COUNT(DISTINCT t.id) AS tasks_count, COUNT(DISTINCT c.id) AS comments_count
+            FROM users u
+            LEFT JOIN tasks t ON t.author_id = u.id
+            LEFT JOIN comments c ON c.author_id = u.id
+            GROUP BY u.id
+            ORDER BY tasks_count + comments_count DESC, u.id
+            LIMIT ?
+            """, (limit,))
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def actual(limit=10):
+        return [(u["id"], u["tasks_count"], u["comments_count"]) for u in database.get_active_users(limit)]
+
+    assert actual() == expected()
+    task_id = database.create_task("Активность", "", author_id=4)
+    comment_id = database.add_comment(task_id, 3, "Активность")
+    assert actual() == expected()
+    database.delete_comment(comment_id)
+    database.delete_task(task_id)
+    assert actual() == expected()
+
+
+@pytest.mark.sqlite_only
+def test_manage_db_option_leaves_default_db(tmp_path):
+    """--db применяется до импорта database: task_manager.db в текущей папке не появляется."""
+    import subprocess
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    env = {k: v for k, v in os.environ.items() if k != "TM_DB_NAME"}
+    result = subprocess.run(
+        [sys.executable, os.path.join(root, "manage.py"), "--db", str(tmp_path / "other.db"), "check-counters"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / "other.db").exists()
+    assert not (tmp_path / "task_manager.db").exists()
+
+
+@pytest.mark.sqlite_only
+def test_manage_rebuild_counters(capsys):
+    import database
+    import manage
+
+    # "портим" счётчик, как при ручной правке БД в обход триггеров
+    with database.get_db() as cursor:
+        cursor.execute(
+            "UPDATE task_stats_counters SET count = count + 5 "
+            "WHERE dimension = 'status' AND value = 'к выполнению'"
+        )
+    assert database.check_counters()["task_stats_counters"] > 0
+
+    with pytest.raises(SystemExit) as exc:
+        manage.main(["check-counters"])
+    assert exc.value.code == 1
+
+    manage.main(["rebuild-counters"])
+    assert database.check_counters() == {table: 0 for table in database.COUNTER_TABLES}
+    manage.main(["check-counters"])
+    assert "task_stats_counters: расходящихся строк — 0" in capsys.readouterr().out
+
+
+# ===== МАССОВЫЕ ОПЕРАЦИИ =====
+
+def test_bulk_create_tasks(client, auth_token):
+    payload = {"tasks": [
+        {"title": "Импорт 1", "author_id": 2, "priority": "высокий"},
+        {"title": "x", "author_id": 2},                 # слишком короткий заголовок
+        {"title": "Импорт 3", "author_id": 2, "due_date": "2025-01-31"},
+        "не объект",
+    ]}
+    resp = client.post(
+        "/api/tasks/bulk",
+        json=payload,
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 201
+    data = resp.get_json()
+    assert data["created"] == 2
+    assert data["failed"] == 2
+
+    results = data["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0]["success"] and results[2]["success"]
+    assert not results[1]["success"] and results[1]["errors"]
+    assert not results[3]["success"]
+
+    first = client.get(f"/api/tasks/{results[0]['id']}").get_json()["task"]
+    third = client.get(f"/api/tasks/{results[2]['id']}").get_json()["task"]
+    assert first["title"] == "Импорт 1" and first["priority"] == "высокий"
+    assert third["title"] == "Импорт 3" and third["due_date"] == "2025-01-31"
+    assert first["executor_id"] == 2  # по умолчанию исполнитель — автор
+
+
+def test_bulk_create_all_invalid(client, auth_token):
+    resp = client.post(
+        "/api/tasks/bulk",
+        json={"tasks": [{"title": "Без автора"}]},
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 400
+    assert resp.get_json()["created"] == 0
+
+
+def test_bulk_create_forbidden_for_user(client, user_token):
+    resp = client.post(
+        "/api/tasks/bulk",
+        json={"tasks": [{"title": "Задача юзера", "author_id": 3}]},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert resp.status_code == 403
+
+
+def test_import_ndjson(client, auth_token):
+    import json
+
+    lines = [
+        json.dumps({"title": "Импорт NDJSON 1", "author_id": 2}, ensure_ascii=False),
+        "",                                                   # пустые строки пропускаются
+        json.dumps({"title": "x", "author_id": 2}),           # короткий заголовок
+        "{не json",
+        json.dumps({"title": "Импорт NDJSON 2", "author_id": 2, "priority": "высокий"}, ensure_ascii=False),
+        json.dumps({"title": "Импорт NDJSON 3", "author_id": 2}, ensure_ascii=False),
+    ]
+    body = "\n".join(lines).encode("utf-8")
+    client.get("/api/tasks?limit=-1")  # список попадает в кэш
+
+    resp = client.post(
+        "/api/tasks/import?chunk_size=2",
+        data=body,
+        content_type="application/x-ndjson",
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 201
+    data = resp.get_json()
+    assert data["created"] == 3
+    assert data["failed"] == 2
+    assert data["chunks"] == 2
+    assert [e["line"] for e in data["errors"]] == [3, 4]
+    assert "JSON" in data["errors"][1]["errors"][0]
+
+    # кэш списка сброшен после пачек
+    after = client.get("/api/tasks?limit=-1").get_json()["tasks"]
+    titles = {t["title"]: t for t in after}
+    assert titles["Импорт NDJSON 2"]["priority"] == "высокий"
+    assert titles["Импорт NDJSON 3"]["executor_id"] == 2
+
+
+def _import_lines(prefix, count):
+    import json
+    return "\n".join(
+        json.dumps({"title": f"{prefix} {i}", "author_id": 2}, ensure_ascii=False) for i in range(count)
+    ).encode("utf-8")
+
+
+@pytest.mark.sqlite_only
+def test_import_commits_each_chunk(client, auth_token):
+    import database
+
+    writer = database.get_writer()
+    commits_before = writer.stats()["commits"]
+    resp = client.post(
+        "/api/tasks/import?chunk_size=5",
+        data=_import_lines("Импорт по пачкам", 25),
+        content_type="application/x-ndjson",
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 201 and resp.get_json()["chunks"] == 5
+    # каждая пачка — свой COMMIT, а не одна транзакция на весь запрос
+    assert writer.stats()["commits"] - commits_before == 5
+
+
+def test_import_failure_keeps_committed_chunks(client, auth_token, monkeypatch):
+    import uuid
+    import app as app_module
+
+    original = app_module.storage.create_tasks_bulk
+    calls = []
+
+    def fail_third_chunk(tasks):
+        calls.append(len(tasks))
+        if len(calls) == 3:
+            raise RuntimeError("boom")
+        return original(tasks)
+
+    prefix = f"Импорт с ошибкой {uuid.uuid4().hex[:8]}"
+    monkeypatch.setattr(app_module.storage, "create_tasks_bulk", fail_third_chunk)
+    with pytest.raises(RuntimeError):
+        client.post(
+            "/api/tasks/import?chunk_size=5",
+            data=_import_lines(prefix, 25),
+            content_type="application/x-ndjson",
+            headers={"Authorization": f"Bearer {auth_token}"},
+        )
+    monkeypatch.undo()
+
+    # две пачки до ошибки уже закоммичены и сброшены из кэша
+    tasks = client.get("/api/tasks?limit=-1").get_json()["tasks"]
+    assert len([t for t in tasks if t["title"].startswith(prefix)]) == 10
+
+
+def test_import_ndjson_validation(client, auth_token, user_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    assert client.post("/api/tasks/import", data=b"", headers=headers).status_code == 400
+    assert client.post("/api/tasks/import?chunk_size=0", data=b"{}", headers=headers).status_code == 400
+    resp = client.post("/api/tasks/import", data='{"title": "Без автора"}\n'.encode(), headers=headers)
+    assert resp.status_code == 400
+    assert resp.get_json()["failed"] == 1
+    assert client.post(
+        "/api/tasks/import", data=b"{}",
+        headers={"Authorization": f"Bearer {user_token}"},
+    ).status_code == 403
+
+
+@pytest.mark.sqlite_only
+def test_import_large_chunk_keeps_counters_consistent(client, auth_token):
+    import database
+
+    count = database.BULK_BATCH_TRIGGERS_MIN + 20
+    with database.get_read_db() as cursor:
+        schema_before = cursor.execute("PRAGMA schema_version").fetchone()[0]
+    body = "\n".join(
+        f'{{"title": "Пачечный импорт {i}", "author_id": {2 + i % 2}, "priority": "низкий"}}'
+        for i in range(count)
+    ).encode("utf-8")
+    resp = client.post(
+        f"/api/tasks/import?chunk_size={count}",
+        data=body,
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 201
+    assert resp.get_json()["created"] == count
+
+    # счётчики и FTS обновлены одним запросом на пачку — и сходятся с данными
+    assert not any(database.check_counters().values())
+    found = client.get("/api/search?q=Пачечный&limit=100").get_json()
+    assert found["count"] == 100
+
+    # пачка не трогает схему (без DROP/CREATE TRIGGER), флаг после неё снят
+    with database.get_read_db() as cursor:
+        assert cursor.execute("PRAGMA schema_version").fetchone()[0] == schema_before
+        assert cursor.execute("SELECT COUNT(*) FROM bulk_insert_guard").fetchone()[0] == 0
+        names = {row["name"] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert set(database.TASK_INSERT_TRIGGERS_BATCH_SQL) <= names
+    # обычная вставка снова обновляет счётчики построчными триггерами
+    database.create_task("После пачки", "", author_id=2)
+    assert not any(database.check_counters().values())
+
+
+def test_import_reads_body_by_lines():
+    import io
+    import task_import
+
+    stream = io.BytesIO(b'{"a": 1}\n{"b": 2}\n\n{"c": 3}')
+    assert list(task_import.iter_lines(stream, block_size=3)) == [b'{"a": 1}', b'{"b": 2}', b"", b'{"c": 3}']
+
+
+def _bulk_create(client, token, tasks):
+    resp = client.post("/api/tasks/bulk", json={"tasks": tasks},
+                       headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 201
+    return [r["id"] for r in resp.get_json()["results"]]
+
+
+def test_bulk_update_admin_only_own(client, auth_token):
+    # admin (id=2) создаёт одну свою задачу и одну "чужую" (автор — super_admin)
+    own_id, foreign_id = _bulk_create(client, auth_token, [
+        {"title": "Своя для bulk", "author_id": 2},
+        {"title": "Чужая для bulk", "author_id": 1},
+    ])
+    resp = client.patch(
+        "/api/tasks/bulk",
+        json={"ids": [own_id, foreign_id], "set": {"status": "выполнена", "executor_id": 4}},
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["ids"] == [own_id]
+    assert data["skipped_ids"] == [foreign_id]
+
+    own = client.get(f"/api/tasks/{own_id}").get_json()["task"]
+    foreign = client.get(f"/api/tasks/{foreign_id}").get_json()["task"]
+    assert own["status"] == "выполнена" and own["executor_id"] == 4
+    assert foreign["status"] == "к выполнению"
+
+
+def test_bulk_update_and_delete_by_filters(client, auth_token):
+    super_token = client.post("/auth/login", json={
+        "email": "super@mail.ru", "password": "123456"
+    }).get_json()["token"]
+    ids = _bulk_create(client, auth_token, [
+        {"title": "Фильтр bulk 1", "author_id": 1, "due_date": "2001-01-01"},
+        {"title": "Фильтр bulk 2", "author_id": 2, "due_date": "2001-01-02"},
+    ])
+    filters = {"due_date_after": "2001-01-01", "due_date_before": "2001-01-02"}
+
+    resp = client.patch(
+        "/api/tasks/bulk",
+        json={"filters": filters, "set": {"priority": "высокий"}},
+        headers={"Authorization": f"Bearer {super_token}"},
+    )
+    assert resp.status_code == 200
+    assert sorted(resp.get_json()["ids"]) == sorted(ids)
+
+    resp = client.delete(
+        "/api/tasks/bulk",
+        json={"filters": filters},
+        headers={"Authorization": f"Bearer {super_token}"},
+    )
+    assert resp.status_code == 200
+    assert resp.get_json()["deleted"] == 2
+    for task_id in ids:
+        assert client.get(f"/api/tasks/{task_id}").status_code == 404
+
+
+def test_bulk_operations_validation(client, auth_token, user_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # без ids и filters — нельзя (защита от UPDATE всей таблицы)
+    resp = client.patch("/api/tasks/bulk", json={"set": {"status": "выполнена"}}, headers=headers)
+    assert resp.status_code == 400
+    resp = client.delete("/api/tasks/bulk", json={"filters": {"colour": "red"}}, headers=headers)
+    assert resp.status_code == 400
+    resp = client.patch("/api/tasks/bulk", json={"ids": [1], "set": {"status": "плохой"}}, headers=headers)
+    assert resp.status_code == 400
+
+    resp = client.delete("/api/tasks/bulk", json={"ids": [1]},
+                         headers={"Authorization": f"Bearer {user_token}"})
+    assert resp.status_code == 403
+
+
+# ===== ПОЛНОТЕКСТОВЫЙ ПОИСК =====
+
+@pytest.mark.sqlite_only
+def test_search_tasks_and_comments(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    in_title, in_comment = _bulk_create(client, auth_token, [
+        {"title": "Починить ЁЛОЧНЫЙ <генератор>", "description": "Срочно", "author_id": 2},
+        {"title": "Обычная задача", "description": "", "author_id": 2, "priority": "высокий"},
+    ])
+    resp = client.post(f"/api/tasks/{in_comment}/comments",
+                       json={"text": "нужен ёлочный генератор", "author_id": 2}, headers=headers)
+    assert resp.status_code == 201
+
+    # регистр, ё/е и префикс ("елочн" -> "ЁЛОЧНЫЙ") не важны
+    # БД общая для прогонов: проверяем только свои задачи
+    resp = client.get("/api/search", query_string={"q": "елочн генератор", "limit": 100})
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+    by_id = {r["id"]: r for r in results}
+    assert set(by_id) >= {in_title, in_comment}
+    # совпадение в названии релевантнее, чем в комментарии
+    assert results.index(by_id[in_title]) < results.index(by_id[in_comment])
+    assert by_id[in_title]["matched_in"] == "task"
+    assert by_id[in_comment]["matched_in"] == "comment"
+    # подсветка есть, а HTML из текста задачи экранирован
+    assert "<mark>ЁЛОЧНЫЙ</mark>" in by_id[in_title]["snippet"]
+    assert "&lt;<mark>генератор</mark>&gt;" in by_id[in_title]["snippet"]
+    assert "<mark>ёлочный</mark> <mark>генератор</mark>" in by_id[in_comment]["snippet"]
+
+    # фильтры — как у списка задач
+    resp = client.get("/api/search", query_string={"q": "генератор", "priority": "высокий", "limit": 100})
+    ids = [r["id"] for r in resp.get_json()["results"]]
+    assert in_comment in ids and in_title not in ids
+
+
+@pytest.mark.sqlite_only
+def test_search_index_follows_updates_and_deletes(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    (task_id,) = _bulk_create(client, auth_token, [{"title": "Квазистатический отчёт", "author_id": 2}])
+
+    resp = client.put(f"/api/tasks/{task_id}", json={"title": "Гиперзвуковой отчёт"}, headers=headers)
+    assert resp.status_code == 200
+    assert client.get("/api/search?q=квазистатический").get_json()["results"] == []
+    assert [r["id"] for r in client.get("/api/search?q=гиперзвуковой").get_json()["results"]] == [task_id]
+
+    client.delete(f"/api/tasks/{task_id}", headers=headers)
+    assert client.get("/api/search?q=гиперзвуковой").get_json()["results"] == []
+
+
+@pytest.mark.sqlite_only
+def test_search_validation(client):
+    assert client.get("/api/search").status_code == 400
+    # операторы FTS5 из ввода не интерпретируются
+    resp = client.get("/api/search", query_string={"q": '" OR NEAR( *'})
+    assert resp.status_code == 200
+    assert client.get("/api/search?q=x&limit=abc").status_code == 400
+
+
+# ===== ВЫГРУЗКА =====
+
+@pytest.mark.sqlite_only
+def test_export_ndjson_and_csv(client, auth_token):
+    import csv
+    import io
+    import json
+
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    _bulk_create(client, auth_token, [{"title": "Выгрузка, \"с кавычками\"", "author_id": 2, "priority": "низкий"}])
+    expected = client.get("/api/tasks?limit=-1&priority=низкий").get_json()["tasks"]
+
+    resp = client.get("/api/tasks/export?priority=низкий", headers=headers)
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert sorted(rows, key=lambda t: t["id"]) == sorted(expected, key=lambda t: t["id"])
+
+    resp = client.get("/api/tasks/export?format=csv&priority=низкий", headers=headers)
+    assert resp.status_code == 200
+    assert "attachment; filename=tasks.csv" == resp.headers["Content-Disposition"]
+    records = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [int(r["id"]) for r in records] == sorted(t["id"] for t in expected)
+    assert "Выгрузка, \"с кавычками\"" in [r["title"] for r in records]
+
+
+@pytest.mark.sqlite_only
+def test_export_validation(client, auth_token):
+    import database
+
+    assert client.get("/api/tasks/export").status_code == 401
+    resp = client.get("/api/tasks/export?format=xml", headers={"Authorization": f"Bearer {auth_token}"})
+    assert resp.status_code == 400
+
+    # пустой результат — в CSV остаётся только заголовок
+    resp = client.get("/api/tasks/export?format=csv&author_id=999999",
+                      headers={"Authorization": f"Bearer {auth_token}"})
+    assert resp.get_data(as_text=True).strip() == ",".join(database.EXPORT_COLUMNS)
+
+
+@pytest.mark.sqlite_only
+def test_iter_tasks_batches():
+    import database
+
+    total = database.count_tasks()
+    batches = list(database.iter_tasks(batch_size=3))
+    assert all(len(rows) <= 3 for rows in batches)
+    assert sum(len(rows) for rows in batches) == total
+
+    # брошенный на середине генератор возвращает соединение в пул
+    pool = database.get_read_pool()
+    gen = database.iter_tasks(batch_size=1)
+    next(gen)
+    gen.close()
+    conn = pool.checkout()
+    assert not conn.in_transaction
+    pool.checkin(conn)
+
+
+# ===== УСЛОВНЫЕ GET (ETAG / 304) =====
+
+def _fail(*args, **kwargs):
+    raise AssertionError("на 304 запрос к БД не нужен")
+
+
+def test_task_etag_not_modified(client, auth_token, monkeypatch):
+    import app as app_module
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_id = _bulk_create(client, auth_token, [{"title": "Для ETag", "author_id": 2}])[0]
+
+    resp = client.get(f"/api/tasks/{task_id}")
+    etag = resp.headers["ETag"]
+    assert resp.status_code == 200 and etag.startswith('"task-')
+    assert "no-cache" in resp.headers["Cache-Control"]
+    # секунда правки ещё идёт — дата не валидатор (следующая правка её не сдвинет)
+    assert "Last-Modified" not in resp.headers
+    same_second = http_date(datetime.now(timezone.utc) + timedelta(seconds=1))
+    resp = client.get(f"/api/tasks/{task_id}", headers={"If-Modified-Since": same_second})
+    assert resp.status_code == 200
+
+    # задача уже в кэше: 304 без обращения к хранилищу и без тела
+    monkeypatch.setattr(app_module.storage, "get_task_by_id", _fail)
+    resp = client.get(f"/api/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 304 and resp.data == b""
+    assert resp.headers["ETag"] == etag
+    monkeypatch.undo()
+
+    # секунда правки прошла — Last-Modified отдаётся, 304 и по дате
+    monkeypatch.setattr(conditional, "LAST_MODIFIED_RESOLUTION", timedelta(0))
+    resp = client.get(f"/api/tasks/{task_id}")
+    etag, last_modified = resp.headers["ETag"], resp.headers["Last-Modified"]
+    resp = client.get(f"/api/tasks/{task_id}", headers={"If-Modified-Since": last_modified})
+    assert resp.status_code == 304
+
+    # две правки в одну секунду — разные ETag (updated_at тот же, rev другой)
+    etags = {etag}
+    for title in ("Правка 1", "Правка 2"):
+        assert client.put(f"/api/tasks/{task_id}", json={"title": title}, headers=headers).status_code == 200
+        resp = client.get(f"/api/tasks/{task_id}", headers={"If-None-Match": etag})
+        assert resp.status_code == 200 and resp.get_json()["task"]["title"] == title
+        etags.add(resp.headers["ETag"])
+    assert len(etags) == 3
+
+    # If-None-Match важнее If-Modified-Since
+    resp = client.get(f"/api/tasks/{task_id}",
+                      headers={"If-None-Match": etag, "If-Modified-Since": last_modified})
+    assert resp.status_code == 200
+
+
+def test_task_list_etag_follows_changes(client, auth_token, monkeypatch):
+    import app as app_module
+    resp = client.get("/api/tasks?limit=5")
+    etag = resp.headers["ETag"]
+    assert resp.status_code == 200 and etag.startswith('"tasks-')
+
+    # 304 — ни выборки, ни подсчёта
+    monkeypatch.setattr(app_module.storage, "get_all_tasks", _fail)
+    monkeypatch.setattr(app_module.storage, "count_tasks", _fail)
+    resp = client.get("/api/tasks?limit=5", headers={"If-None-Match": etag})
+    assert resp.status_code == 304 and resp.data == b""
+    monkeypatch.undo()
+
+    # любая запись в tasks — новый ETag, даже мимо сброса кэша в app
+    app_module.storage.create_task("Мимо API", "", 2)
+    resp = client.get("/api/tasks?limit=5", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+    assert resp.get_json()["tasks"][0]["title"] == "Мимо API"
+
+
+def test_rename_user_changes_task_etag(client, auth_token):
+    from app import storage
+    task_id = _bulk_create(client, auth_token, [{"title": "Имя автора в ETag", "author_id": 2}])[0]
+    before = client.get(f"/api/tasks/{task_id}").headers["ETag"]
+    list_before = client.get("/api/tasks").headers["ETag"]
+
+    # имя автора — часть ответа: переименование меняет версию задачи и списка
+    old_name = storage.get_user_by_id(2)["username"]
+    storage.update_user_basic(2, {"username": "Переименованный"})
+    try:
+        # кэш деталей сбрасывается при переименовании — без ручного invalidate
+        resp = client.get(f"/api/tasks/{task_id}", headers={"If-None-Match": before})
+        assert resp.status_code == 200
+        assert resp.get_json()["task"]["author_name"] == "Переименованный"
+        assert client.get("/api/tasks").headers["ETag"] != list_before
+    finally:
+        storage.update_user_basic(2, {"username": old_name})
+
+
+def test_cached_response_bytes_and_gzip(client, monkeypatch):
+    import gzip
+    import app as app_module
+    miss = client.get("/api/tasks?limit=20")
+    assert miss.headers.get("Content-Encoding") is None
+    assert "Accept-Encoding" in miss.headers["Vary"]
+
+    # попадание — те же байты, без сериализации
+    monkeypatch.setattr(app_module, "jsonify", _fail)
+    hit = client.get("/api/tasks?limit=20")
+    assert hit.data == miss.data and hit.headers["ETag"] == miss.headers["ETag"]
+
+    # gzip — то же тело, свой ETag; 304 узнаёт оба варианта
+    zipped = client.get("/api/tasks?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == miss.data
+    gzip_etag = zipped.headers["ETag"]
+    assert gzip_etag == miss.headers["ETag"][:-1] + '-gzip"'
+    resp = client.get("/api/tasks?limit=20", headers={"If-None-Match": gzip_etag})
+    assert resp.status_code == 304 and resp.headers["ETag"] == gzip_etag
+    monkeypatch.undo()
+
+    # маленькое тело не сжимается
+    task_id = client.get("/api/tasks?limit=1").get_json()["tasks"][0]["id"]
+    detail = client.get(f"/api/tasks/{task_id}", headers={"Accept-Encoding": "gzip"})
+    assert detail.headers.get("Content-Encoding") is None
+    assert detail.get_json()["task"]["id"] == task_id
+    assert client.get(f"/api/tasks/{task_id}").data == detail.data
+
+
+# ===== ?include= (СВЯЗАННЫЕ ДАННЫЕ ОДНИМ ОТВЕТОМ) =====
+
+def test_task_detail_include(client, auth_token):
+    task_id = _bulk_create(client, auth_token, [{"title": "С комментариями", "author_id": 2, "executor_id": 4}])[0]
+    for text in ("Первый", "Второй"):
+        client.post(f"/api/tasks/{task_id}/comments", json={"text": text, "author_id": 3})
+
+    resp = client.get(f"/api/tasks/{task_id}?include=comments,files,users")
+    assert resp.status_code == 200 and "ETag" not in resp.headers
+    data = resp.get_json()
+    separate = client.get(f"/api/tasks/{task_id}/comments").get_json()["comments"]
+    assert data["task"]["comments"] == separate
+    assert [c["text"] for c in separate] == ["Первый", "Второй"]
+    assert data["task"]["files"] == client.get(f"/api/tasks/{task_id}/files").get_json()["files"] == []
+    assert [u["id"] for u in data["users"]] == [2, 3, 4]
+    assert "password_hash" not in data["users"][0]
+
+    # без include — как раньше, и кэш деталей не испорчен встраиванием
+    plain = client.get(f"/api/tasks/{task_id}").get_json()["task"]
+    assert "comments" not in plain and "files" not in plain
+
+    assert client.get(f"/api/tasks/{task_id}?include=comments,secrets").status_code == 400
+
+
+def test_task_list_include_has_no_n_plus_one(client, auth_token, monkeypatch):
+    import app as app_module
+    calls = []
+    for name in ("get_comments_for_tasks", "get_task_files_for_tasks", "get_users_by_ids"):
+        original = getattr(app_module.storage, name)
+        monkeypatch.setattr(app_module.storage, name,
+                            lambda ids, _f=original, _n=name: calls.append(_n) or _f(ids))
+    monkeypatch.setattr(app_module.storage, "get_comments_by_task", _fail)
+    monkeypatch.setattr(app_module.storage, "get_task_files_for_task", _fail)
+
+    data = client.get("/api/tasks?limit=20&include=comments,files,users").get_json()
+    assert len(data["tasks"]) > 1
+    assert sorted(calls) == ["get_comments_for_tasks", "get_task_files_for_tasks", "get_users_by_ids"]
+    monkeypatch.undo()
+
+    for task in data["tasks"]:
+        assert task["comments"] == client.get(f"/api/tasks/{task['id']}/comments").get_json()["comments"]
+    user_ids = {u["id"] for u in data["users"]}
+    assert {t["author_id"] for t in data["tasks"]} <= user_ids
+
+    # без include — прежний ответ с ETag
+    plain = client.get("/api/tasks?limit=20")
+    assert "ETag" in plain.headers and "comments" not in plain.get_json()["tasks"][0]
+
+
+# ===== ?fields= (ТОЛЬКО НУЖНЫЕ ПОЛЯ) =====
+
+def test_task_list_fields(client):
+    full = client.get("/api/tasks?limit=3").get_json()
+    narrow = client.get("/api/tasks?limit=3&fields=status,title").get_json()
+
+    # id и created_at (ключ курсора) — всегда
+    assert set(narrow["tasks"][0]) == {"id", "title", "status", "created_at"}
+    assert [t["id"] for t in narrow["tasks"]] == [t["id"] for t in full["tasks"]]
+    assert narrow["total"] == full["total"] and narrow["next_cursor"] == full["next_cursor"]
+
+    # набор полей — часть ключа кэша: полный список после узкого не "обрезан"
+    again = client.get("/api/tasks?limit=3").get_json()
+    assert again["tasks"] == full["tasks"]
+
+    names = client.get("/api/tasks?limit=3&fields=author_name").get_json()["tasks"]
+    assert names[0]["author_name"] == full["tasks"][0]["author_name"]
+
+    # include=users — авторы и исполнители, даже если их id не запрошены
+    data = client.get("/api/tasks?limit=3&fields=id,title&include=users").get_json()
+    assert set(data["tasks"][0]) == {"id", "title", "author_id", "executor_id", "created_at"}
+    user_ids = {u["id"] for u in data["users"]}
+    assert {t["author_id"] for t in full["tasks"]} <= user_ids
+    assert {t["executor_id"] for t in full["tasks"]} - {None} <= user_ids
+
+    resp = client.get("/api/tasks?fields=title,password_hash")
+    assert resp.status_code == 400 and "password_hash" in resp.get_json()["error"]
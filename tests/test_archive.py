@@ -0,0 +1,132 @@
+# tests/test_archive.py
+import io
+import os
+import sys
+import sqlite3
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+import maintenance
+from app import app
+
+# архив задач есть только у SQLite
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture
+def archive_db(tmp_path):
+    old_name = database.DB_NAME
+    database.DB_NAME = str(tmp_path / "archive.db")
+    database.init_db()
+    database.add_test_data()
+    maintenance.ARCHIVE_METRICS.clear()
+    yield database.DB_NAME
+    maintenance.ARCHIVE_METRICS.clear()
+    database.close_writer()
+    database.close_pool()
+    database.close_read_pool()
+    database.DB_NAME = old_name
+
+
+@pytest.fixture
+def client(archive_db):
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+def _make_task(db_name, title, status, days_ago):
+    task_id = database.create_task(title, "", author_id=2)
+    conn = sqlite3.connect(db_name)
+    conn.execute(
+        "UPDATE tasks SET status = ?, updated_at = DATETIME('now', 'localtime', ?) WHERE id = ?",
+        (status, f"-{days_ago} days", task_id),
+    )
+    conn.commit()
+    conn.close()
+    return task_id
+
+
+def test_archive_moves_only_old_closed_tasks(archive_db):
+    old_done = _make_task(archive_db, "Старая выполненная", "выполнена", 400)
+    old_cancelled = _make_task(archive_db, "Старая отменённая", "отменена", 400)
+    recent_done = _make_task(archive_db, "Свежая выполненная", "выполнена", 1)
+    old_open = _make_task(archive_db, "Старая открытая", "в процессе", 400)
+    comment_id = database.add_comment(old_done, 3, "Комментарий к старой")
+    database.save_task_file(old_done, "stored.bin", "file.bin", "application/octet-stream", 10, uploader_id=2)
+    users_before = database.get_active_users(limit=100)
+
+    moved = maintenance.archive_old_tasks(older_than_days=30, batch_size=1)
+    assert moved == 2
+
+    hot_ids = {t["id"] for t in database.get_all_tasks(limit=-1)}
+    assert {recent_done, old_open} <= hot_ids
+    assert not {old_done, old_cancelled} & hot_ids
+
+    # чтение по id прозрачно уходит в архив — вместе с комментариями и файлами
+    task = database.get_task_by_id(old_done)
+    assert task["title"] == "Старая выполненная" and task["archived"] is True
+    assert [c["id"] for c in database.get_comments_by_task(old_done)] == [comment_id]
+    assert database.get_task_files_for_task(old_done)[0]["original_name"] == "file.bin"
+
+    # активность пользователей включает архив; остальные счётчики сходятся
+    assert database.get_active_users(limit=100) == users_before
+    assert database.check_counters() == {table: 0 for table in database.COUNTER_TABLES}
+    assert maintenance.run_archive()["moved"] == 0
+
+
+def test_list_include_archived(client, archive_db):
+    old_done = _make_task(archive_db, "Архивная для списка", "выполнена", 400)
+    total_before = client.get("/api/tasks").get_json()["total"]
+    maintenance.archive_old_tasks(older_than_days=30)
+
+    data = client.get("/api/tasks?limit=1000").get_json()
+    assert old_done not in [t["id"] for t in data["tasks"]]
+    assert data["total"] == total_before - 1
+
+    data = client.get("/api/tasks?limit=1000&include_archived=1").get_json()
+    archived = [t for t in data["tasks"] if t["id"] == old_done]
+    assert archived and archived[0]["archived"] is True
+    assert data["total"] == total_before
+    assert all(t["archived"] is False for t in data["tasks"] if t["id"] != old_done)
+
+    data = client.get("/api/tasks?status=выполнена&include_archived=1&limit=1000").get_json()
+    assert old_done in [t["id"] for t in data["tasks"]]
+
+
+def test_archived_task_is_read_only(client, archive_db):
+    old_done = _make_task(archive_db, "Только чтение", "выполнена", 400)
+    maintenance.archive_old_tasks(older_than_days=30)
+    token = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    resp = client.get(f"/api/tasks/{old_done}")
+    assert resp.status_code == 200 and resp.get_json()["task"]["archived"] is True
+    assert client.put(f"/api/tasks/{old_done}", json={"title": "x"}, headers=headers).status_code == 409
+    assert client.delete(f"/api/tasks/{old_done}", headers=headers).status_code == 409
+    resp = client.post(f"/api/tasks/{old_done}/comments", json={"text": "x", "author_id": 2}, headers=headers)
+    assert resp.status_code == 409
+
+
+def test_archived_task_files_downloadable(client, archive_db):
+    old_done = _make_task(archive_db, "С файлом", "выполнена", 400)
+    token = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    resp = client.post(
+        f"/api/tasks/{old_done}/files",
+        data={"files": (io.BytesIO(b"archived file"), "report.txt")},
+        headers=headers,
+        content_type="multipart/form-data",
+    )
+    file_id = resp.get_json()["files"][0]["id"]
+    assert maintenance.archive_old_tasks(older_than_days=30) == 1
+
+    assert database.get_task_file(file_id)["archived"] is True
+    assert [f["id"] for f in client.get(f"/api/tasks/{old_done}/files").get_json()["files"]] == [file_id]
+    resp = client.get(f"/api/files/{file_id}/download")
+    assert resp.status_code == 200 and resp.data == b"archived file"
+    assert "report.txt" in resp.headers["Content-Disposition"]
+    resp.close()
+    # файлы архивной задачи — только для чтения
+    assert client.delete(f"/api/files/{file_id}", headers=headers).status_code == 409
@@ -0,0 +1,143 @@
+# tests/test_db_pool.py
+import os
+import sys
+import sqlite3
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from db_pool import ConnectionPool, PoolTimeoutError
+
+
+@pytest.fixture
+def pool(tmp_path):
+    p = ConnectionPool(str(tmp_path / "pool.db"), max_size=2, timeout=0.2)
+    yield p
+    p.close()
+
+
+def test_pool_reuses_connection_in_same_thread(pool):
+    conn1 = pool.checkout()
+    pool.checkin(conn1)
+    conn2 = pool.checkout()
+    assert conn2 is conn1
+    pool.checkin(conn2)
+    assert pool.stats()["created"] == 1
+
+
+def test_pool_max_size_timeout(pool):
+    a = pool.checkout()
+    b = pool.checkout()
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout()
+
+    # как только соединение вернули — ждущий поток его получает
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.checkout()))
+    pool.timeout = 2
+    t.start()
+    pool.checkin(a)
+    t.join()
+    assert got == [a]
+    pool.checkin(got[0])
+    pool.checkin(b)
+
+
+def test_pool_replaces_broken_connection(pool):
+    pool.health_check_interval = 0
+    conn = pool.checkout()
+    pool.checkin(conn)
+    conn.close()  # "ломаем" соединение, пока оно лежит в пуле
+
+    fresh = pool.checkout()
+    assert fresh is not conn
+    assert fresh.execute("SELECT 1").fetchone()[0] == 1
+    pool.checkin(fresh)
+    assert pool.stats()["discarded"] == 1
+
+
+def test_pool_rolls_back_on_checkin(pool):
+    conn = pool.checkout()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    pool.checkin(conn)  # без commit
+
+    conn = pool.checkout()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.checkin(conn)
+
+
+def test_get_db_uses_pool():
+    pool = database.get_pool()
+    before = pool.stats()["created"]
+    for _ in range(5):
+        database.get_user_by_id(1)
+    # новые соединения не открываются — используется тёплое из пула
+    assert pool.stats()["created"] == max(before, 1)
+
+    conn = database.get_connection()
+    conn.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+
+@pytest.fixture
+def wal_db(tmp_path):
+    old_name = database.DB_NAME
+    database.DB_NAME = str(tmp_path / "wal.db")
+    database.init_db()
+    database.add_test_data()
+    yield database.DB_NAME
+    database.close_pool()
+    database.close_read_pool()
+    database.close_writer()
+    database.DB_NAME = old_name
+
+
+def test_read_pool_is_read_only(wal_db):
+    conn = sqlite3.connect(wal_db)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+    with database.get_read_db() as cursor:
+        assert cursor.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            cursor.execute("DELETE FROM tasks")
+    assert database.get_read_pool().stats()["created"] == 1
+
+
+def test_long_read_does_not_block_writer(wal_db):
+    # открытая читающая транзакция держит свой снимок БД...
+    pool = database.get_read_pool()
+    reader = pool.checkout()
+    try:
+        reader.execute("BEGIN")
+        before = reader.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+        # ...а запись при этом проходит без ожидания
+        database.create_task("Запись во время чтения", "", author_id=1)
+        assert reader.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == before
+        reader.rollback()
+
+        assert reader.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == before + 1
+    finally:
+        pool.checkin(reader)
+
+
+def test_read_inside_request_transaction_sees_own_writes(wal_db):
+    from app import app
+
+    task_id = database.create_task("Задача", "", author_id=1)
+    with app.app_context():
+        database.begin_request_session()
+        try:
+            # записи запроса идут в его транзакцию, а чтение должно её видеть,
+            # хотя она ещё не закоммичена
+            database.update_task(task_id, title="Изменено в транзакции")
+            assert database.get_task_by_id(task_id)["title"] == "Изменено в транзакции"
+        finally:
+            database.end_request_session(commit=False)
+
+    assert database.get_task_by_id(task_id)["title"] == "Задача"
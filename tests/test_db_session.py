@@ -0,0 +1,97 @@
+# tests/test_db_session.py
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from app import app, storage
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def admin_token(client):
+    resp = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"})
+    assert resp.status_code == 200
+    return resp.get_json()["token"]
+
+
+def _trace_pool_connection():
+    """Включаем трассировку SQL на "тёплом" соединении пула текущего потока."""
+    statements = []
+    pool = database.get_pool()
+    conn = pool.checkout()
+    conn.set_trace_callback(statements.append)
+    pool.checkin(conn)
+    return statements, conn
+
+
+@pytest.mark.sqlite_only
+def test_update_task_single_commit(client, admin_token):
+    resp = client.post(
+        "/api/tasks",
+        json={"title": "Задача для сессии", "author_id": 2},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    task_id = resp.get_json()["task"]["id"]
+
+    writer = database.get_writer()
+    commits_before = writer.stats()["commits"]
+    statements, conn = _trace_pool_connection()
+    try:
+        resp = client.put(
+            f"/api/tasks/{task_id}",
+            json={"status": "в процессе"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+    finally:
+        conn.set_trace_callback(None)
+
+    assert resp.status_code == 200
+    assert resp.get_json()["task"]["status"] == "в процессе"
+    # записи запроса — одна единица работы писателя: один COMMIT пачки,
+    # на соединении пула (чтения запроса) — ни одного
+    assert writer.stats()["commits"] - commits_before == 1
+    assert not [s for s in statements if s.strip().upper() == "COMMIT"]
+
+
+def test_handler_exception_rolls_back(client, admin_token):
+    resp = client.post(
+        "/api/tasks",
+        json={"title": "Задача для отката", "author_id": 2},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    task_id = resp.get_json()["task"]["id"]
+
+    original = app.view_functions["update_task"]
+
+    def failing_update(task_id):
+        storage.update_task(task_id, title="Не должно сохраниться")
+        raise RuntimeError("boom")
+
+    app.view_functions["update_task"] = failing_update
+    try:
+        with pytest.raises(RuntimeError):
+            client.put(
+                f"/api/tasks/{task_id}",
+                json={"title": "x"},
+                headers={"Authorization": f"Bearer {admin_token}"},
+            )
+    finally:
+        app.view_functions["update_task"] = original
+
+    assert storage.get_task_by_id(task_id)["title"] == "Задача для отката"
+
+
+@pytest.mark.sqlite_only
+def test_outside_request_functions_autocommit():
+    # вне HTTP-запроса функции database.py коммитят сами, как раньше
+    comment_id = database.add_comment(1, 1, "Комментарий вне запроса")
+    assert database.get_comment_by_id(comment_id)["text"] == "Комментарий вне запроса"
+    assert database.delete_comment(comment_id) is True
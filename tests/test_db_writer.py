@@ -0,0 +1,145 @@
+# tests/test_db_writer.py
+import os
+import sys
+import sqlite3
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from db_writer import SingleWriter
+
+
+@pytest.fixture
+def writer(tmp_path):
+    db = str(tmp_path / "writer.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT UNIQUE)")
+    conn.commit()
+    conn.close()
+    w = SingleWriter(db, max_wait=0.01)
+    yield w
+    w.close()
+
+
+def _insert(cursor, value):
+    cursor.execute("INSERT INTO items (value) VALUES (?)", (value,))
+    return cursor.lastrowid
+
+
+def test_writer_groups_concurrent_writes(writer):
+    futures = [writer.submit(_insert, f"v{i}") for i in range(50)]
+    ids = [f.result(5) for f in futures]
+    assert len(set(ids)) == 50
+    stats = writer.stats()
+    assert stats["jobs"] == 50
+    assert stats["commits"] < 50  # записи ушли пачками
+
+
+def test_writer_failed_job_does_not_break_batch(writer):
+    writer.execute(_insert, "dup")
+    futures = [
+        writer.submit(_insert, "ok-1"),
+        writer.submit(_insert, "dup"),  # UNIQUE constraint failed
+        writer.submit(_insert, "ok-2"),
+    ]
+    assert futures[0].result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(5)
+    assert futures[2].result(5)
+
+    check = sqlite3.connect(writer.database)
+    values = {row[0] for row in check.execute("SELECT value FROM items")}
+    check.close()
+    assert {"dup", "ok-1", "ok-2"} <= values
+
+
+def test_concurrent_comments_without_lock_errors():
+    errors = []
+    ids = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                ids.append(database.add_comment(1, 1, f"Параллельный комментарий {n}-{i}"))
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(set(ids)) == 160
+    for comment_id in ids:
+        database.delete_comment(comment_id)
+
+
+def _values(writer):
+    check = sqlite3.connect(writer.database)
+    values = {row[0] for row in check.execute("SELECT value FROM items")}
+    check.close()
+    return values
+
+
+def test_unit_of_work_commits_with_batch(writer):
+    unit = writer.begin_unit()
+    unit.conn.execute("INSERT INTO items (value) VALUES ('unit')")
+    # пока соединение у единицы, остальные записи ждут в очереди
+    queued = writer.submit(_insert, "queued")
+    assert not queued.done()
+    assert "unit" not in _values(writer)
+
+    unit.finish(commit=True)
+    assert queued.result(5)
+    assert {"unit", "queued"} <= _values(writer)
+
+
+def test_unit_of_work_rollback_keeps_other_writes(writer):
+    before = writer.submit(_insert, "before")
+    unit = writer.begin_unit()
+    unit.conn.execute("INSERT INTO items (value) VALUES ('rolled-back')")
+    unit.finish(commit=False)
+    writer.execute(_insert, "after")
+
+    assert before.result(5)
+    values = _values(writer)
+    assert {"before", "after"} <= values and "rolled-back" not in values
+
+
+def test_concurrent_requests_go_through_writer():
+    from app import app
+
+    writer = database.get_writer()
+    commits_before = writer.stats()["commits"]
+    errors = []
+    ids = []
+
+    def request(n):
+        # как HTTP-запрос: сессия, две записи, commit в конце
+        with app.test_request_context():
+            database.begin_request_session()
+            try:
+                comment_id = database.add_comment(1, 1, f"Комментарий из запроса {n}")
+                database.update_comment(comment_id, f"Правка из запроса {n}")
+                ids.append(comment_id)
+                database.end_request_session(commit=True)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+                database.end_request_session(commit=False)
+
+    threads = [threading.Thread(target=request, args=(n,)) for n in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(set(ids)) == 40
+    assert database.get_comment_by_id(ids[0])["text"].startswith("Правка из запроса")
+    # запросы коммитятся общими пачками писателя, а не каждый сам
+    assert writer.stats()["commits"] - commits_before < 40
+    for comment_id in ids:
+        database.delete_comment(comment_id)
@@ -0,0 +1,124 @@
+# tests/test_json_provider.py
+# Весь набор тестов гоняется под любым провайдером:
+#   TM_JSON_PROVIDER=stdlib python -m pytest -q
+#   TM_JSON_PROVIDER=orjson python -m pytest -q
+import os
+import sqlite3
+import sys
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import json_provider
+from app import app
+from cache import TASK_DETAIL_CACHE, invalidate_task_list_cache
+from json_provider import RecordJSONProvider, create_json_provider
+from records import TaskRecord
+
+COMPACT = {"separators": (",", ":")}
+
+
+@dataclass
+class Point:
+    x: int
+    label: str
+
+
+@pytest.fixture
+def providers():
+    pytest.importorskip("orjson")
+    return RecordJSONProvider(app), json_provider.OrjsonJSONProvider(app)
+
+
+def _records():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.execute("SELECT 1 AS id, 'Задача «один»' AS title, NULL AS due_date")
+    cursor.row_factory = TaskRecord.row_factory(cursor)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def _payload():
+    return {
+        "title": "Кириллица, ё и эмодзи 🚀",
+        "escapes": "кавычки \" слэш \\ / перевод\nстроки \t \x00  ",
+        "none": None,
+        "flags": [True, False],
+        "numbers": [0, -1, 2 ** 63 - 1, 0.5, 12.3, -0.0],
+        "created": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "day": date(2024, 5, 1),
+        "tasks": _records(),
+        "decimal": Decimal("10.50"),
+        "uuid": uuid.UUID(int=1),
+        "point": Point(1, "тчк"),
+        "nested": {"я": {"b": [], "a": {}}, "z": ("кортеж", 1)},
+    }
+
+
+def test_providers_produce_identical_output(providers):
+    stdlib, fast = providers
+    payload = _payload()
+    assert fast.dumps(payload, **COMPACT) == stdlib.dumps(payload, **COMPACT)
+    assert fast.dumps(payload) == stdlib.dumps(payload)
+    assert fast.loads(fast.dumps(payload, **COMPACT))["tasks"] == [{"id": 1, "title": "Задача «один»", "due_date": None}]
+
+    # кириллица как есть, ключи по алфавиту, даты — как у Flask
+    text = fast.dumps(payload, **COMPACT)
+    assert "Кириллица" in text and "\\u041a" not in text
+    assert text.index('"created"') < text.index('"day"') < text.index('"decimal"')
+    assert '"created":"Wed, 01 May 2024 12:30:00 GMT"' in text
+
+    # что orjson не умеет — тот же результат через stdlib
+    for odd in ({1: "a", 2: "b", 10: "c"}, {"big": 2 ** 70}, {True: 1, False: 2}):
+        assert fast.dumps(odd, **COMPACT) == stdlib.dumps(odd, **COMPACT)
+
+    for provider in providers:
+        with pytest.raises(TypeError):
+            provider.dumps({"bad": object()}, **COMPACT)
+
+
+def test_providers_identical_responses(providers):
+    stdlib, fast = providers
+    with app.test_request_context():
+        for args in ((_payload(),), ([1, "два"],), ()):
+            a, b = stdlib.response(*args), fast.response(*args)
+            assert a.get_data() == b.get_data() and a.mimetype == b.mimetype
+        assert fast.response(ok=True).get_data() == b'{"ok":true}\n'
+
+        # режим отладки — красивый вывод, тоже одинаковый
+        app.debug = True
+        try:
+            assert stdlib.response(_payload()).get_data() == fast.response(_payload()).get_data()
+        finally:
+            app.debug = False
+
+
+def test_api_responses_match_between_providers(providers):
+    stdlib, fast = providers
+    current = app.json
+    bodies = {}
+    try:
+        for provider in providers:
+            app.json = provider
+            # кэш ответов хранит готовые байты — без него сравнивается именно сериализация
+            invalidate_task_list_cache()
+            TASK_DETAIL_CACHE.clear()
+            with app.test_client() as client:
+                bodies[provider.name] = [
+                    client.get(url).data for url in ("/api/tasks?limit=50&page=2", "/api/tasks/1", "/api/users")
+                ]
+    finally:
+        app.json = current
+    assert bodies["stdlib"] == bodies["orjson"]
+
+
+def test_create_json_provider():
+    assert create_json_provider(app, "stdlib").name == "stdlib"
+    expected = "orjson" if json_provider.orjson is not None else "stdlib"
+    assert create_json_provider(app, "auto").name == expected
+    with pytest.raises(ValueError):
+        create_json_provider(app, "ujson")
@@ -0,0 +1,121 @@
+# tests/test_maintenance.py
+import os
+import sys
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+import maintenance
+from app import app
+
+# токены — в файле SQLite (sqlite3 напрямую); PostgreSQL — в test_repository.py
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture
+def tokens_db(tmp_path):
+    old_name = database.DB_NAME
+    database.DB_NAME = str(tmp_path / "tokens.db")
+    database.init_db()
+    database.add_test_data()
+    maintenance.TOKEN_METRICS.clear()
+    yield database.DB_NAME
+    maintenance.TOKEN_METRICS.clear()
+    database.close_writer()
+    database.close_pool()
+    database.close_read_pool()
+    database.DB_NAME = old_name
+
+
+def _insert_tokens(db_name, count, expires_at):
+    conn = sqlite3.connect(db_name)
+    conn.executemany(
+        "INSERT INTO auth_tokens (token, user_id, expires_at) VALUES (?, 1, ?)",
+        ((f"tok-{expires_at}-{i}", expires_at) for i in range(count)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_sweep_deletes_expired_in_batches(tokens_db):
+    past = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    future = (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    _insert_tokens(tokens_db, 2500, past)
+    _insert_tokens(tokens_db, 10, future)
+
+    pauses = []
+    deleted = maintenance.sweep_expired_tokens(batch_size=1000, sleep=pauses.append)
+    assert deleted == 2500
+    assert len(pauses) == 2  # пачки 1000 + 1000 + 500
+
+    size = database.get_auth_tokens_size()
+    assert size["rows"] == 10 and size["expired"] == 0
+
+
+def test_sweep_delete_uses_expires_index(tokens_db):
+    conn = sqlite3.connect(tokens_db)
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT rowid FROM auth_tokens WHERE expires_at < ? ORDER BY expires_at LIMIT ?",
+        ("2024-01-01 00:00:00", 1000),
+    ))
+    conn.close()
+    assert "idx_auth_tokens_expires" in plan, plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_metrics_in_admin_stats(tokens_db):
+    past = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    _insert_tokens(tokens_db, 5, past)
+    sample = maintenance.run_token_sweep()
+    assert sample["deleted"] == 5 and sample["expired"] == 0
+
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        token = client.post("/auth/login", json={"email": "admin@mail.ru", "password": "123456"}).get_json()["token"]
+        data = client.get("/admin/stats", headers={"Authorization": f"Bearer {token}"}).get_json()
+    history = data["maintenance"]["auth_tokens"]["history"]
+    assert history[-1]["deleted"] == 5
+    assert history[-1]["rows"] == 0
+
+
+def test_sweeper_loop_survives_errors(tokens_db, monkeypatch):
+    stop = threading.Event()
+    calls = []
+
+    def failing_sweep():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        stop.set()
+
+    monkeypatch.setattr(maintenance, "run_token_sweep", failing_sweep)
+    maintenance.token_sweeper_loop(interval=0, stop_event=stop, sleep=lambda _: None)
+    assert len(calls) == 2
+
+
+def test_background_jobs_start_once(monkeypatch):
+    import app as app_module
+
+    started = []
+    monkeypatch.setattr(app_module.socketio, "start_background_task",
+                        lambda target, **kwargs: started.append(target))
+    monkeypatch.setattr(app_module, "_background_jobs_started", False)
+    assert app_module.start_background_jobs() is True
+    assert app_module.start_background_jobs() is False
+    assert set(started) == {
+        maintenance.token_sweeper_loop, maintenance.archiver_loop, maintenance.task_changes_compactor_loop,
+    }
+    assert len(started) == len(set(started))
+
+
+def test_manage_sweep_tokens(tokens_db, capsys):
+    import manage
+
+    expired = (datetime.now() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    _insert_tokens(tokens_db, 3, expired)
+    manage.main(["--db", tokens_db, "sweep-tokens"])
+    out = capsys.readouterr().out
+    assert "Удалено протухших токенов: 3" in out and "протухших — 0" in out
@@ -0,0 +1,192 @@
+# tests/test_migrations.py
+import os
+import sys
+import sqlite3
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from migrations import MIGRATIONS, TASK_INSERT_GUARD, get_schema_version, run_migrations
+
+
+@pytest.fixture(scope="module")
+def fresh_db(tmp_path_factory):
+    """Отдельная БД с тестовыми данными — план запросов не зависит от рабочей."""
+    old_name = database.DB_NAME
+    database.DB_NAME = str(tmp_path_factory.mktemp("plan") / "plan.db")
+    database.init_db()
+    database.add_test_data()
+    yield database.DB_NAME
+    database.close_pool()
+    database.close_read_pool()
+    database.DB_NAME = old_name
+
+
+def _captured_sql(func, *args, **kwargs):
+    """Выполнить функцию database.py и вернуть последний SELECT (с подставленными параметрами)."""
+    statements = []
+    # записи — мимо потока-писателя, чтобы их SQL тоже попал в трассировку
+    writer_enabled, database.DB_WRITER_ENABLED = database.DB_WRITER_ENABLED, False
+    # чтения идут через read-only пул, записи — через основной
+    traced = []
+    for pool in (database.get_pool(), database.get_read_pool()):
+        conn = pool.checkout()
+        conn.set_trace_callback(statements.append)
+        pool.checkin(conn)
+        traced.append(conn)
+    try:
+        func(*args, **kwargs)
+    finally:
+        database.DB_WRITER_ENABLED = writer_enabled
+        for conn in traced:
+            conn.set_trace_callback(None)
+    selects = [s for s in statements if s.lstrip().upper().startswith(("SELECT", "DELETE"))]
+    assert selects, "функция не выполнила ни одного запроса"
+    return selects[-1]
+
+
+def _plan(db_name, sql, params=()):
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    finally:
+        conn.close()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_migrations_recorded_and_idempotent(fresh_db):
+    conn = sqlite3.connect(fresh_db)
+    try:
+        assert get_schema_version(conn) == MIGRATIONS[-1][0]
+        assert run_migrations(conn) == []  # повторный запуск ничего не делает
+    finally:
+        conn.close()
+
+
+def test_migrations_upgrade_existing_db(tmp_path):
+    # "старая" БД без индексов и без schema_version
+    db = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT, description TEXT, status TEXT, priority TEXT, "
+                 "author_id INTEGER, executor_id INTEGER, due_date TEXT, created_at TEXT, updated_at TEXT)")
+    conn.execute("CREATE TABLE comments (id INTEGER PRIMARY KEY, task_id INTEGER, author_id INTEGER, text TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.execute("CREATE TABLE auth_tokens (token TEXT PRIMARY KEY, user_id INTEGER, expires_at TEXT)")
+    conn.execute("CREATE TABLE task_files (id INTEGER PRIMARY KEY, task_id INTEGER, uploaded_at TEXT)")
+    conn.commit()
+
+    assert 1 in run_migrations(conn)
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert "idx_tasks_status_created" in names
+    assert "idx_comments_task_created" in names
+
+
+@pytest.mark.parametrize("filters, index", [
+    (None, "idx_tasks_created_at"),
+    ({"status": "в процессе"}, "idx_tasks_status_created"),
+    ({"priority": "высокий"}, "idx_tasks_priority_created"),
+    ({"author_id": 2}, "idx_tasks_author_created"),
+    ({"executor_id": 3}, "idx_tasks_executor_created"),
+    ({"due_date_after": "2024-12-01", "due_date_before": "2024-12-31"}, "idx_tasks_due_date"),
+])
+def test_get_all_tasks_uses_index(fresh_db, filters, index):
+    sql = _captured_sql(database.get_all_tasks, filters, 10, 0)
+    plan = _plan(fresh_db, sql)
+    assert index in plan, plan
+
+
+def test_get_all_tasks_cursor_seeks_by_index(fresh_db):
+    sql = _captured_sql(database.get_all_tasks, {"status": "к выполнению"}, 10, 0,
+                        after=("2100-01-01 00:00:00", 10))
+    plan = _plan(fresh_db, sql)
+    assert "idx_tasks_status_created" in plan, plan
+    assert "TEMP B-TREE" not in plan  # ни сортировки, ни пропуска строк
+
+
+def test_comments_by_task_uses_index(fresh_db):
+    sql = _captured_sql(database.get_comments_by_task, 1)
+    plan = _plan(fresh_db, sql)
+    assert "idx_comments_task_created" in plan, plan
+    assert "TEMP B-TREE" not in plan  # ORDER BY created_at берётся из индекса
+
+
+def test_comments_by_author_uses_index(fresh_db):
+    # последний запрос get_user_usage_counts — число комментариев пользователя
+    sql = _captured_sql(database.get_user_usage_counts, 3)
+    assert "FROM comments" in sql
+    plan = _plan(fresh_db, sql)
+    assert "idx_comments_author" in plan, plan
+
+
+def test_task_files_uses_index(fresh_db):
+    # у задачи должны быть файлы — иначе последним будет запрос к архиву
+    database.save_task_file(1, "stored.bin", "file.bin", "application/octet-stream", 10)
+    sql = _captured_sql(database.get_task_files_for_task, 1)
+    plan = _plan(fresh_db, sql)
+    assert "idx_task_files_task_uploaded" in plan, plan
+
+
+def test_auth_token_indexes(fresh_db):
+    sql = _captured_sql(database.delete_all_tokens_for_user, 3)
+    assert "idx_auth_tokens_user" in _plan(fresh_db, sql)
+
+    plan = _plan(fresh_db, "DELETE FROM auth_tokens WHERE expires_at < ?", ("2024-01-01 00:00:00",))
+    assert "idx_auth_tokens_expires" in plan, plan
+
+
+def test_active_users_reads_counters_by_index(fresh_db):
+    sql = _captured_sql(database.get_active_users, 10)
+    plan = _plan(fresh_db, sql)
+    assert "idx_user_activity_total" in plan, plan
+    assert "TEMP B-TREE" not in plan
+    assert "JOIN tasks" not in sql and "JOIN comments" not in sql
+
+
+def test_get_all_tasks_fields_skip_unneeded_joins(fresh_db):
+    sql = _captured_sql(database.get_all_tasks, {"status": "в процессе"}, 10, 0, fields=("title", "status"))
+    assert "users" not in sql and "description" not in sql
+    assert "idx_tasks_status_created" in _plan(fresh_db, sql)
+
+    sql = _captured_sql(database.get_all_tasks, None, 10, 0, fields=("executor_name",))
+    assert "u2" in sql and "u1" not in sql
+
+
+def test_task_insert_triggers_have_guard(fresh_db):
+    """Каждый INSERT-триггер tasks молчит при пакетной вставке и есть в пакетных запросах."""
+    conn = sqlite3.connect(fresh_db)
+    try:
+        triggers = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'tasks'"
+        ).fetchall())
+    finally:
+        conn.close()
+    insert_triggers = {
+        name: sql for name, sql in triggers.items()
+        if "AFTER INSERT ON TASKS" in " ".join(sql.split()).upper()
+    }
+    assert insert_triggers
+    for name, sql in insert_triggers.items():
+        assert TASK_INSERT_GUARD in sql, name
+    assert set(insert_triggers) == set(database.TASK_INSERT_TRIGGERS_BATCH_SQL)
+
+
+def test_bulk_insert_guards_triggers_without_ddl(fresh_db):
+    conn = sqlite3.connect(fresh_db)
+    try:
+        schema_before = conn.execute("PRAGMA schema_version").fetchone()[0]
+    finally:
+        conn.close()
+
+    count = database.BULK_BATCH_TRIGGERS_MIN + 5
+    ids = database.create_tasks_bulk([{"title": f"Флаг {i}", "author_id": 2} for i in range(count)])
+    assert ids == list(range(ids[0], ids[0] + count))
+    assert [database.get_task_by_id(i)["title"] for i in (ids[0], ids[-1])] == ["Флаг 0", f"Флаг {count - 1}"]
+    assert not any(database.check_counters().values())
+
+    conn = sqlite3.connect(fresh_db)
+    try:
+        assert conn.execute("PRAGMA schema_version").fetchone()[0] == schema_before
+        assert conn.execute("SELECT COUNT(*) FROM bulk_insert_guard").fetchone()[0] == 0
+    finally:
+        conn.close()
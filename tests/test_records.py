@@ -0,0 +1,53 @@
+# tests/test_records.py
+import json
+import os
+import sqlite3
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from app import app
+from records import CommentRecord, TaskRecord
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, title TEXT, archived INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", [(1, "Первая", 0), (2, "Вторая", 1)])
+    yield conn
+    conn.close()
+
+
+def test_record_reads_like_dict(conn):
+    cursor = conn.execute("SELECT id, title, archived FROM t ORDER BY id")
+    cursor.row_factory = TaskRecord.row_factory(cursor, {"archived": bool})
+    first, second = cursor.fetchall()
+
+    assert isinstance(first, TaskRecord)
+    assert first["title"] == "Первая" and first.get("missing") is None
+    assert "title" in first and "missing" not in first
+    assert list(first) == ["id", "title", "archived"]
+    assert dict(second) == {"id": 2, "title": "Вторая", "archived": True}
+    assert first == {"id": 1, "title": "Первая", "archived": False}
+    with pytest.raises(KeyError):
+        first["missing"]
+
+    # класс записи на набор колонок создаётся один раз
+    assert type(first) is type(second)
+    assert TaskRecord.for_columns(("id", "title", "archived")) is type(first)
+    assert CommentRecord.for_columns(("id", "title", "archived")) is not type(first)
+
+
+def test_task_list_json_matches_dicts():
+    tasks = database.get_all_tasks(limit=-1)
+    assert tasks and all(isinstance(t, TaskRecord) for t in tasks)
+
+    with app.app_context():
+        as_records = json.loads(app.json.dumps(tasks))
+    assert as_records == [dict(t) for t in tasks]
+
+    comments = database.get_comments_by_task(1)
+    assert comments and all(isinstance(c, CommentRecord) for c in comments)
+    assert comments[0]["author_name"]
@@ -0,0 +1,288 @@
+# tests/test_repository.py
+"""
+Один набор тестов на все хранилища (repository.py).
+
+PostgreSQL (фикстура postgres_dsn, conftest.py): берётся TM_TEST_POSTGRES_DSN,
+а если он не задан — поднимается временный локальный кластер (initdb + pg_ctl
+из PATH) и останавливается после тестов. Нет ни того, ни другого, или не
+установлен psycopg — тесты PostgreSQL пропускаются. Каждый тест — на своей
+пустой БД, рабочую БД приложения (TM_POSTGRES_DSN) они не трогают.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from repository import (
+    PostgresRepository, Repository, SQLiteRepository, UnsupportedByBackend, _pg_filters_sql, create_repository,
+)
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def repo(request, tmp_path):
+    if request.param == "sqlite":
+        old_name = database.DB_NAME
+        database.DB_NAME = str(tmp_path / "repo.db")
+        database.init_db()
+        repo = SQLiteRepository()
+        yield repo
+        repo.close()
+        database.DB_NAME = old_name
+    else:
+        dsn = request.getfixturevalue("fresh_postgres_db")(
+            request.getfixturevalue("postgres_dsn"), "tm_test_repository",
+        )
+        repo = PostgresRepository(dsn, max_size=4)
+        repo.init_schema()
+        yield repo
+        repo.close()
+
+
+@pytest.fixture
+def users(repo):
+    """(admin_id, user_id)"""
+    return (
+        repo.create_user("admin@test.ru", "Админ", "hash", role="admin"),
+        repo.create_user("user@test.ru", "Пользователь", "hash"),
+    )
+
+
+def test_users(repo, users):
+    admin_id, user_id = users
+    assert repo.create_user("admin@test.ru", "Дубль", "hash") is None
+
+    user = repo.get_user_by_id(user_id)
+    assert set(user) == {"id", "email", "username", "created_at", "role"}
+    assert user["role"] == "user"
+    assert repo.get_user_by_email("admin@test.ru")["password_hash"] == "hash"
+    assert [u["id"] for u in repo.get_all_users()] == [admin_id, user_id]
+
+    assert repo.update_user_role(user_id, "root") is False
+    assert repo.update_user_role(user_id, "admin") is True
+    assert repo.update_user_basic(user_id, {"username": "Новое имя"})["username"] == "Новое имя"
+    assert repo.get_user_usage_counts(user_id) == {"tasks_count": 0, "comments_count": 0}
+
+    assert repo.delete_user(user_id) is True
+    assert repo.get_user_by_id(user_id) is None
+
+
+def test_tasks(repo, users):
+    admin_id, user_id = users
+    first = repo.create_task("Первая", "описание", admin_id, executor_id=user_id, priority="высокий")
+    task = repo.get_task_by_id(first)
+    assert task["title"] == "Первая"
+    assert task["author_name"] == "Админ" and task["executor_name"] == "Пользователь"
+
+    bulk = repo.create_tasks_bulk([
+        {"title": f"Пачка {i}", "author_id": user_id, "status": "в процессе"} for i in range(3)
+    ])
+    assert len(bulk) == 3 and bulk == sorted(bulk) and first < bulk[0]
+    assert repo.get_task_by_id(bulk[1])["title"] == "Пачка 1"
+
+    assert repo.count_tasks() == 4
+    assert repo.count_tasks({"status": "в процессе"}) == 3
+    assert [t["id"] for t in repo.get_all_tasks({"author_id": user_id}, limit=-1)] == bulk[::-1]
+    assert len(repo.get_all_tasks(limit=2, offset=1)) == 2
+    assert repo.get_all_tasks(include_archived=True)[0]["archived"] is False
+    narrow = repo.get_all_tasks({"author_id": user_id}, limit=1, fields=("title", "executor_name"))
+    assert set(narrow[0]) == {"id", "title", "created_at", "executor_name"}
+
+    seq = repo.get_task_change_seq()["seq"]
+    assert repo.update_task(first, status="выполнена", title=None) is True
+    task = repo.get_task_by_id(first)
+    assert task["status"] == "выполнена" and task["rev"] == 1
+    assert repo.get_task_change_seq()["seq"] > seq
+    assert repo.update_task(first, unknown="x") is False
+
+    # admin может менять только свои задачи
+    assert repo.update_tasks_bulk({"priority": "низкий"}, ids=[first, bulk[0]], author_id=user_id) == [bulk[0]]
+    assert sorted(repo.update_tasks_bulk({"priority": "низкий"}, filters={"status": "в процессе"})) == bulk
+
+    stats = repo.get_task_stats()
+    assert stats["by_status"] == {"выполнена": 1, "в процессе": 3}
+    assert stats["by_priority"] == {"высокий": 1, "низкий": 3}
+    assert [u["id"] for u in repo.get_active_users(limit=2)] == [user_id, admin_id]
+
+    assert sorted(repo.delete_tasks_bulk(ids=bulk[:2])) == bulk[:2]
+    assert repo.delete_task(first) is True
+    assert repo.get_task_by_id(first) is None
+    assert repo.count_tasks() == 1
+
+
+def test_task_changes(repo, users):
+    admin_id, user_id = users
+    since = repo.get_task_change_seq()["seq"]
+    first = repo.create_task("Первая", "", admin_id)
+    bulk = repo.create_tasks_bulk([{"title": f"Пачка {i}", "author_id": user_id} for i in range(3)])
+    repo.update_task(first, title="Правка")
+    repo.delete_task(bulk[0])
+
+    result = repo.get_task_changes(since, limit=2)
+    assert result["has_more"] is True and len(result["changes"]) == 2
+    rest = repo.get_task_changes(result["seq"])
+    changes = {c["task_id"]: c for c in result["changes"] + rest["changes"]}
+    assert changes[first]["task"]["title"] == "Правка" and changes[first]["task"]["author_name"] == "Админ"
+    assert changes[bulk[0]]["op"] == "delete" and "task" not in changes[bulk[0]]
+    assert rest["seq"] == repo.get_task_change_seq()["seq"]
+    assert repo.get_task_changes(rest["seq"] + 1)["reset"] is True
+
+    # надгробие старше срока хранения — чистится, since до него — reset
+    assert repo.compact_task_changes(30, now=datetime.now() + timedelta(days=31)) == 1
+    assert repo.get_task_changes(since)["reset"] is True
+    assert repo.get_task_changes(rest["seq"])["reset"] is False
+
+
+def test_comments(repo, users):
+    admin_id, user_id = users
+    task_id = repo.create_task("С комментариями", "", admin_id)
+    first = repo.add_comment(task_id, user_id, "Первый")
+    second = repo.add_comment(task_id=task_id, author_id=admin_id, text="Второй")
+
+    comments = repo.get_comments_by_task(task_id)
+    assert [c["id"] for c in comments] == [first, second]
+    assert comments[0]["author_name"] == "Пользователь"
+
+    assert repo.update_comment(first, "") is False
+    assert repo.update_comment(first, "Исправлен") is True
+    assert repo.get_comment_by_id(first)["text"] == "Исправлен"
+    assert repo.get_user_usage_counts(user_id) == {"tasks_count": 0, "comments_count": 1}
+
+    other = repo.create_task("Без комментариев", "", admin_id)
+    batch = repo.get_comments_for_tasks([task_id, other])
+    assert [c["text"] for c in batch[task_id]] == ["Исправлен", "Второй"] and batch[other] == []
+    users = repo.get_users_by_ids([user_id, admin_id, None])
+    assert sorted(users) == sorted([admin_id, user_id]) and users[user_id]["username"] == "Пользователь"
+
+    assert repo.delete_comment(first) is True
+    assert repo.get_comment_by_id(first) is None
+
+
+def test_auth_tokens(repo, users):
+    admin_id, user_id = users
+    token = repo.create_auth_token(user_id)
+    assert repo.get_user_by_token(token)["id"] == user_id
+    assert repo.get_user_by_access_token(token)["email"] == "user@test.ru"
+    assert repo.get_user_by_token("нет такого") is None
+
+    new_token = repo.refresh_token(token)
+    assert new_token and new_token != token
+    assert repo.get_user_by_token(token) is None
+    assert repo.get_user_by_token(new_token)["id"] == user_id
+
+    other = repo.create_auth_token(admin_id)
+    assert repo.delete_access_token(other) is True
+    assert repo.delete_access_token(other) is False
+
+    repo.create_auth_token(user_id)
+    assert repo.get_auth_tokens_size()["rows"] == 2
+    # "через сутки" все токены протухли
+    assert repo.delete_expired_tokens(limit=1, now=datetime.utcnow() + timedelta(days=1)) == 1
+    assert repo.delete_all_tokens_for_user(user_id) == 1
+    assert repo.get_auth_tokens_size()["rows"] == 0
+
+
+def test_task_files(repo, users):
+    admin_id, _ = users
+    task_id = repo.create_task("С файлом", "", admin_id)
+    saved = repo.save_task_file(task_id, "abc.txt", "отчёт.txt", "text/plain", 42, uploader_id=admin_id)
+    assert saved["original_name"] == "отчёт.txt" and saved["size_bytes"] == 42
+
+    assert [f["id"] for f in repo.get_attachments_for_task(task_id)] == [saved["id"]]
+    assert repo.get_attachment_by_id(saved["id"])["stored_name"] == "abc.txt"
+    assert repo.get_task_files_for_tasks([task_id])[task_id][0]["id"] == saved["id"]
+    assert repo.delete_attachment(saved["id"]) is True
+    assert repo.get_attachment_by_id(saved["id"]) is None
+    assert repo.get_task_files_for_task(task_id) == []
+
+
+def test_request_transaction(repo, users):
+    from app import app
+
+    _, user_id = users
+    task_id = repo.create_task("До запроса", "", user_id)
+
+    # внутри запроса — одна транзакция: ошибка обработчика откатывает всё
+    with app.test_request_context():
+        database.begin_request_session()
+        repo.update_task(task_id, title="В запросе")
+        # обработанный IntegrityError не обрывает транзакцию запроса
+        assert repo.create_user("user@test.ru", "Дубль", "hash") is None
+        assert repo.get_task_by_id(task_id)["title"] == "В запросе"
+        database.end_request_session(commit=False)
+    assert repo.get_task_by_id(task_id)["title"] == "До запроса"
+
+    with app.test_request_context():
+        database.begin_request_session()
+        repo.update_task(task_id, title="Сохранено")
+        database.end_request_session(commit=True)
+    assert repo.get_task_by_id(task_id)["title"] == "Сохранено"
+
+
+def test_create_repository_from_config():
+    assert isinstance(create_repository("sqlite"), SQLiteRepository)
+    with pytest.raises(ValueError):
+        create_repository("mysql")
+    with pytest.raises(RuntimeError):
+        create_repository("postgres", dsn="")
+
+
+def test_unsupported_feature_returns_501(monkeypatch):
+    import app as app_module
+
+    def not_supported(*args, **kwargs):
+        raise UnsupportedByBackend("sqlite", "Полнотекстовый поиск")
+
+    def bug(*args, **kwargs):
+        raise NotImplementedError
+
+    app_module.app.config["TESTING"] = True
+    with app_module.app.test_client() as client:
+        monkeypatch.setattr(app_module.storage, "search_tasks", not_supported)
+        resp = client.get("/api/search?q=задача")
+        assert resp.status_code == 501
+        assert resp.get_json()["error"] == "Полнотекстовый поиск: не поддерживается хранилищем sqlite"
+
+        # NotImplementedError — недописанный код, а не ограничение хранилища: не 501
+        monkeypatch.setattr(app_module.storage, "search_tasks", bug)
+        with pytest.raises(NotImplementedError):
+            client.get("/api/search?q=задача")
+
+
+def test_unsupported_features_are_explicit(repo):
+    if repo.name == "sqlite":
+        pytest.skip("у SQLite есть всё")
+    for call in (
+        lambda: repo.search_tasks('"задача"*'),
+        lambda: repo.iter_tasks(),
+        lambda: repo.archive_closed_tasks(30),
+    ):
+        with pytest.raises(UnsupportedByBackend):
+            call()
+
+
+def test_incomplete_backend_fails_at_creation():
+    class Partial(Repository):
+        name = "partial"
+
+        def get_all_users(self):
+            return []
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+    assert not SQLiteRepository.__abstractmethods__
+    assert not PostgresRepository.__abstractmethods__
+
+
+def test_postgres_sql_without_server():
+    """SQL PostgreSQL-хранилища собирается без сервера: плейсхолдеры psycopg, те же фильтры."""
+    sql, params = _pg_filters_sql({"status": "готово", "executor_id": 0})
+    assert sql == " AND t.status = %s AND t.executor_id = %s" and params == ["готово", 0]
+
+    sql, params = PostgresRepository._bulk_target_sql(ids=[1, 2], filters={"priority": "высокий"}, author_id=3)
+    assert sql == " WHERE 1=1 AND t.id = ANY(%s) AND t.priority = %s AND t.author_id = %s"
+    assert params == [[1, 2], "высокий", 3]
+
+    sql, params = PostgresRepository._task_updates({"title": "Новое", "rev": 5, "due_date": None})
+    assert (sql, params) == ("title = %s", ["Новое"])
@@ -0,0 +1,64 @@
+# tests/test_storage_profiles.py
+import os
+import sys
+import sqlite3
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+from storage_profiles import STORAGE_PROFILES, apply_profile, get_profile
+
+
+def _pragmas(conn):
+    return {
+        name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+    }
+
+
+@pytest.mark.parametrize("name", list(STORAGE_PROFILES))
+def test_apply_profile(tmp_path, name):
+    conn = sqlite3.connect(str(tmp_path / "profile.db"))
+    apply_profile(conn, name)
+    profile = STORAGE_PROFILES[name]
+    pragmas = _pragmas(conn)
+    conn.close()
+
+    assert pragmas["journal_mode"] == profile["journal_mode"].lower()
+    # synchronous / temp_store SQLite отдаёт числами
+    assert pragmas["synchronous"] == {"OFF": 0, "NORMAL": 1, "FULL": 2}[profile["synchronous"]]
+    assert pragmas["temp_store"] == {"DEFAULT": 0, "FILE": 1, "MEMORY": 2}[profile["temp_store"]]
+    assert pragmas["cache_size"] == profile["cache_size"]
+    assert pragmas["busy_timeout"] == profile["busy_timeout"]
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        get_profile("turbo")
+
+
+def test_profile_applied_to_all_connections(tmp_path):
+    old_name, old_profile = database.DB_NAME, database.STORAGE_PROFILE
+    database.DB_NAME = str(tmp_path / "profiled.db")
+    database.STORAGE_PROFILE = "throughput"
+    try:
+        database.init_db()
+        expected = STORAGE_PROFILES["throughput"]
+
+        with database.get_db() as cursor:
+            assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 0
+            assert cursor.execute("PRAGMA cache_size").fetchone()[0] == expected["cache_size"]
+
+        with database.get_read_db() as cursor:
+            assert cursor.execute("PRAGMA busy_timeout").fetchone()[0] == expected["busy_timeout"]
+            assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+        writer = database.get_writer()
+        assert writer.execute(
+            lambda cursor: cursor.execute("PRAGMA synchronous").fetchone()[0]
+        ) == 0
+    finally:
+        database.close_writer()
+        database.close_pool()
+        database.close_read_pool()
+        database.DB_NAME, database.STORAGE_PROFILE = old_name, old_profile
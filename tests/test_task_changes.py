@@ -0,0 +1,124 @@
+# tests/test_task_changes.py
+import os
+import sys
+import sqlite3
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+import database
+import maintenance
+from app import app
+
+
+@pytest.fixture
+def changes_db(app_storage):
+    maintenance.TASK_CHANGES_METRICS.clear()
+    yield app_storage
+    maintenance.TASK_CHANGES_METRICS.clear()
+
+
+@pytest.fixture
+def client(changes_db):
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+def _sync(client, copy, since, limit=100):
+    """Применить к локальной копии {id: task} все изменения после since."""
+    requests = 0
+    while True:
+        data = client.get(f"/api/tasks/changes?since={since}&limit={limit}").get_json()
+        requests += 1
+        assert data["reset"] is False
+        for change in data["changes"]:
+            if change["op"] == "upsert":
+                copy[change["task_id"]] = change["task"]
+            else:
+                copy.pop(change["task_id"], None)
+        since = data["seq"]
+        if not data["has_more"]:
+            return since, requests
+
+
+def _server_state(repo):
+    return {t["id"]: repo.get_task_by_id(t["id"]) for t in repo.get_all_tasks(limit=-1)}
+
+
+def _backdate_tombstones(repo):
+    sql = "UPDATE task_changes SET changed_at = '2000-01-01 00:00:00' WHERE op = 'delete'"
+    if repo.name == "postgres":
+        with repo.pool.connection() as conn:
+            conn.execute(sql)
+        return
+    conn = sqlite3.connect(database.DB_NAME)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_changes_keep_local_copy_in_sync(client, changes_db):
+    # новая БД: журнал полон с самого начала, since=0 — полная копия
+    copy = {}
+    since, requests = _sync(client, copy, 0, limit=2)
+    assert copy == _server_state(changes_db) and requests > 1
+
+    first = changes_db.create_task("Новая", "", 2)
+    changes_db.update_task(1, title="Правка", status="в процессе")
+    changes_db.update_task(1, priority="высокий")
+    changes_db.delete_task(2)
+    bulk = changes_db.create_tasks_bulk([{"title": f"Пачка {i}", "author_id": 3} for i in range(150)])
+    changes_db.update_tasks_bulk({"status": "выполнена"}, ids=bulk[:10])
+    changes_db.delete_tasks_bulk(ids=[first])
+
+    since, _ = _sync(client, copy, since, limit=1000)
+    assert copy == _server_state(changes_db)
+    assert since == changes_db.get_task_change_seq()["seq"]
+
+    # нечего отдавать — пустой ответ с тем же seq
+    data = client.get(f"/api/tasks/changes?since={since}").get_json()
+    assert data["changes"] == [] and data["seq"] == since
+
+
+def test_changes_proportional_to_change(client, changes_db):
+    since = changes_db.get_task_change_seq()["seq"]
+    changes_db.update_task(1, title="Раз")
+    changes_db.update_task(1, title="Два")
+    changes_db.delete_task(3)
+
+    data = client.get(f"/api/tasks/changes?since={since}").get_json()
+    # задача 1 менялась дважды — в журнале одна запись с последней версией
+    assert [(c["op"], c["task_id"]) for c in data["changes"]] == [("upsert", 1), ("delete", 3)]
+    assert data["changes"][0]["task"]["title"] == "Два"
+    assert "task" not in data["changes"][1]
+
+
+def test_changes_reset_after_compaction(client, changes_db):
+    since = changes_db.get_task_change_seq()["seq"]
+    changes_db.delete_task(1)
+    _backdate_tombstones(changes_db)
+
+    assert maintenance.run_task_changes_compaction()["deleted"] == 1
+    assert maintenance.get_maintenance_stats()["task_changes"]["last"]["deleted"] == 1
+
+    # надгробие задачи 1 почищено — отставший клиент перезагружает список
+    data = client.get(f"/api/tasks/changes?since={since}").get_json()
+    assert data["reset"] is True and data["changes"] == []
+    current = changes_db.get_task_change_seq()["seq"]
+    assert data["seq"] == current
+    assert client.get(f"/api/tasks/changes?since={current}").get_json()["reset"] is False
+    # since из "будущего" (другая БД) — тоже reset
+    assert client.get(f"/api/tasks/changes?since={current + 100}").get_json()["reset"] is True
+
+
+def test_compaction_keeps_recent_tombstones(changes_db):
+    changes_db.delete_task(1)
+    assert changes_db.compact_task_changes(older_than_days=30) == 0
+    assert changes_db.compact_task_changes(older_than_days=30, now=datetime.now() + timedelta(days=31)) == 1
+
+
+def test_changes_validation(client):
+    assert client.get("/api/tasks/changes").status_code == 400
+    assert client.get("/api/tasks/changes?since=abc").status_code == 400
+    assert client.get("/api/tasks/changes?since=0&limit=0").status_code == 400
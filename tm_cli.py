@@ -213,6 +213,8 @@ def cmd_tasks_list(args):
         params["executor_id"] = args.executor_id
     if args.limit:
         params["limit"] = args.limit
+    if args.cursor:
+        params["cursor"] = args.cursor
 
     data = api_request("GET", "/api/tasks", token=token, params=params)
     tasks = data.get("tasks", data)
@@ -233,6 +235,9 @@ def cmd_tasks_list(args):
             line += f" | срок: {t['due_date']}"
         print(" -", line)
 
+    if isinstance(data, dict) and data.get("next_cursor"):
+        print(f"➡ Следующая страница: --cursor {data['next_cursor']}")
+
 
 def cmd_tasks_get(args):
     """Детали одной задачи по ID."""
@@ -568,7 +573,8 @@ def build_parser():
             "  --priority      фильтр по приоритету\n"
             "  --author-id     фильтр по id автора\n"
             "  --executor-id   фильтр по id исполнителя\n"
-            "  --limit         лимит задач\n\n"
+            "  --limit         лимит задач\n"
+            "  --cursor        курсор следующей страницы (next_cursor)\n\n"
             "Примеры:\n"
             "  tm_cli.py tasks list\n"
             '  tm_cli.py ts ls --status "в процессе" --priority высокий\n'
@@ -581,6 +587,7 @@ def build_parser():
     p_tasks_list.add_argument("--author-id", type=int, help="Фильтр по автору (id).")
     p_tasks_list.add_argument("--executor-id", type=int, help="Фильтр по исполнителю (id).")
     p_tasks_list.add_argument("--limit", type=int, help="Максимальное количество задач.")
+    p_tasks_list.add_argument("--cursor", help="Курсор следующей страницы из предыдущего ответа.")
     p_tasks_list.set_defaults(func=cmd_tasks_list)
 
     p_tasks_get = tasks_sub.add_parser(
@@ -0,0 +1,92 @@
+# utils/conditional.py
+"""
+Условные GET: ETag / Last-Modified и ответ 304 Not Modified.
+
+Валидаторы считаются по дешёвым данным (версия задачи, счётчик изменений),
+поэтому проверять If-None-Match / If-Modified-Since можно до выборки
+и сериализации — на 304 тело ответа не строится вовсе.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from flask import Response, request
+
+# Сжатое тело — другое представление, и у него свой (строгий) ETag
+GZIP_ETAG_SUFFIX = "-gzip"
+
+# Точность дат в БД — секунда
+LAST_MODIFIED_RESOLUTION = timedelta(seconds=1)
+
+
+def local_to_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Дата из БД ('YYYY-MM-DD HH:MM:SS', локальное время) → datetime с часовым поясом."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").astimezone()
+    except ValueError:
+        return None
+
+
+def settled_last_modified(last_modified: Optional[datetime]) -> Optional[datetime]:
+    """
+    Дата годится в валидатор, только если её секунда уже прошла: вторая
+    правка в ту же секунду не сдвинет Last-Modified, и клиент с одной
+    датой (без ETag) получил бы ложный 304. Пока секунда не прошла — None,
+    и сверка идёт только по ETag.
+    """
+    if last_modified is None:
+        return None
+    if datetime.now(timezone.utc) - last_modified < LAST_MODIFIED_RESOLUTION:
+        return None
+    return last_modified
+
+
+def task_etag(task) -> str:
+    """
+    ETag задачи: id + updated_at + rev. updated_at меняется раз в секунду,
+    rev — на каждую правку, так что две правки за секунду различимы.
+    """
+    updated = "".join(ch for ch in task.get("updated_at") or "" if ch.isdigit())
+    return f"task-{task['id']}-{updated}-{task.get('rev') or 0}"
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Совпадает ли версия клиента с текущей.
+    If-None-Match важнее If-Modified-Since (RFC 9110): если клиент прислал
+    ETag, дату не смотрим — у неё точность в секунду.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if request.if_none_match:
+        return (
+            request.if_none_match.contains_weak(etag)
+            or request.if_none_match.contains_weak(etag + GZIP_ETAG_SUFFIX)
+        )
+    last_modified = settled_last_modified(last_modified)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """
+    ETag, Last-Modified (если его секунда уже прошла — см. settled_last_modified)
+    и no-cache (хранить можно, но каждый раз сверяться).
+    """
+    if response.content_encoding == "gzip":
+        etag += GZIP_ETAG_SUFFIX
+    response.set_etag(etag)
+    last_modified = settled_last_modified(last_modified)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Пустой 304 с теми же валидаторами, что у полного ответа (и того же варианта ETag)."""
+    if request.if_none_match.contains_weak(etag + GZIP_ETAG_SUFFIX):
+        etag += GZIP_ETAG_SUFFIX
+    return set_validators(Response(status=304), etag, last_modified)
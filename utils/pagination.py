@@ -0,0 +1,22 @@
+# utils/pagination.py
+import base64
+import json
+
+
+def encode_cursor(created_at: str, task_id: int) -> str:
+    """Непрозрачный курсор для keyset-пагинации по (created_at, id)."""
+    raw = json.dumps([created_at, task_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Разобрать курсор. Бросает ValueError, если он повреждён."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+    if not isinstance(created_at, str) or not isinstance(task_id, int):
+        raise ValueError("Некорректный курсор")
+    return created_at, task_id
@@ -0,0 +1,74 @@
+# utils/search.py
+import html
+import re
+
+# Маркеры подсветки, которые отдаёт snippet() — управляющие символы,
+# в пользовательском тексте их не бывает
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+# Слово для поиска: буквы, цифры, подчёркивание (как у токенайзера unicode61)
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """ё -> е: так же нормализован текст в индексе FTS (см. миграцию 3)."""
+    return text.replace("ё", "е").replace("Ё", "Е")
+
+
+def build_match_query(q: str) -> str:
+    """
+    Превратить пользовательскую строку в выражение FTS5 MATCH.
+    Каждое слово берётся в кавычки (операторы FTS5 из ввода не работают)
+    и ищется как префикс — "задач" найдёт и "задача", и "задачи".
+    Все слова должны встретиться (AND). Пустая строка -> ValueError.
+    """
+    terms = _TERM_RE.findall(normalize_text(q or ""))
+    if not terms:
+        raise ValueError("Пустой поисковый запрос")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _restore_original(snippet: str, sources) -> str:
+    """
+    Фрагмент строится по нормализованному тексту (ё -> е). Замена не меняет
+    длину, поэтому находим фрагмент в исходном тексте и возвращаем буквы
+    оригинала, не трогая маркеры подсветки и многоточия по краям.
+    """
+    plain = snippet.replace(HIGHLIGHT_START, "").replace(HIGHLIGHT_END, "")
+    core = plain.strip("…")
+    if not core:
+        return snippet
+    prefix = len(plain) - len(plain.lstrip("…"))
+
+    for source in sources:
+        if not source:
+            continue
+        pos = normalize_text(source).find(core)
+        if pos < 0:
+            continue
+        restored = []
+        k = 0  # позиция в plain
+        for ch in snippet:
+            if ch in (HIGHLIGHT_START, HIGHLIGHT_END):
+                restored.append(ch)
+                continue
+            if prefix <= k < prefix + len(core):
+                ch = source[pos + k - prefix]
+            restored.append(ch)
+            k += 1
+        return "".join(restored)
+    return snippet
+
+
+def render_snippet(snippet: str | None, *sources: str | None) -> str | None:
+    """
+    Экранировать HTML во фрагменте и подсветить совпадения тегом <mark>.
+    sources — исходные тексты, из которых мог быть взят фрагмент
+    (чтобы вернуть в него "ё").
+    """
+    if snippet is None:
+        return None
+    snippet = _restore_original(snippet, sources)
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")